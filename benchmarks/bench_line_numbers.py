@@ -0,0 +1,76 @@
+"""
+Line_num / Order_id assignment: the dict loop proccess_daily_files_rerun used against
+FIX.assign_line_nums, on synthetic transaction files of growing size.
+
+    python -m benchmarks.bench_line_numbers
+    python -m benchmarks.bench_line_numbers --rows 1000000 5000000 --max-loop-rows 1000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from logic.FIX import assign_line_nums
+
+
+def synthetic_ordnums(rows: int, lines_per_order: float = 3.0, seed: int = 0) -> pd.Series:
+    """Order numbers as they come out of a TransactionFile, orders' lines mostly together but not always."""
+    rng = np.random.default_rng(seed)
+    orders = max(1, int(rows / lines_per_order))
+    # sorted with some jitter, so most orders are contiguous and a few interleave
+    ids = np.sort(rng.integers(0, orders, rows) + rng.normal(0, 2, rows)).astype(np.int64)
+    return pd.Series(np.char.add("W", (ids + 10_000_000).astype(str)), dtype=str)
+
+
+def loop_line_nums(ordnums, id_start=6300):
+    orddict = {}
+    ordIddict = {}
+    line_nums = []
+    order_ids = []
+    for ordnum in ordnums:
+        if ordnum in orddict:
+            orddict[ordnum] += 1
+        else:
+            orddict[ordnum] = 1
+        line_nums.append(orddict[ordnum])
+
+        if ordnum not in ordIddict:
+            ordIddict[ordnum] = id_start
+            id_start += 1
+        order_ids.append(ordIddict[ordnum])
+    return line_nums, order_ids
+
+
+def _best_of(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--max-loop-rows", type=int, default=5_000_000,
+                        help="skip the dict loop above this many rows, it is the slow side")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'loop s':>9} {'vector s':>9} {'speedup':>8} {'rows/s (vector)':>16}")
+    for rows in args.rows:
+        ordnums = synthetic_ordnums(rows)
+        vec_time, (line_nums, order_ids) = _best_of(lambda: assign_line_nums(ordnums), args.repeat)
+        if rows <= args.max_loop_rows:
+            loop_time, (ref_lines, ref_ids) = _best_of(lambda: loop_line_nums(ordnums), args.repeat)
+            if line_nums.tolist() != ref_lines or order_ids.tolist() != ref_ids:
+                raise SystemExit(f"vectorized output differs from the loop at {rows} rows")
+            loop_col, speedup = f"{loop_time:9.3f}", f"{loop_time / vec_time:7.1f}x"
+        else:
+            loop_col, speedup = f"{'-':>9}", f"{'-':>8}"
+        print(f"{rows:>10} {loop_col} {vec_time:9.3f} {speedup:>8} {rows / vec_time:16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
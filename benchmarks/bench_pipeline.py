@@ -0,0 +1,262 @@
+"""
+Offline throughput of the pipeline's file stages on synthetic Ingram days, against a stored baseline.
+
+Cases:
+    file_fixes     FTP.File_Fixes on a raw CDT, CDP and TransactionFile
+    fix_fixes      FIX.Fixes numbering the TransactionFile
+    rerun          manual_rerun_logic.proccess_daily_files_rerun, crossref and INGQTY stubbed
+    sage_workbook  write_sage_workbook of an SL detail sheet
+    bulk_load      bulk_load.load_ingram_staging into a local sqlite file
+
+Every run of a case is a fresh process and the peak RSS is reset just before the timed part where
+the platform allows it, so it is the case's own. Rows are input lines: all three files for
+file_fixes, rerun and bulk_load, the TransactionFile for the others.
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --rows 10000 1000000 5000000 --cases rerun
+    python -m benchmarks.bench_pipeline --save-baseline      # after a deliberate change, on the runner box
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import write_cdp, write_cdt, write_transfile
+
+CASES = ("file_fixes", "fix_fixes", "rerun", "sage_workbook", "bulk_load")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# day the raw files are for, as File_Fixes and Name_Creator see it (the folder is the day before)
+BENCH_DAY = datetime.datetime(2026, 1, 4)
+
+
+def _daily_dir(root: str) -> str:
+    """File_Fixes' folder for BENCH_DAY under root, built the way File_Fixes builds it."""
+    from logic.FTP import Name_Creator
+    return root + "\\vol2\\FOXPRO\\TestFiles\\" + Name_Creator("Folder", BENCH_DAY)
+
+
+def prepare_day(workdir: str, rows: int, seed: int = 0) -> dict[str, str]:
+    """
+    Writes a synthetic day where File_Fixes looks for it (share root workdir/share) and a copy of
+    the TransactionFile where the other stages read it.
+
+    Returns:
+        dict[str, str]: root, the raw CDT, CDP and Trans paths and their names
+    """
+    from logic.FTP import Name_Creator
+    fday = (BENCH_DAY + datetime.timedelta(days=1)).date()
+    root = os.path.join(workdir, "share")
+    daily_dir = _daily_dir(root)
+    os.makedirs(daily_dir, exist_ok=True)
+    names = {"CDT": fday.strftime("%m%d") + "0001.CDT", "CDP": fday.strftime("%m%d") + "0001.CDP"}
+    return {
+        "root": root,
+        "CDT_name": names["CDT"],
+        "CDP_name": names["CDP"],
+        "CDT": write_cdt(daily_dir + "\\" + names["CDT"], rows, seed, fday),
+        "CDP": write_cdp(daily_dir + "\\" + names["CDP"], rows, seed + 1, fday),
+        "Trans": write_transfile(os.path.join(daily_dir, Name_Creator("Trans", BENCH_DAY)), rows, seed + 2, fday),
+        "out": os.path.join(workdir, "out"),
+    }
+
+
+@contextmanager
+def stubbed_lookups(seed: int = 0):
+    """crossref and INGQTY served from memory instead of SQL Server."""
+    rng = np.random.default_rng(seed)
+    crossref = pd.DataFrame({"Billto": ["000555666", "000777888"], "Ssacct": ["SS0555666", "SS0777888"]})
+    ingqty = pd.DataFrame({
+        "ISBN": (9780000000000 + rng.integers(0, 10_000_000, 200_000)).astype(str),
+        "INGOH": rng.integers(0, 50, 200_000),
+    }).drop_duplicates("ISBN")
+
+    @contextmanager
+    def get_db():
+        yield None
+
+    def read_sql(sql, con=None, **kwargs):
+        return (crossref if "crossref" in sql else ingqty).copy()
+
+    with patch("logic.manual_rerun_logic.get_db", get_db), patch("pandas.read_sql", side_effect=read_sql):
+        yield
+
+
+def run_case(case: str, day: dict[str, str], rows: int, csv_backend: str | None = None) -> dict:
+    """
+    Runs one case once in this process.
+
+    Returns:
+        dict: seconds, rows (input lines processed) and peak_rss (bytes, None if unknown)
+    """
+    from helpers.context import DailyFilesContext
+    from helpers.process_stats import peak_rss_bytes, reset_peak_rss
+
+    if case == "file_fixes":
+        from logic.FTP import File_Fixes
+        names = {"CDT": day["CDT_name"], "CDP": day["CDP_name"]}
+        with patch.object(DailyFilesContext, "fileserver_base", staticmethod(lambda: day["root"])):
+            reset_peak_rss()
+            started = time.perf_counter()
+            File_Fixes(names, BENCH_DAY)
+            elapsed = time.perf_counter() - started
+        lines = 3 * rows
+    elif case == "fix_fixes":
+        from logic.FIX import Fixes
+        reset_peak_rss()
+        started = time.perf_counter()
+        Fixes(day["Trans"], day["Trans"] + ".numbered")
+        elapsed = time.perf_counter() - started
+        lines = rows
+    elif case == "rerun":
+        from logic.manual_rerun_logic import proccess_daily_files_rerun
+        with stubbed_lookups():
+            reset_peak_rss()
+            started = time.perf_counter()
+            proccess_daily_files_rerun(day["CDT"], day["CDP"], day["Trans"], day["out"],
+                                       columnar=False, csv_backend=csv_backend)
+            elapsed = time.perf_counter() - started
+        lines = 3 * rows
+    elif case == "sage_workbook":
+        from logic.FIX import number_frame
+        from logic.ingram_files import TRANSFILE_LAYOUT, parse_ingram_file
+        from logic.sage_workbook import write_sage_workbook
+        daily = number_frame(parse_ingram_file(day["Trans"], TRANSFILE_LAYOUT, csv_backend), "Ordnum")
+        detail = daily[["Order_id", "Line_num", "ISBN", "Ingwhs", "Qty", "Price", "Discount", "Qty"]]
+        detail.columns = ["ORDUNIQ", "LINENUM", "ITEM", "LOCATION", "QTYORDERED", "PRIUNTPRC", "DISCPER", "QTYSHIPPED"]
+        os.makedirs(day["out"], exist_ok=True)
+        reset_peak_rss()
+        started = time.perf_counter()
+        write_sage_workbook(os.path.join(day["out"], "SL_SAGE_UPLOAD.xlsx"), {"Order_Details": detail})
+        elapsed = time.perf_counter() - started
+        lines = rows
+    elif case == "bulk_load":
+        import sqlalchemy
+        from logic.bulk_load import load_ingram_staging
+        os.makedirs(day["out"], exist_ok=True)
+        # sqlite on local disk as the database, measures the frame to rows work and the batching
+        engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(day['out'], 'staging.db')}")
+        reset_peak_rss()
+        started = time.perf_counter()
+        load_ingram_staging(day["CDT"], day["CDP"], day["Trans"], engine=engine, schema=None,
+                            columnar=False, csv_backend=csv_backend)
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+        lines = 3 * rows
+    else:
+        raise ValueError(f"Unknown case {case!r}, expected one of {CASES}")
+    return {"seconds": elapsed, "rows": lines, "peak_rss": peak_rss_bytes()}
+
+
+def measure(case: str, day: dict[str, str], rows: int, repeat: int = 3, csv_backend: str | None = None,
+            isolate: bool = True) -> dict:
+    """
+    Best of repeat runs of a case, each in a new process unless isolate is False.
+
+    Returns:
+        dict: seconds, rows_per_sec and peak_rss_mb of the fastest run
+    """
+    runs = []
+    for _ in range(repeat):
+        if isolate:
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                runs.append(pool.submit(run_case, case, day, rows, csv_backend).result())
+        else:
+            runs.append(run_case(case, day, rows, csv_backend))
+    best = min(runs, key=lambda r: r["seconds"])
+    return {
+        "seconds": round(best["seconds"], 4),
+        "rows_per_sec": round(best["rows"] / best["seconds"]) if best["seconds"] else None,
+        "peak_rss_mb": None if best["peak_rss"] is None else round(best["peak_rss"] / (1024 * 1024), 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Results that are slower or use more memory than the baseline by more than tolerance.
+
+    Args:
+        results (dict): case -> rows (str) -> measure() output
+        baseline (dict): The same shape, from baseline.json
+        tolerance (float): Allowed fraction, 0.25 lets throughput drop and memory grow by 25%
+
+    Returns:
+        list[str]: One line per regression, empty when there are none
+    """
+    regressions = []
+    for case, by_rows in results.items():
+        for rows, now in by_rows.items():
+            then = baseline.get(case, {}).get(rows)
+            if not then:
+                continue
+            if now["rows_per_sec"] and then["rows_per_sec"] and now["rows_per_sec"] < then["rows_per_sec"] * (1 - tolerance):
+                regressions.append(f"{case} @ {rows} rows: {now['rows_per_sec']:,} rows/s, baseline {then['rows_per_sec']:,}")
+            if now["peak_rss_mb"] and then["peak_rss_mb"] and now["peak_rss_mb"] > then["peak_rss_mb"] * (1 + tolerance):
+                regressions.append(f"{case} @ {rows} rows: peak RSS {now['peak_rss_mb']} MB, baseline {then['peak_rss_mb']} MB")
+    return regressions
+
+
+def _load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--csv-backend", choices=["pandas", "arrow"], default=None)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    baseline = _load_baseline(args.baseline)
+    results: dict[str, dict[str, dict]] = {}
+    print(f"{'case':<14} {'rows':>9} {'seconds':>9} {'rows/s':>12} {'peak RSS':>10} {'vs baseline':>12}")
+    for rows in args.rows:
+        workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+        try:
+            day = prepare_day(workdir, rows)
+            for case in args.cases:
+                result = measure(case, day, rows, args.repeat, args.csv_backend)
+                results.setdefault(case, {})[str(rows)] = result
+                then = baseline.get(case, {}).get(str(rows))
+                delta = f"{result['rows_per_sec'] / then['rows_per_sec'] - 1:+.0%}" if then else "-"
+                print(f"{case:<14} {rows:>9} {result['seconds']:>9.3f} {result['rows_per_sec']:>12,} "
+                      f"{result['peak_rss_mb']!s:>7} MB {delta:>12}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        merged = {case: {**_load_baseline(args.baseline).get(case, {}), **by_rows} for case, by_rows in results.items()}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}",
+                "saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "results": {**baseline, **merged},
+            }, f, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Synthetic Ingram CDT, CDP and TransactionFile content in the layouts logic.ingram_files declares,
+for benchmarks and tests that can't use a real day.
+
+Values are drawn to look like a real day: orders of one to a few lines that mostly sit together,
+the warehouse accounts, activity types and return codes the transforms branch on, the odd title
+with quotes and commas for File_Fixes to strip and a share of zero priced review lines. Output is
+deterministic for a seed and written in blocks, so 5M lines don't need 5M lines of memory.
+
+    python -m benchmarks.synthetic OUT_DIR --rows 100000
+"""
+import argparse
+import datetime
+import os
+import numpy as np
+from logic.ingram_files import CDP_LAYOUT, CDT_LAYOUT, TRANSFILE_LAYOUT
+
+BLOCK_ROWS = 100_000
+
+CDT_WHS = np.array(["6317601", "6317605", "6318681", "6300001", "6312002"])
+CDT_ACTTYPES = np.array(["TC", "TD", "DT", "HS", "HD", "??", "SS", "IM", "RT", "AJ", "TE", "TN", "TH"])
+CDP_SANS = np.array(["631760X", "631760X", "631760X", "6300001", "1234567"])
+CDP_INVCODES = np.array(["QH", "OP", "QH", "OH", "BO"])
+RETURN_CODES = np.array(["20", "50", "3501", "2008", "2020", "3520", "3509", "2509", "2001", "2018"])
+BILLTOS = np.array(["000111222", "000333444", "000555666", "000808073", "000777888", "000799074", "000912345"])
+TITLES = np.array(["The Art of Tea", "Japanese Garden Design", 'Origami "Deluxe" Kit', "Kanji, Made Simple",
+                   "Tokyo Street Food", "Bonsai Basics", "It's Sushi Time"])
+
+
+def _eans(rng, n):
+    return (9780000000000 + rng.integers(0, 10_000_000, n)).astype(str)
+
+
+def _isbn10s(rng, n):
+    return np.char.zfill(rng.integers(0, 10**9, n).astype(str), 10)
+
+
+def _lines(columns: list, sep: str) -> str:
+    return "".join(sep.join(row) + "\n" for row in zip(*columns))
+
+
+def cdt_block(rng, n: int, day: datetime.date) -> str:
+    eans = _eans(rng, n)
+    acttypes = rng.choice(CDT_ACTTYPES, n)
+    from_loc = np.where(rng.random(n) < 0.1, "IPS", "")
+    columns = [
+        np.full(n, "TUTTLE"), np.full(n, day.strftime("%Y%m%d")), rng.choice(CDT_WHS, n),
+        _isbn10s(rng, n),
+        np.where(rng.random(n) < 0.5, "", np.char.add("1Z", rng.integers(10**8, 10**9, n).astype(str))), eans,
+        rng.choice(np.array(["01", "02", "05"]), n), rng.integers(-40, 60, n).astype(str), np.full(n, "EA"),
+        rng.choice(np.array(["A", "B", ""]), n), rng.integers(1, 500, n).astype(str), acttypes, from_loc,
+    ]
+    return _lines(columns, CDT_LAYOUT.sep)
+
+
+def cdp_block(rng, n: int, day: datetime.date) -> str:
+    eans = _eans(rng, n)
+    empty = np.full(n, "")
+    columns = [
+        np.full(n, "TUTTLE"), np.full(n, day.strftime("%Y%m%d")), rng.choice(CDP_SANS, n),
+        _isbn10s(rng, n), np.full(n, "X"), eans, rng.choice(CDP_INVCODES, n),
+        rng.integers(0, 900, n).astype(str), empty, empty, empty, empty, empty,
+    ]
+    return _lines(columns, CDP_LAYOUT.sep)
+
+
+def transfile_block(rng, n: int, day: datetime.date, first_order: int) -> tuple[str, int]:
+    """One block of TransactionFile lines and the next unused order number."""
+    # orders of one to five lines, most kept together, some shuffled a few lines away
+    order_lines = rng.integers(1, 6, n)
+    ordnums = np.repeat(np.arange(first_order, first_order + n), order_lines)[:n]
+    jitter = np.argsort(np.arange(n) + rng.normal(0, 1.5, n), kind="stable")
+    ordnums = ordnums[jitter]
+
+    qty = rng.integers(-3, 25, n)
+    price = np.round(rng.uniform(0, 60, n), 2)
+    price[rng.random(n) < 0.05] = 0.0
+    discount = rng.choice(np.array([0.0, 40.0, 45.0, 50.0]), n)
+    ext = np.round(qty * price * (1 - discount / 100), 2)
+    billto = rng.choice(BILLTOS, n)
+    rettyp = np.where(rng.random(n) < 0.08, rng.choice(RETURN_CODES, n), "")
+    columns = [
+        np.char.add("W", ordnums.astype(str)), np.full(n, "Sale"),
+        np.where(rng.random(n) < 0.04, "S", "N"), np.char.add("PO", rng.integers(1000, 99999, n).astype(str)),
+        billto, np.full(n, "Bookshop Ltd"), np.full(n, "US"), billto, np.full(n, "Bookshop Ltd"),
+        _eans(rng, n), rng.choice(TITLES, n), np.full(n, "TUT"),
+        qty.astype(str), ext.astype(str), price.astype(str), discount.astype(str),
+        np.full(n, "USD"), rettyp, rng.integers(10**6, 10**7, n).astype(str),
+        np.where(rng.random(n) < 0.3, "HH", "IN"), np.full(n, "NY"), np.full(n, day.strftime("%m/%d/%Y")),
+    ]
+    return _lines(columns, TRANSFILE_LAYOUT.sep), int(ordnums.max()) + 1
+
+
+def _write(path: str, rows: int, seed: int, block) -> str:
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for start in range(0, rows, BLOCK_ROWS):
+            f.write(block(rng, min(BLOCK_ROWS, rows - start)))
+    return path
+
+
+def write_cdt(path: str, rows: int, seed: int = 0, day: datetime.date | None = None) -> str:
+    day = day or datetime.date(2026, 1, 5)
+    return _write(path, rows, seed, lambda rng, n: cdt_block(rng, n, day))
+
+
+def write_cdp(path: str, rows: int, seed: int = 0, day: datetime.date | None = None) -> str:
+    day = day or datetime.date(2026, 1, 5)
+    return _write(path, rows, seed, lambda rng, n: cdp_block(rng, n, day))
+
+
+def write_transfile(path: str, rows: int, seed: int = 0, day: datetime.date | None = None) -> str:
+    day = day or datetime.date(2026, 1, 5)
+    next_order = [10_000_000]
+
+    def block(rng, n):
+        text, next_order[0] = transfile_block(rng, n, day, next_order[0])
+        return text
+    return _write(path, rows, seed, block)
+
+
+def write_ingram_day(out_dir: str, rows: int, seed: int = 0, day: datetime.date | None = None,
+                     names: dict[str, str] | None = None) -> dict[str, str]:
+    """
+    Writes a CDT, CDP and TransactionFile of rows lines each.
+
+    Args:
+        out_dir (str): Folder to write into, created if needed
+        rows (int): Lines per file
+        seed (int): Random seed, the same seed gives the same files
+        day (datetime.date, optional): Date the files are for
+        names (dict[str, str], optional): File names keyed CDT, CDP and Trans
+
+    Returns:
+        dict[str, str]: Paths keyed CDT, CDP and Trans
+    """
+    day = day or datetime.date(2026, 1, 5)
+    names = names or {"CDT": day.strftime("%m%d") + "0001.CDT", "CDP": day.strftime("%m%d") + "0001.CDP",
+                      "Trans": f"TransactionFile{day.strftime('%Y%m%d')}.txt"}
+    os.makedirs(out_dir, exist_ok=True)
+    return {
+        "CDT": write_cdt(os.path.join(out_dir, names["CDT"]), rows, seed, day),
+        "CDP": write_cdp(os.path.join(out_dir, names["CDP"]), rows, seed + 1, day),
+        "Trans": write_transfile(os.path.join(out_dir, names["Trans"]), rows, seed + 2, day),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for kind, path in write_ingram_day(args.out_dir, args.rows, args.seed).items():
+        print(f"{kind:>5}: {path} ({os.path.getsize(path):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
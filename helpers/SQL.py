@@ -1,10 +1,38 @@
 import pyodbc
 from pyodbc import *
 import getpass
-import logging 
+import logging
+import time
+from datetime import datetime
+from typing import NamedTuple
+from helpers import metrics
 from helpers.ENV import SQL_CONFIG
 
+JOB_NAME = 'Daily Rerun'
+
+# sysjobhistory.run_status values
+_RUN_STATUS = {0: "failed", 1: "succeeded", 2: "retry", 3: "canceled", 4: "in progress"}
+
+
+class SQLJob(NamedTuple):
+    """Handle to a started SQL Agent job, enough to find this run in msdb."""
+    name: str
+    job_id: str
+    requested_at: datetime  # server time just before sp_start_job
+
+
+class SQLJobError(RuntimeError):
+    """The SQL Agent job finished without succeeding."""
+
+
+@metrics.instrumented()
 def SQLrun():
+    """
+    Starts the Daily Rerun SQL Agent job.
+
+    Returns:
+        SQLJob | None: Handle for wait_for_job, None if the job could not be started
+    """
     logging.info(f"SQLrun started by user: {getpass.getuser()}")
     c = None
     try:
@@ -12,18 +40,134 @@ def SQLrun():
         cursor = c.cursor()
         logging.info("SQL Connection successful")
 
+        cursor.execute("SELECT CONVERT(varchar(36), job_id), GETDATE() FROM msdb.dbo.sysjobs WHERE name = ?", JOB_NAME)
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"SQL Agent job {JOB_NAME} not found in msdb")
+        job_id, requested_at = row
+
         cursor.execute('''EXEC msdb.dbo.sp_start_job N'Daily Rerun' ''')
         c.commit()
         logging.info("SQL Job Start Command Executed")
         logging.info("SQL Job Started Successfully")
+        return SQLJob(JOB_NAME, job_id, requested_at)
 
     except pyodbc.Error as pyodbc_err:
         logging.error(f"pyodbc Error in SQLrun: {pyodbc_err}")
 
     except Exception as e:
         logging.error(f"General Error in SQLrun: {e}")
-        
+
     finally:
         if c:
             c.close()
             logging.info("Database connection closed")
+    return None
+
+
+def _job_outcome(cursor, job):
+    """
+    Looks up this run of the job in msdb.
+
+    Returns:
+        tuple: (run_status, message) once the run has finished, None while it is queued or running
+    """
+    # sysjobactivity holds one row per job per agent session, only the current session's row is live
+    cursor.execute(
+        """
+        SELECT TOP 1 ja.stop_execution_date, ja.job_history_id
+        FROM msdb.dbo.sysjobactivity ja
+        WHERE ja.job_id = ?
+          AND ja.session_id = (SELECT MAX(session_id) FROM msdb.dbo.syssessions)
+          AND ja.run_requested_date >= ?
+        ORDER BY ja.run_requested_date DESC
+        """,
+        job.job_id, job.requested_at,
+    )
+    row = cursor.fetchone()
+    if row is None or row[0] is None or row[1] is None:
+        return None
+
+    cursor.execute(
+        "SELECT run_status, message FROM msdb.dbo.sysjobhistory WHERE instance_id = ?",
+        row[1],
+    )
+    outcome = cursor.fetchone()
+    if outcome is None:
+        return None
+    run_status, message = outcome
+    if run_status != 1:
+        # the job outcome row only says which step failed, the step row has the actual error
+        cursor.execute(
+            """
+            SELECT TOP 1 step_name, message
+            FROM msdb.dbo.sysjobhistory
+            WHERE job_id = ? AND step_id > 0 AND run_status <> 1
+              AND instance_id < ?
+              AND msdb.dbo.agent_datetime(run_date, run_time) >= DATEADD(second, -1, ?)
+            ORDER BY instance_id DESC
+            """,
+            job.job_id, row[1], job.requested_at,
+        )
+        step = cursor.fetchone()
+        if step is not None:
+            message = f"step {step[0]}: {step[1]}"
+    return run_status, message
+
+
+def wait_for_job(job, timeout=1800, first_interval=2.0, max_interval=20.0, backoff=1.5):
+    """
+    Polls msdb until the SQL Agent job run started by SQLrun finishes.
+
+    Polling starts every first_interval seconds and backs off up to max_interval, so a quick job
+    is noticed within seconds while a long one doesn't hammer msdb. A failed poll (dropped
+    connection, server busy) is logged and retried on a fresh connection.
+
+    Args:
+        job (SQLJob): Handle returned by SQLrun
+        timeout (float): Seconds to wait before giving up
+        first_interval (float): Seconds before the first poll
+        max_interval (float): Longest gap between polls
+        backoff (float): Factor the gap grows by after each poll
+
+    Raises:
+        SQLJobError: The job failed or was canceled, with the job's error message
+        TimeoutError: The job was still running after timeout seconds
+    """
+    logging.info(f"Waiting for SQL job {job.name} requested at {job.requested_at}")
+    started = time.monotonic()
+    interval = first_interval
+    c = None
+    try:
+        while True:
+            time.sleep(min(interval, max(0.0, timeout - (time.monotonic() - started))))
+            waited = time.monotonic() - started
+            outcome = None
+            try:
+                if c is None:
+                    c = connect(SQL_CONFIG['CONNECTION_STRING'], autocommit=True)
+                outcome = _job_outcome(c.cursor(), job)
+            except pyodbc.Error as pyodbc_err:
+                logging.warning(f"pyodbc Error polling SQL job {job.name}, retrying: {pyodbc_err}")
+                if c is not None:
+                    try:
+                        c.close()
+                    except pyodbc.Error:
+                        pass
+                c = None
+
+            if outcome is not None:
+                run_status, message = outcome
+                if run_status == 1:
+                    logging.info(f"SQL job {job.name} succeeded after {waited:.0f}s")
+                    return
+                status = _RUN_STATUS.get(run_status, f"status {run_status}")
+                raise SQLJobError(f"SQL job {job.name} {status} after {waited:.0f}s: {message}")
+
+            if waited >= timeout:
+                raise TimeoutError(f"SQL job {job.name} still running after {timeout} seconds")
+            logging.info(f"at {waited:.0f}s, SQL job {job.name} still running")
+            interval = min(interval * backoff, max_interval)
+    finally:
+        if c is not None:
+            c.close()
@@ -1,6 +1,7 @@
 import datetime
 import pathlib
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -49,6 +50,24 @@ class DailyFilesContext:
         return r"\\tutpub3"
 
     #paths
+    @staticmethod
+    def local_cache_path():
+        #local disk on the runner box, LOCAL_CACHE_DIR overrides the temp dir default
+        return pathlib.Path(os.getenv("LOCAL_CACHE_DIR") or tempfile.gettempdir()).joinpath("daily_files_pipeline")
+
+    @staticmethod
+    def ftp_staging_path():
+        return DailyFilesContext.local_cache_path().joinpath("ftp_staging")
+
+    @staticmethod
+    def ftp_mirror_path():
+        return DailyFilesContext.local_cache_path().joinpath("ftp_mirror")
+
+    @staticmethod
+    def run_manifest_path():
+        #one per daily folder, kept off the fileserver because Daily_Folder_Setup wipes that folder mid run
+        return DailyFilesContext.local_cache_path().joinpath("run_manifests", f"{DailyFilesContext.daily_file_dir_date()}.json")
+
     @staticmethod
     def daily_files_path():
         return pathlib.Path(DailyFilesContext.fileserver_base()).joinpath("VOL2", "FOXPRO", "TestFiles", DailyFilesContext.daily_file_dir_date())
@@ -1,19 +1,65 @@
+import atexit
+import logging
 import os
+import threading
+import time
 import urllib.parse
 from contextlib import contextmanager
 import sqlalchemy
 from dotenv import load_dotenv
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 load_dotenv()
 
-@contextmanager
-def get_db():
-    """Context manager that yields engine and auto-closes it"""
+# pool sizing per engine, a run holds at most pool size + overflow connections to one server
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that counts checkouts and how long each one waited for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "checkouts": self.checkouts,
+                "checked_out": self.checkedout(),
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+                "wait_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+                "size": self.size(),
+                "overflow": self.overflow(),
+            }
+
+
+def _env_url() -> str:
     SERVER = os.getenv("SERVER")
     DB = os.getenv("DATABASE")
     USER = os.getenv("DB_USER")
     PASSWORD = os.getenv("DB_PASSWORD")
-    
+
     # Check if all required environment variables are set
     if not all([SERVER, DB, USER, PASSWORD]):
         missing = []
@@ -22,16 +68,82 @@ def get_db():
         if not USER: missing.append("DB_USER")
         if not PASSWORD: missing.append("DB_PASSWORD")
         raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
-    
-    conn_string = f"mssql+pymssql://{urllib.parse.quote_plus(USER)}:{urllib.parse.quote_plus(PASSWORD)}@{SERVER}/{DB}"
-    
-    engine: Engine = sqlalchemy.create_engine(
-        conn_string,
-        connect_args={'timeout': 30, 'login_timeout': 60},
-        pool_recycle=3600
-    )
-    
-    try:
-        yield engine
-    finally:
+
+    return f"mssql+pymssql://{urllib.parse.quote_plus(USER)}:{urllib.parse.quote_plus(PASSWORD)}@{SERVER}/{DB}"
+
+
+def get_engine(url: str | None = None) -> Engine:
+    """
+    Returns the process wide pooled engine for a DSN, creating it on first use.
+
+    Connections are checked with a ping before being handed out, so one the server dropped
+    overnight is replaced instead of failing the query.
+
+    Args:
+        url (str, optional): SQLAlchemy URL, defaults to the SERVER/DATABASE/DB_USER/DB_PASSWORD env vars
+
+    Returns:
+        Engine: The shared engine, callers must not dispose it
+    """
+    if url is None:
+        url = _env_url()
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            connect_args = {'timeout': 30, 'login_timeout': 60} if url.startswith("mssql+pymssql") else {}
+            # pyodbc sends an executemany as one array bound batch instead of a round trip per row
+            dialect_args = {'fast_executemany': True} if url.startswith("mssql+pyodbc") else {}
+            engine = sqlalchemy.create_engine(
+                url,
+                connect_args=connect_args,
+                **dialect_args,
+                poolclass=TimedQueuePool,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+            )
+            _engines[url] = engine
+            logging.info(f"Created pooled engine for {engine.url.render_as_string(hide_password=True)}")
+        return engine
+
+
+def pool_stats() -> dict[str, dict]:
+    """
+    Checkout counts and wait times of every pooled engine, keyed by URL with the password hidden.
+    Wait times are seconds spent getting a connection from the pool, a growing wait_max means
+    the pool is too small for the work sharing it.
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+    return {
+        engine.url.render_as_string(hide_password=True): engine.pool.stats()
+        for engine in engines
+        if isinstance(engine.pool, TimedQueuePool)
+    }
+
+
+def dispose_engines() -> None:
+    """Closes every pooled engine, registered to run at exit."""
+    with _engines_lock:
+        engines = list(_engines.items())
+        _engines.clear()
+    for url, engine in engines:
+        pool = engine.pool
+        if isinstance(pool, TimedQueuePool):
+            stats = pool.stats()
+            logging.info(
+                f"Disposing engine {engine.url.render_as_string(hide_password=True)}: "
+                f"{stats['checkouts']} checkouts, wait max {stats['wait_max']:.3f}s"
+            )
         engine.dispose()
+
+
+atexit.register(dispose_engines)
+
+
+@contextmanager
+def get_db():
+    """Context manager that yields the pooled engine, it stays open for later callers"""
+    yield get_engine()
@@ -0,0 +1,129 @@
+import datetime
+import json
+import logging
+import os
+from pathlib import Path
+import pandas as pd
+from sqlalchemy import text
+from helpers.context import DailyFilesContext
+
+# a snapshot older than this is thrown away and pulled again in full, which also drops deleted items
+ITEM_TITLES_MAX_AGE_HOURS = float(os.getenv("ITEM_TITLES_MAX_AGE_HOURS", "168"))
+
+
+def item_key(values: pd.Series) -> pd.Series:
+    """
+    Normalizes item numbers the way the report joins compared them: TRIM on both sides and SQL
+    Server's case insensitive =.
+    """
+    return values.astype(str).str.strip(" ").str.upper().where(values.notna())
+
+
+class ItemTitleSnapshot:
+    """
+    Local parquet copy of TUTLIV.dbo.ICITEM reduced to normalized ITEMNO and DESC, so reports can
+    look titles up in pandas instead of joining ICITEM on the ERP server every run.
+
+    Each load pulls only the items whose AUDTDATE is on or after the newest one already in the
+    snapshot (the whole day again, AUDTDATE has no time) and upserts them. Once the last full pull
+    is older than max_age_hours the snapshot is rebuilt from scratch.
+    """
+
+    SNAPSHOT_FILE = "icitem_titles.parquet"
+    META_FILE = "icitem_titles.json"
+
+    def __init__(self, root: str | Path | None = None, max_age_hours: float | None = None,
+                 source: str = "TUTLIV.dbo.ICITEM"):
+        self.root = Path(root) if root is not None else DailyFilesContext.local_cache_path()
+        self.max_age_hours = ITEM_TITLES_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+        self.source = source
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.root.joinpath(self.SNAPSHOT_FILE)
+
+    @property
+    def meta_path(self) -> Path:
+        return self.root.joinpath(self.META_FILE)
+
+    def _read_meta(self) -> dict | None:
+        if not self.meta_path.exists() or not self.snapshot_path.exists():
+            return None
+        try:
+            return json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"ICITEM snapshot metadata unreadable, rebuilding: {e}")
+            return None
+
+    def _fetch(self, db, since: int | None) -> pd.DataFrame:
+        sql = f"SELECT ITEMNO, [DESC], AUDTDATE FROM {self.source}"
+        params = {}
+        if since is not None:
+            sql += " WHERE AUDTDATE >= :since"
+            params["since"] = since
+        with db.connect() as conn:
+            res = conn.execute(text(sql), params)
+            rows = pd.DataFrame(res.fetchall(), columns=["ITEMNO", "DESC", "AUDTDATE"])
+        rows = pd.DataFrame({
+            "ITEMNO": item_key(rows["ITEMNO"]),
+            "DESC": rows["DESC"],
+            "AUDTDATE": pd.to_numeric(rows["AUDTDATE"]).fillna(0).astype("int64"),
+        })
+        return rows.dropna(subset=["ITEMNO"])
+
+    def _write(self, snapshot: pd.DataFrame, meta: dict) -> None:
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        snapshot.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.snapshot_path)
+        tmp_meta = self.meta_path.with_suffix(".tmp")
+        tmp_meta.write_text(json.dumps(meta, indent=1), encoding="utf-8")
+        os.replace(tmp_meta, self.meta_path)
+
+    def refresh(self, db, now: datetime.datetime | None = None) -> pd.DataFrame:
+        """
+        Brings the snapshot up to date, in full when it is missing or too old, otherwise incrementally.
+
+        Returns:
+            pd.DataFrame: The snapshot, ITEMNO (normalized), DESC and AUDTDATE
+        """
+        now = now or datetime.datetime.now()
+        meta = self._read_meta()
+        full = meta is None
+        if not full:
+            age = now - datetime.datetime.fromisoformat(meta["full_refresh_at"])
+            full = age > datetime.timedelta(hours=self.max_age_hours)
+            if full:
+                logging.info(f"ICITEM snapshot is {age} old, rebuilding it")
+
+        if full:
+            snapshot = self._fetch(db, since=None)
+            meta = {"full_refresh_at": now.isoformat()}
+            logging.info(f"Pulled all {len(snapshot)} ICITEM titles into {self.snapshot_path}")
+        else:
+            snapshot = pd.read_parquet(self.snapshot_path)
+            changed = self._fetch(db, since=meta["watermark"])
+            snapshot = pd.concat([snapshot[~snapshot["ITEMNO"].isin(changed["ITEMNO"])], changed], ignore_index=True)
+            logging.info(f"Pulled {len(changed)} ICITEM titles changed since {meta['watermark']}")
+
+        duplicates = snapshot["ITEMNO"].duplicated(keep="last")
+        if duplicates.any():
+            logging.warning(f"{duplicates.sum()} ICITEM item numbers collide once trimmed, keeping the last")
+            snapshot = snapshot[~duplicates].reset_index(drop=True)
+
+        meta["watermark"] = int(snapshot["AUDTDATE"].max()) if len(snapshot) else 0
+        meta["refreshed_at"] = now.isoformat()
+        meta["items"] = len(snapshot)
+        self._write(snapshot, meta)
+        return snapshot
+
+    def titles(self, db, now: datetime.datetime | None = None) -> pd.Series:
+        """
+        Refreshes the snapshot and returns it as a lookup.
+
+        Returns:
+            pd.Series: DESC indexed by normalized ITEMNO
+        """
+        snapshot = self.refresh(db, now=now)
+        return pd.Series(snapshot["DESC"].values, index=snapshot["ITEMNO"].values)
+
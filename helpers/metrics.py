@@ -0,0 +1,206 @@
+import contextvars
+import datetime
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+"""
+Per-stage timing and volume metrics for the daily run.
+
+A stage is a function wrapped in instrumented() (or a block in stage()). While it runs,
+current() returns its StageMetrics for the code inside to add the bytes and rows it handled.
+Every finished stage goes into the in-memory list and, once configure() has been called, is
+appended as one JSON line to the metrics file, so a run that dies part way still leaves the
+stages it finished.
+"""
+
+METRICS_SUFFIX = ".metrics.jsonl"
+
+_records: list["StageMetrics"] = []
+_lock = threading.Lock()
+_sink_path: str | None = None
+_current: contextvars.ContextVar["StageMetrics | None"] = contextvars.ContextVar("stage_metrics", default=None)
+
+
+@dataclass
+class StageMetrics:
+    stage: str
+    started_at: str
+    parent: str | None = None
+    thread: str = ""
+    ended_at: str | None = None
+    duration: float | None = None  # seconds
+    status: str = "running"  # running, ok or failed
+    error: str | None = None
+    bytes_read: int = 0
+    bytes_written: int = 0
+    rows_in: int | None = None
+    rows_out: int | None = None
+    _started: float = field(default=0.0, repr=False)
+
+    def add(self, bytes_read: int = 0, bytes_written: int = 0, rows_in: int | None = None,
+            rows_out: int | None = None) -> "StageMetrics":
+        """Adds to the stage's counts, rows stay None until something reports them."""
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + rows_in
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + rows_out
+        return self
+
+    def read_file(self, path) -> "StageMetrics":
+        """Counts the size of a file the stage read, a missing file counts nothing."""
+        return self.add(bytes_read=_size(path))
+
+    def wrote_file(self, path) -> "StageMetrics":
+        """Counts the size of a file the stage wrote, a missing file counts nothing."""
+        return self.add(bytes_written=_size(path))
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if not k.startswith("_")}
+
+
+def _size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _now() -> str:
+    return datetime.datetime.now().isoformat(timespec="milliseconds")
+
+
+def metrics_path_for(log_file: str) -> str:
+    """The metrics file that goes next to a log file, daily_run_<date>.log -> daily_run_<date>.metrics.jsonl"""
+    return os.path.splitext(log_file)[0] + METRICS_SUFFIX
+
+
+def configure(path: str | None) -> None:
+    """
+    Starts writing finished stages to path as JSON lines, replacing what a previous run of the
+    same day left there. None stops writing, stages are still kept in memory.
+    """
+    global _sink_path
+    with _lock:
+        _sink_path = path
+        if path is not None:
+            open(path, "w", encoding="utf-8").close()
+
+
+def reset() -> None:
+    """Forgets every recorded stage and stops writing them."""
+    global _sink_path
+    with _lock:
+        _records.clear()
+        _sink_path = None
+
+
+def records() -> list[StageMetrics]:
+    with _lock:
+        return list(_records)
+
+
+def current() -> StageMetrics:
+    """
+    The stage running in this thread. Outside of any stage a detached record is returned, so code
+    that reports counts works the same when called on its own.
+    """
+    record = _current.get()
+    return record if record is not None else StageMetrics(stage="<none>", started_at=_now())
+
+
+def _finish(record: StageMetrics) -> None:
+    with _lock:
+        _records.append(record)
+        path = _sink_path
+        if path is not None:
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record.to_dict()) + "\n")
+            except OSError as e:
+                logging.warning(f"Could not write stage metrics to {path}: {e}")
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times the block as stage name and records it when the block ends, failed if it raised.
+
+    Yields:
+        StageMetrics: The stage's record, also what current() returns inside the block
+    """
+    parent = _current.get()
+    record = StageMetrics(
+        stage=name, started_at=_now(), parent=parent.stage if parent else None,
+        thread=threading.current_thread().name, _started=time.perf_counter(),
+    )
+    token = _current.set(record)
+    try:
+        yield record
+        record.status = "ok"
+    except BaseException as e:
+        record.status = "failed"
+        record.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        record.ended_at = _now()
+        record.duration = round(time.perf_counter() - record._started, 3)
+        _finish(record)
+
+
+def instrumented(name: str | None = None):
+    """Decorator recording every call of the function as a stage, named after the function by default."""
+    def decorate(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _fmt_bytes(n: int) -> str:
+    return f"{n / (1024 * 1024):,.1f}" if n else "-"
+
+
+def _fmt_rows(n: int | None) -> str:
+    return "-" if n is None else f"{n:,}"
+
+
+def summary_table(limit: int = 10, stages: list[StageMetrics] | None = None) -> str:
+    """
+    The slowest stages as a text table, slowest first.
+
+    Args:
+        limit (int): Stages to list
+        stages (list[StageMetrics], optional): Defaults to every stage recorded in this process
+    """
+    stages = records() if stages is None else stages
+    slowest = sorted(stages, key=lambda r: r.duration or 0.0, reverse=True)[:limit]
+    lines = [f"{'stage':<24} {'status':<7} {'seconds':>9} {'MB read':>9} {'MB written':>10} {'rows in':>11} {'rows out':>11}"]
+    for r in slowest:
+        lines.append(
+            f"{r.stage:<24} {r.status:<7} {r.duration or 0.0:>9.2f} {_fmt_bytes(r.bytes_read):>9} "
+            f"{_fmt_bytes(r.bytes_written):>10} {_fmt_rows(r.rows_in):>11} {_fmt_rows(r.rows_out):>11}"
+        )
+    return "\n".join(lines)
+
+
+def log_summary(limit: int = 10) -> None:
+    """Logs summary_table, one log line per row so it stays readable in the log file."""
+    stages = records()
+    if not stages:
+        return
+    logging.info(f"Slowest {min(limit, len(stages))} of {len(stages)} stages:")
+    for line in summary_table(limit, stages).splitlines():
+        logging.info(line)
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class MirrorCache:
+    """
+    Local mirror of remote files keyed by remote name, size and modify time.
+
+    A file only comes back out of the cache while the server still reports the same size and
+    modify time for it, so a republished file is always a miss. Total size is bounded by
+    max_bytes with least recently used files evicted first. Hits and misses are counted per
+    instance so callers can report them for a run.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, root: str | Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._entries = self._load_index()
+
+    @staticmethod
+    def key(name: str, size: int, modify: str) -> str:
+        return hashlib.sha1(f"{name}|{size}|{modify}".encode("utf-8")).hexdigest()
+
+    def _load_index(self) -> dict:
+        index_path = self.root.joinpath(self.INDEX_FILE)
+        if not index_path.exists():
+            return {}
+        try:
+            entries = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Mirror cache index unreadable, starting empty: {e}")
+            return {}
+        # files removed behind our back are dropped instead of served
+        return {k: v for k, v in entries.items() if self.root.joinpath(v["file"]).exists()}
+
+    def _save_index(self) -> None:
+        index_path = self.root.joinpath(self.INDEX_FILE)
+        tmp_path = index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._entries, indent=1), encoding="utf-8")
+        os.replace(tmp_path, index_path)
+
+    def get(self, name: str, size: int | None, modify: str | None) -> Path | None:
+        """Returns the cached copy of a remote file, or None (a miss) if it isn't cached."""
+        with self._lock:
+            entry = None
+            if size is not None and modify:
+                entry = self._entries.get(self.key(name, size, modify))
+            if entry is None:
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self._save_index()
+            self.hits += 1
+            return self.root.joinpath(entry["file"])
+
+    def put(self, name: str, size: int | None, modify: str | None, src: str | Path) -> Path:
+        """
+        Moves a downloaded file into the cache and evicts least recently used files over the size bound.
+        Files without a size or modify time can't be keyed and are left where they are.
+
+        Returns:
+            Path: Where the file now lives
+        """
+        if size is None or not modify:
+            return Path(src)
+        with self._lock:
+            key = self.key(name, size, modify)
+            file_name = f"{key}_{name}"
+            os.replace(src, self.root.joinpath(file_name))
+            self._entries[key] = {
+                "name": name,
+                "size": size,
+                "modify": modify,
+                "file": file_name,
+                "last_used": time.time(),
+            }
+            self._evict(keep=key)
+            self._save_index()
+            return self.root.joinpath(file_name)
+
+    def _evict(self, keep: str) -> None:
+        total = sum(e["size"] for e in self._entries.values())
+        for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                self.root.joinpath(entry["file"]).unlink()
+            except FileNotFoundError:
+                pass
+            del self._entries[key]
+            total -= entry["size"]
+            logging.info(f"Evicted {entry['name']} ({entry['size']} bytes) from mirror cache")
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(e["size"] for e in self._entries.values())
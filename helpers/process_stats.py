@@ -0,0 +1,82 @@
+import ctypes
+import re
+import sys
+
+"""
+Memory figures of the running process, for the timings the pipeline logs.
+"""
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    High-water mark of this process's resident memory (peak working set on Windows).
+
+    It only ever grows, so the peak of one step is only visible when nothing before it in the
+    process used more, or after reset_peak_rss where the platform allows it.
+
+    Returns:
+        int | None: Bytes, None where the platform doesn't report it
+    """
+    if sys.platform == "win32":
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                                         counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/status") as f:
+                return int(re.search(r"VmHWM:\s+(\d+) kB", f.read()).group(1)) * 1024
+        except (OSError, AttributeError):
+            pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Lowers peak_rss_bytes to the current RSS so the next reading covers only what runs after this.
+    Only Linux can do this. A new process on Windows starts with its own peak, on Linux it inherits
+    its parent's.
+
+    Returns:
+        bool: Whether the peak was reset
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def format_bytes(n: int | None) -> str:
+    """n as MB for log lines, 'n/a' when it is unknown."""
+    return "n/a" if n is None else f"{n / (1024 * 1024):,.1f} MB"
@@ -0,0 +1,200 @@
+import datetime
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Iterable
+
+import pandas as pd
+
+"""
+Run manifest: content hashes of every stage's inputs and outputs, kept as JSON per run folder (the
+rerun's output folder, the local cache for the daily run) so a rerun can skip the stages whose inputs
+haven't changed.
+
+A stage's key is the hash of its input files, its parameters, the source of the modules that
+implement it and the last runs of the stages it runs after. When the key matches the stage's last
+successful run and its outputs still hash to what that run wrote, the stage is skipped and what it
+returned then is returned again. Anything else, or a forced stage, runs it and records the result.
+"""
+
+MANIFEST_FILE = "run_manifest.json"
+FORCE_ALL = "all"
+
+# digests of files already hashed in this process, keyed on path, size and mtime so a stage's
+# outputs aren't read a second time as the next stage's inputs
+_digests: dict[tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path) -> str | None:
+    """sha256 of a file's content, None if it doesn't exist."""
+    path = os.fspath(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _digests_lock:
+        if memo_key in _digests:
+            return _digests[memo_key]
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    with _digests_lock:
+        _digests[memo_key] = digest
+    return digest
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """sha256 of a dataframe's columns and values, for lookups read from the database."""
+    h = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _code_digests(code: Iterable) -> dict[str, str | None]:
+    files = {}
+    for item in code:
+        # unwrapped, an instrumented function's code object is the metrics wrapper's
+        path = item if isinstance(item, (str, os.PathLike)) else inspect.getsourcefile(inspect.unwrap(item))
+        files[os.path.basename(path)] = file_digest(path)
+    return files
+
+
+def _key(parts: dict) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class RunManifest:
+    """
+    Stages recorded for one run folder, see the module docstring.
+
+    With no path nothing is loaded or saved and every stage runs, so callers can pass a disabled
+    manifest instead of checking for one.
+    """
+
+    def __init__(self, path: str | None, force: Iterable[str] = ()):
+        self.path = path
+        self.force = set(force)
+        self.skipped: list[str] = []
+        self._lock = threading.Lock()
+        self._stages = self._load()
+
+    def _load(self) -> dict:
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)["stages"]
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Run manifest {self.path} unreadable, every stage will run: {e}")
+            return {}
+
+    def _save(self) -> None:
+        # the first save of a run creates the folder, e.g. the local cache's run_manifests
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stages": self._stages}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def forced(self, name: str) -> bool:
+        return name in self.force or FORCE_ALL in self.force
+
+    def stage_key(self, name: str, inputs: Iterable = (), params: dict | None = None, code: Iterable = (),
+                  after: Iterable[str] = ()) -> tuple[str, dict]:
+        """
+        The key a stage would run under now.
+
+        Returns:
+            tuple[str, dict]: The key, and the input file digests that went into it
+        """
+        input_digests = {os.fspath(p): file_digest(p) for p in inputs}
+        with self._lock:
+            # the upstream run rather than its key, nothing here hashes what it left in the database
+            upstream = {a: [self._stages.get(a, {}).get(k) for k in ("key", "finished_at")] for a in after}
+        key = _key({"stage": name, "inputs": input_digests, "params": params or {},
+                    "code": _code_digests(code), "after": upstream})
+        return key, input_digests
+
+    def why_stale(self, name: str, key: str, input_digests: dict | None = None) -> str | None:
+        """
+        Why a stage has to run under key, None when its last successful run can be reused.
+        """
+        if self.path is None:
+            return "no manifest"
+        if self.forced(name):
+            return "forced"
+        with self._lock:
+            entry = self._stages.get(name)
+        if entry is None:
+            return "no previous run"
+        if entry["key"] != key:
+            changed = [p for p, d in (input_digests or {}).items() if entry["inputs"].get(p) != d]
+            return f"inputs changed: {changed}" if changed else "parameters, code or upstream stages changed"
+        changed = [p for p, d in entry["outputs"].items() if file_digest(p) != d]
+        if changed:
+            return f"outputs missing or changed since: {changed}"
+        return None
+
+    def is_current(self, name: str, inputs: Iterable = (), params: dict | None = None, code: Iterable = (),
+                   after: Iterable[str] = ()) -> bool:
+        """True when the stage would be skipped by run() with the same arguments."""
+        key, input_digests = self.stage_key(name, inputs, params, code, after)
+        return self.why_stale(name, key, input_digests) is None
+
+    def record(self, name: str, key: str, input_digests: dict, outputs: Iterable = (), value: Any = None) -> None:
+        """Records a successful run of a stage and saves the manifest. value has to be JSON serializable."""
+        if self.path is None:
+            return
+        entry = {
+            "key": key,
+            "inputs": input_digests,
+            "outputs": {os.fspath(p): file_digest(p) for p in outputs},
+            "value": value,
+            "finished_at": datetime.datetime.now().isoformat(timespec="milliseconds"),
+        }
+        with self._lock:
+            self._stages[name] = entry
+            try:
+                self._save()
+            except (OSError, TypeError) as e:
+                logging.warning(f"Could not save run manifest {self.path}: {e}")
+
+    def run(self, name: str, func: Callable[[], Any], inputs: Iterable = (),
+            outputs: Iterable | Callable[[Any], Iterable] = (), params: dict | None = None,
+            code: Iterable = (), after: Iterable[str] = ()) -> Any:
+        """
+        Runs func as stage name unless its last successful run can be reused.
+
+        Args:
+            name (str): Stage name, also what --force takes
+            func (callable): The stage, called with no arguments
+            inputs (iterable): Files the stage reads
+            outputs (iterable | callable): Files the stage writes, or a function of what func
+                returned giving them. Missing outputs are recorded as missing
+            params (dict, optional): Anything else the stage's result depends on, JSON serializable
+            code (iterable): Modules or source files implementing the stage, a change reruns it
+            after (iterable[str]): Stages whose result this one depends on without reading their
+                files, such as the SQL job that loads the tables a stage queries
+
+        Returns:
+            What func returned, or what it returned on the reused run
+        """
+        inputs = list(inputs)
+        key, input_digests = self.stage_key(name, inputs, params, code, after)
+        reason = self.why_stale(name, key, input_digests)
+        if reason is None:
+            with self._lock:
+                entry = self._stages[name]
+                self.skipped.append(name)
+            logging.info(f"Stage {name} skipped, inputs unchanged since its run at {entry['finished_at']}")
+            return entry["value"]
+
+        if self.path is not None:
+            logging.info(f"Stage {name} running: {reason}")
+        value = func()
+        self.record(name, key, input_digests, outputs(value) if callable(outputs) else outputs, value)
+        return value
@@ -0,0 +1,142 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+@dataclass
+class Stage:
+    """A unit of pipeline work, started once every stage it depends on has succeeded."""
+    name: str
+    func: Callable[[], Any]
+    depends_on: tuple[str, ...] = ()
+    timeout: float | None = None  # seconds
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str  # ok, failed, timed_out or skipped
+    duration: float | None = None
+    value: Any = None
+    error: BaseException | None = None
+
+
+class StageGraphError(RuntimeError):
+    """Raised after the graph has run when any stage did not succeed."""
+
+    def __init__(self, results: dict[str, StageResult]):
+        self.results = results
+        problems = [
+            f"{r.name} {r.status}" + (f" ({r.error})" if r.error else "")
+            for r in results.values() if r.status != "ok"
+        ]
+        super().__init__("Pipeline stages did not complete: " + "; ".join(problems))
+
+
+def _check_graph(stages: list[Stage]) -> None:
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names in {names}")
+    for stage in stages:
+        unknown = [d for d in stage.depends_on if d not in names]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}")
+
+    # Kahn's algorithm, anything left over sits on a cycle
+    remaining = {s.name: set(s.depends_on) for s in stages}
+    while True:
+        ready = [n for n, deps in remaining.items() if not deps]
+        if not ready:
+            break
+        for n in ready:
+            del remaining[n]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Stage dependencies form a cycle between {sorted(remaining)}")
+
+
+def run_stage_graph(stages: list[Stage], max_workers: int = 4) -> dict[str, StageResult]:
+    """
+    Runs stages in a thread pool as soon as their dependencies have succeeded, so independent
+    stages overlap and the wall time comes down to the critical path.
+
+    A stage that raises or runs past its timeout fails, and everything downstream of it is skipped.
+    Python threads can't be killed, so a timed out stage is abandoned rather than stopped.
+
+    Returns:
+        dict[str, StageResult]: Result of every stage, in the order given
+
+    Raises:
+        ValueError: The graph has duplicate names, unknown dependencies or a cycle
+        StageGraphError: Any stage failed, timed out or was skipped
+    """
+    _check_graph(stages)
+    by_name = {s.name: s for s in stages}
+    results: dict[str, StageResult] = {}
+    running: dict[Future, tuple[Stage, float]] = {}
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage")
+
+    def submit_ready():
+        # skipping one stage can make its dependents skippable too, go round until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for stage in stages:
+                if stage.name in results or any(stage is s for s, _ in running.values()):
+                    continue
+                dep_status = [results[d].status if d in results else None for d in stage.depends_on]
+                if any(status not in (None, "ok") for status in dep_status):
+                    results[stage.name] = StageResult(stage.name, "skipped")
+                    logging.warning(f"Stage {stage.name} skipped, an upstream stage did not succeed")
+                    changed = True
+                elif all(status == "ok" for status in dep_status):
+                    logging.info(f"Stage {stage.name} started")
+                    running[pool.submit(stage.func)] = (stage, time.perf_counter())
+                    changed = True
+
+    abandoned = False
+    try:
+        submit_ready()
+        while running:
+            now = time.perf_counter()
+            deadlines = [
+                started + stage.timeout - now
+                for stage, started in running.values() if stage.timeout is not None
+            ]
+            wait_for = max(0.0, min(deadlines)) if deadlines else None
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+
+            for future in done:
+                stage, started = running.pop(future)
+                duration = now - started
+                error = future.exception()
+                if error is None:
+                    results[stage.name] = StageResult(stage.name, "ok", duration, future.result())
+                    logging.info(f"Stage {stage.name} finished in {duration:.1f}s")
+                else:
+                    results[stage.name] = StageResult(stage.name, "failed", duration, error=error)
+                    logging.error(f"Stage {stage.name} failed after {duration:.1f}s: {error}")
+
+            for future, (stage, started) in list(running.items()):
+                if stage.timeout is not None and now - started >= stage.timeout:
+                    running.pop(future)
+                    abandoned = True
+                    error = TimeoutError(f"exceeded {stage.timeout}s")
+                    results[stage.name] = StageResult(stage.name, "timed_out", now - started, error=error)
+                    logging.error(f"Stage {stage.name} timed out after {stage.timeout}s")
+
+            submit_ready()
+    finally:
+        pool.shutdown(wait=not abandoned, cancel_futures=True)
+
+    ordered = {name: results[name] for name in by_name}
+    for r in ordered.values():
+        duration = f"{r.duration:.1f}s" if r.duration is not None else "-"
+        logging.info(f"Stage summary: {r.name:<20} {r.status:<10} {duration}")
+    if any(r.status != "ok" for r in ordered.values()):
+        raise StageGraphError(ordered)
+    return ordered
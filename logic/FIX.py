@@ -1,64 +1,138 @@
-import csv, getpass
+import csv, getpass, logging
+from itertools import islice
+import numpy as np
+import pandas as pd
+from helpers import metrics
 from helpers.context import DailyFilesContext
 
-def Fixes():
+# rows handed to writerows at a time, bounds memory while keeping the write calls few
+WRITE_BATCH_SIZE = 10000
+
+def number_rows(rows, id_start=6300):
+    """
+    Appends the line number and order id to each row as soon as they are known.
+
+    Args:
+        rows (iterable[list[str]]): Transaction rows with the order number in the first column
+        id_start (int): Order id given to the first order seen
+
+    Yields:
+        list: The row with its duplicate count (1, 2, 3... per order number) and order id appended
+    """
+    orddict = {}  # Dictionary to track number of duplicates for each order number
+    ordIddict = {}  # Dictionary to track unique IDs for each order
+    for row in rows:
+        ordnum = str(row[0])  # Get order number from first column
+
+        # Track and number duplicate orders
+        orddict[ordnum] = orddict.get(ordnum, 0) + 1
+        row.append(orddict[ordnum])
+
+        # Add unique ID for each order
+        if ordnum not in ordIddict:
+            ordIddict[ordnum] = id_start  # Create new ID for this order
+            id_start += 1  # Increment ID counter for next new order
+        row.append(ordIddict[ordnum])
+        yield row
+
+def assign_line_nums(ordnums, id_start=6300):
+    """
+    Vectorized number_rows: the same line numbers and order ids for a whole column at once.
+
+    pd.factorize hands out codes in first-seen order, so code + id_start is the order id, and a
+    groupby cumcount on those codes is the running count per order. Missing order numbers count
+    as one order between them, as they did as a dict key.
+
+    Args:
+        ordnums (pd.Series | array-like): Order number of each row, in file order
+        id_start (int): Order id given to the first order seen
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Line numbers (1, 2, 3... per order number) and order ids
+    """
+    codes, _ = pd.factorize(pd.Series(ordnums), use_na_sentinel=False)
+    line_nums = pd.Series(codes).groupby(codes).cumcount().to_numpy() + 1
+    order_ids = codes.astype(np.int64) + id_start
+    return line_nums, order_ids
+
+def number_frame(df, ordnum_col=0, id_start=6300):
+    """
+    Dataframe version of Fixes' numbering, for callers that already hold the transactions in pandas.
+    Order numbers are compared as text like Fixes does.
+
+    Args:
+        df (pd.DataFrame): Transaction rows in file order
+        ordnum_col: Label of the order number column
+        id_start (int): Order id given to the first order seen
+
+    Returns:
+        pd.DataFrame: A copy of df with Line_num and Order_id appended
+    """
+    line_nums, order_ids = assign_line_nums(df[ordnum_col].astype(str), id_start)
+    df = df.copy()
+    df["Line_num"] = line_nums
+    df["Order_id"] = order_ids
+    return df
+
+@metrics.instrumented()
+def Fixes(ipsPath=None, ipsOutPath=None):
     """
     Processes the IPS daily transaction file to add line numbers and unique IDs.
-    
+
     This function:
     1. Reads the input file (IPS_DAILY_NO_LINE_NUM.TXT)
     2. Processes each order:
        - Tracks and numbers duplicate orders (e.g., if order #123 appears 3 times, they get numbers 1,2,3)
        - Generates unique IDs starting from 6300
     3. Writes the processed data to IPS_DAILY.TXT
-    
+
     The input file is tab-delimited and contains order information.
     The output file maintains the same format but with added duplicate order numbers and IDs.
+    Rows are streamed through and written in batches of WRITE_BATCH_SIZE, so memory does not grow with the file.
+
+    Args:
+        ipsPath (str, optional): Input file, defaults to IPS_DAILY_NO_LINE_NUM.TXT in Daily Files
+        ipsOutPath (str, optional): Output file, defaults to IPS_DAILY.TXT in Daily Files
     """
     # Define input and output file paths
-    ipsPath = DailyFilesContext.fileserver_base() + '\\vol2\\FOXPRO\\TestFiles\\Daily Files\\IPS_DAILY_NO_LINE_NUM.TXT'
-    ipsOutPath = DailyFilesContext.fileserver_base() + '\\vol2\\FOXPRO\\TestFiles\\Daily Files\\IPS_DAILY.TXT'
-    print(f"User: {getpass.getuser()}")
+    if ipsPath is None:
+        ipsPath = DailyFilesContext.fileserver_base() + '\\vol2\\FOXPRO\\TestFiles\\Daily Files\\IPS_DAILY_NO_LINE_NUM.TXT'
+    if ipsOutPath is None:
+        ipsOutPath = DailyFilesContext.fileserver_base() + '\\vol2\\FOXPRO\\TestFiles\\Daily Files\\IPS_DAILY.TXT'
+    logging.info(f"Fixes running as user: {getpass.getuser()}")
+    logging.info(f"Numbering {ipsPath} into {ipsOutPath}")
+    output_started = False
     try:
         # Open input and output files
         with open(ipsPath, 'r', encoding='utf-8',errors='replace') as ipscsv:
             with open(ipsOutPath, 'w', encoding='utf-8', errors='replace') as ipsoutcsv:
+                output_started = True
                 # Set up CSV readers and writers with tab delimiter
                 ipsreader = csv.reader(ipscsv, delimiter='\t')
                 ipswriter = csv.writer(ipsoutcsv, delimiter='\t', lineterminator='\n')
-                
-                # Initialize tracking variables
-                ordnum = ''  # Current order number
-                orddict = {}  # Dictionary to track number of duplicates for each order number
-                ordIddict = {}  # Dictionary to track unique IDs for each order
-                id_start = 6300  # Starting point for unique IDs
-                rows = []  # List to store processed rows
-                
-                # Process each row in the input file
-                for row in ipsreader:
-                    ordnum = str(row[0])  # Get order number from first column
-                    
-                    # Track and number duplicate orders
-                    if ordnum in orddict:
-                        orddict[ordnum] += 1  # Increment duplicate counter
-                        row.append(orddict[ordnum])  # Add duplicate number to row
-                    else:
-                        orddict[ordnum] = 1  # First occurrence of this order
-                        row.append(orddict[ordnum])  # Add 1 as first occurrence
-
-                    # Add unique ID for each order
-                    if ordnum in ordIddict:
-                        row.append(ordIddict[ordnum])  # Use existing ID for this order
-                    else:
-                        ordIddict[ordnum] = id_start  # Create new ID for this order
-                        row.append(ordIddict[ordnum])
-                        id_start += 1  # Increment ID counter for next new order
-                    
-                    rows.append(row)
-                
-                # Write all processed rows to output file
-                ipswriter.writerows(rows)
+
+                numbered = number_rows(ipsreader)
+                written = 0
+                while True:
+                    batch = list(islice(numbered, WRITE_BATCH_SIZE))
+                    if not batch:
+                        break
+                    ipswriter.writerows(batch)
+                    written += len(batch)
+        logging.info(f"Fixes wrote {written} rows to {ipsOutPath}")
+        metrics.current().add(rows_in=written, rows_out=written).read_file(ipsPath).wrote_file(ipsOutPath)
     except PermissionError as e:
-        print(f"PermissionError in Fixes: {e}")
+        logging.error(f"PermissionError in Fixes: {e}")
+        _discard_partial_output(ipsOutPath, output_started)
     except Exception as e:
-        print(f"An unexpected error occurred in Fixes: {e}")
\ No newline at end of file
+        logging.error(f"An unexpected error occurred in Fixes: {e}")
+        _discard_partial_output(ipsOutPath, output_started)
+
+def _discard_partial_output(ipsOutPath, output_started):
+    """A failed run leaves an empty output file, as it did when every row was written at the end."""
+    if not output_started:
+        return
+    try:
+        open(ipsOutPath, 'w').close()
+    except OSError as e:
+        logging.error(f"Could not clear partial output {ipsOutPath}: {e}")
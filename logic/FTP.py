@@ -1,10 +1,26 @@
-import ftplib, datetime, os, shutil, time, fnmatch, getpass
+import ftplib, datetime, os, shutil, time, fnmatch, getpass, glob, codecs, io
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
+from typing import NamedTuple
 from email.message import EmailMessage
 import smtplib
 from helpers.ENV import CREDS
 from helpers.ENV import EMAIL_CONFIG
+from helpers import metrics
 from helpers.context import DailyFilesContext
+from helpers.mirror_cache import MirrorCache
+
+FTP_HOST = 'ftp.ingrampublisherservices.com'
+FTP_PORT = 21
+# independent FTP sessions used for downloads, 1 keeps the serial single-connection pull
+FTP_SESSIONS = int(os.getenv("FTP_SESSIONS", "1"))
+# size bound of the local mirror of Ingram files used to skip downloads on reruns, 0 disables it
+FTP_CACHE_MAX_MB = int(os.getenv("FTP_CACHE_MAX_MB", "2048"))
+# abort a CDT/CDP transfer at the first record not dated today instead of sending the warning email
+FTP_STRICT_DATES = os.getenv("FTP_STRICT_DATES", "").lower() in ("1", "true", "yes")
+# attempts per file before a dropped transfer is given up on, each retry resumes from the partial file
+FTP_RETRIES = int(os.getenv("FTP_RETRIES", "3"))
 
 def send_warning_email():
     message = EmailMessage()
@@ -18,61 +34,453 @@ def send_warning_email():
             server.send_message(message)
             logging.info("Email sent successfully")
 
-def FTP_pull(day):
+def _ftp_session():
+    """
+    Opens a logged in FTP session on the Ingram server, positioned in the outgoing directory.
+
+    Returns:
+        ftplib.FTP: The connected session
+    """
+    conn = ftplib.FTP()
+    conn.connect(FTP_HOST, FTP_PORT)
+    try:
+        conn.login(CREDS['USER'], CREDS['PASS'])
+        conn.cwd('outgoing')
+    except ftplib.all_errors:
+        _ftp_close(conn)
+        raise
+    return conn
+
+def _ftp_close(conn):
+    """Quits an FTP session, falling back to closing the socket if the server is already gone."""
+    if conn is None or conn.sock is None:
+        return
+    try:
+        conn.quit()
+    except ftplib.all_errors:
+        conn.close()
+
+def _mirror_cache():
+    """Returns the local mirror cache of Ingram files, or None when FTP_CACHE_MAX_MB disables it."""
+    if FTP_CACHE_MAX_MB <= 0:
+        return None
+    return MirrorCache(DailyFilesContext.ftp_mirror_path(), FTP_CACHE_MAX_MB * 1024 * 1024)
+
+def _materialize(src, dests):
+    """
+    Lays down local copies of a staged download, hardlinking where the filesystem allows it
+    and falling back to a plain copy (e.g. local staging to the fileserver).
+
+    Args:
+        src (str): Path of the staged file
+        dests (list[str]): Paths the file should appear at
+    """
+    for dest in dests:
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(src, dest)
+            logging.info(f"Linked {src} to {dest}")
+        except OSError:
+            shutil.copyfile(src, dest)
+            logging.info(f"Copied {src} to {dest}")
+
+class FileDateError(ValueError):
+    """Raised by a strict DateValidator to abort a transfer at the first wrongly dated record."""
+
+
+class DateValidator:
+    """
+    Checks that field 1 of every record of a CDT/CDP equals the expected file date while the bytes
+    arrive through the retrbinary callback, counting records along the way.
+
+    Lines split across blocks are carried over to the next block, blank lines are ignored.
+    A strict validator raises FileDateError at the first bad record, which aborts the transfer.
+    """
+
+    def __init__(self, expected_date, strict=False):
+        self.expected = expected_date.encode("ascii")
+        self.strict = strict
+        self.reset()
+
+    def reset(self):
+        self.rows = 0
+        self.bad_rows = 0
+        self.first_bad = None
+        self._tail = b""
+
+    def wrap(self, write):
+        """Returns a retrbinary callback that validates each block and then hands it to write."""
+        def callback(data):
+            self.feed(data)
+            write(data)
+        return callback
+
+    def feed(self, data):
+        lines = (self._tail + data).split(b"\n")
+        self._tail = lines.pop()
+        for line in lines:
+            self._check(line)
+
+    def feed_file(self, path):
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(FIX_CHUNK_SIZE), b""):
+                self.feed(block)
+
+    def finish(self):
+        """Checks the last line if the file didn't end with a newline, returns the verdict."""
+        if self._tail:
+            self._check(self._tail)
+            self._tail = b""
+        return self.ok
+
+    @property
+    def ok(self):
+        return self.bad_rows == 0
+
+    def _check(self, line):
+        line = line.strip()
+        if not line:
+            return
+        self.rows += 1
+        fields = line.split(b",", 2)
+        if len(fields) < 2 or fields[1] != self.expected:
+            self.bad_rows += 1
+            if self.first_bad is None:
+                self.first_bad = self.rows
+            if self.strict:
+                found = fields[1].decode("ascii", errors="replace") if len(fields) > 1 else None
+                raise FileDateError(f"Record {self.rows} is dated {found} instead of {self.expected.decode()}")
+
+def _retrieve(conn, remote, local_path, attempts=None, validator=None):
+    """
+    Downloads a remote file into local_path through a partial file that survives failures.
+
+    A dropped connection reconnects and resumes from the bytes already on disk with REST + RETR,
+    so recovering a large file only costs the missing bytes. A server that refuses REST gets a full
+    transfer in the same attempt and no REST after that. The partial file is only renamed to
+    local_path once its size matches the size the server reported for it.
+
+    Args:
+        conn (ftplib.FTP | None): Session to use, a new one is opened if None or after a failure
+        remote (RemoteFile): The remote file, size None skips the size verification
+        local_path (str): Where the verified file should end up
+        attempts (int, optional): Transfer attempts before giving up, defaults to FTP_RETRIES
+        validator (DateValidator, optional): Checks records as the bytes arrive, resumed transfers
+            first replay the partial file through it
+
+    Returns:
+        ftplib.FTP | None: The session to keep using, which may be a reconnected one
+    """
+    if attempts is None:
+        attempts = FTP_RETRIES
+    # the modify time keeps a republished file from resuming onto bytes of the old one
+    part_path = f"{local_path}.{remote.modify}.part" if remote.modify else f"{local_path}.part"
+    for stale in glob.glob(glob.escape(local_path) + ".*part"):
+        if stale != part_path:
+            os.remove(stale)
+
+    # cleared when the server refuses REST, every transfer after that starts from byte 0
+    resume = True
+    attempt = 1
+    while attempt <= attempts:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset and not resume:
+            os.remove(part_path)
+            offset = 0
+        if remote.size is not None and offset > remote.size:
+            logging.warning(f"Partial {part_path} is larger than {remote.name} on the server, starting over")
+            os.remove(part_path)
+            offset = 0
+        if validator is not None:
+            validator.reset()
+            if offset:
+                validator.feed_file(part_path)
+        if remote.size is not None and offset == remote.size:
+            break
+        try:
+            if conn is None:
+                conn = _ftp_session()
+            if offset:
+                logging.info(f"Resuming {remote.name} at byte {offset} of {remote.size}")
+            else:
+                logging.info(f"Downloading {remote.name} to {local_path}")
+            with open(part_path, 'ab') as f:
+                callback = f.write if validator is None else validator.wrap(f.write)
+                conn.retrbinary("RETR " + remote.name, callback, rest=offset or None)
+        except FileDateError:
+            # a file with the wrong dates must not be resumed or cached on the next run
+            _ftp_close(conn)
+            os.remove(part_path)
+            raise
+        except ftplib.error_perm as e:
+            if offset and str(e)[:3] in ("500", "501", "502", "504"):
+                # server doesn't do REST, the only way forward is a full transfer. Nothing was
+                # transferred so the full transfer is still this attempt
+                logging.warning(f"Server refused REST for {remote.name} ({e}), restarting from byte 0")
+                resume = False
+                continue
+            raise
+        except ftplib.all_errors as e:
+            logging.warning(f"Transfer of {remote.name} failed on attempt {attempt} of {attempts}: {e}")
+            if conn is not None:
+                _ftp_close(conn)
+                conn = None
+            if attempt == attempts:
+                raise
+            attempt += 1
+            continue
+        if remote.size is None:
+            break
+        if os.path.getsize(part_path) == remote.size:
+            break
+        logging.warning(
+            f"{remote.name} ended at {os.path.getsize(part_path)} of {remote.size} bytes "
+            f"on attempt {attempt} of {attempts}"
+        )
+        attempt += 1
+
+    received = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if remote.size is not None and received != remote.size:
+        raise RuntimeError(
+            f"Size check failed for {remote.name}: received {received} bytes, server reported {remote.size}"
+        )
+    os.replace(part_path, local_path)
+    logging.info(f"Verified {remote.name}: {received} bytes")
+    return conn
+
+def _download_parallel(jobs, sessions):
+    """
+    Downloads files over a pool of independent FTP sessions.
+
+    Each worker opens its own session and keeps pulling jobs off a shared queue until it is empty,
+    so the wall clock time is roughly that of the largest file instead of the sum of all of them.
+
+    Args:
+        jobs (list[tuple[RemoteFile, str, DateValidator | None]]): (remote file, local path, validator) to download
+        sessions (int): Maximum number of concurrent FTP sessions
+    """
+    pending = Queue()
+    for job in jobs:
+        pending.put(job)
+
+    def worker():
+        conn = _ftp_session()
+        try:
+            while True:
+                try:
+                    remote, local_path, validator = pending.get_nowait()
+                except Empty:
+                    return
+                conn = _retrieve(conn, remote, local_path, validator=validator)
+        finally:
+            if conn is not None:
+                _ftp_close(conn)
+
+    width = max(1, min(sessions, len(jobs)))
+    logging.info(f"Downloading {len(jobs)} files over {width} FTP sessions")
+    with ThreadPoolExecutor(max_workers=width) as pool:
+        futures = [pool.submit(worker) for _ in range(width)]
+        for future in futures:
+            future.result()
+
+class RemoteFile(NamedTuple):
+    name: str
+    size: int | None
+    modify: str | None  # YYYYMMDDHHMMSS in server time, the same shape MDTM returns
+
+
+_LIST_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+def _parse_list_line(line):
+    """
+    Parses one line of a LIST response, either unix style
+    ('-rw-r--r-- 1 owner group 1234 Mar 12 10:30 name') or DOS/IIS style ('03-12-25  10:30AM  1234 name').
+    LIST only carries minute precision so the seconds are always 00.
+
+    Returns:
+        RemoteFile | None: The parsed file, None for directories and lines that can't be parsed
+    """
+    parts = line.split(None, 8)
+    if len(parts) == 9 and parts[0].startswith("-"):
+        size, month, dom, year_or_time, name = parts[4], parts[5], parts[6], parts[7], parts[8]
+        month_num = _LIST_MONTHS.get(month[:3].lower())
+        if month_num is None or not size.isdigit():
+            return None
+        if ":" in year_or_time:
+            now = datetime.datetime.now()
+            year = now.year
+            # unix LIST drops the year for the last six months, a date ahead of today is from last year
+            if (month_num, int(dom)) > (now.month, now.day + 1):
+                year -= 1
+            hour, minute = year_or_time.split(":")
+        else:
+            year, hour, minute = int(year_or_time), "00", "00"
+        return RemoteFile(name, int(size), f"{year:04d}{month_num:02d}{int(dom):02d}{int(hour):02d}{int(minute):02d}00")
+
+    parts = line.split(None, 3)
+    if len(parts) == 4 and parts[2].isdigit():
+        try:
+            stamp = datetime.datetime.strptime(f"{parts[0]} {parts[1]}", "%m-%d-%y %I:%M%p")
+        except ValueError:
+            return None
+        return RemoteFile(parts[3], int(parts[2]), stamp.strftime("%Y%m%d%H%M%S"))
+    return None
+
+def _list_outgoing(conn):
+    """
+    Lists the current FTP directory in a single round trip, using MLSD and falling back to parsing LIST
+    for servers that don't support it.
+
+    Returns:
+        RemoteIndex: Index of the files with their sizes and modify times
+    """
+    try:
+        files = [
+            RemoteFile(name, int(facts["size"]) if "size" in facts else None, facts.get("modify"))
+            for name, facts in conn.mlsd()
+            if facts.get("type", "file") == "file"
+        ]
+        precise = True
+        logging.info(f"MLSD listed {len(files)} files")
+    except ftplib.error_perm as e:
+        logging.info(f"MLSD not supported ({e}), falling back to LIST")
+        lines = []
+        conn.retrlines("LIST", lines.append)
+        files = [f for f in map(_parse_list_line, lines) if f is not None]
+        precise = False
+        logging.info(f"LIST listed {len(files)} files")
+    return RemoteIndex(files, precise)
+
+def _index_key(name):
+    """
+    Buckets a file name or Name_Creator pattern by file type and date,
+    e.g. '0312????.CDT' -> ('CDT', '0312') and 'TransactionFile20250312.txt' -> ('Trans', '20250312').
+    """
+    stem, ext = os.path.splitext(name)
+    ext = ext[1:].upper()
+    if ext in ("CDT", "CDP"):
+        return (ext, stem[:4])
+    if stem.lower().startswith("transactionfile"):
+        return ("Trans", stem[len("TransactionFile"):])
+    return (ext, "")
+
+class RemoteIndex:
+    """
+    In-memory index of a remote directory listing keyed by file type and date,
+    so Name_Creator patterns resolve without any further FTP commands.
+    """
+
+    def __init__(self, files, precise=True):
+        # precise is False when the modify times came from LIST and only go down to the minute
+        self.precise = precise
+        self.files = {f.name: f for f in files}
+        self._buckets = {}
+        for f in files:
+            self._buckets.setdefault(_index_key(f.name), []).append(f)
+
+    def __len__(self):
+        return len(self.files)
+
+    def get(self, name):
+        return self.files.get(name)
+
+    def matching(self, pattern):
+        return [f for f in self._buckets.get(_index_key(pattern), []) if fnmatch.fnmatch(f.name, pattern)]
+
+    def latest(self, pattern, conn=None):
+        """
+        Returns the most recently modified file matching pattern, or None if nothing matches.
+        When the listing can't tell candidates apart (LIST precision or no modify fact) and a
+        connection is given, only the tied candidates are compared with MDTM.
+        """
+        candidates = self.matching(pattern)
+        if not candidates:
+            return None
+        newest = max(candidates, key=lambda f: f.modify or "")
+        if newest.modify is None:
+            unresolved = candidates
+        elif not self.precise:
+            unresolved = [f for f in candidates if f.modify == newest.modify]
+        else:
+            unresolved = [newest]
+        if conn is not None and len(unresolved) > 1:
+            stamps = {f.name: conn.voidcmd("MDTM " + f.name).split()[-1] for f in unresolved}
+            logging.info(f"Resolved listing tie for {pattern} with MDTM: {stamps}")
+            newest = max(unresolved, key=lambda f: stamps[f.name])
+        return newest
+
+def _day_files(index, day, conn=None):
+    """The day's latest CDT and CDP and its TransactionFile in index, None for any not on the server."""
+    return {
+        "CDT": index.latest(Name_Creator("CDT", day), conn),
+        "CDP": index.latest(Name_Creator("CDP", day), conn),
+        "Trans": index.get(Name_Creator("Trans", day)),
+    }
+
+def remote_day_files(day):
+    """
+    Lists outgoing and returns the files FTP_pull would select for day, without transferring anything.
+
+    Returns:
+        dict: RemoteFile (name, size, modify) of the day's CDT, CDP and Trans, None for any not on the server
+    """
+    conn = _ftp_session()
+    try:
+        return _day_files(_list_outgoing(conn), day, conn)
+    finally:
+        _ftp_close(conn)
+
+@metrics.instrumented()
+def FTP_pull(day, path: str | None = None, sessions: int | None = None):
     """
     Downloads the latest CDT, CDP, and Transaction files from the Ingram Publisher Services FTP server.
+    Each remote file is retrieved once into local staging and the daily folder, INPRO.CDP and logs
+    copies are made from the staged file.
     
     Args:
         day (datetime): The date to process files for
+        path (str, optional): Daily folder to download into, defaults to the fileserver daily folder
+        sessions (int, optional): Number of concurrent FTP sessions, defaults to FTP_SESSIONS.
+            With more than one session the files are fetched in parallel over independent connections.
         
     Returns:
         dict: Dictionary containing the names of downloaded CDT and CDP files
     """
     logging.info("Starting FTP_pull function")
-    conn = ftplib.FTP('ftp.ingrampublisherservices.com')
+    if sessions is None:
+        sessions = FTP_SESSIONS
+    conn = ftplib.FTP()
+    conn.connect(FTP_HOST, FTP_PORT)
     curr_date = datetime.datetime.now().strftime("%Y%m%d")
     try:
-        dirPath = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\" + Name_Creator("Folder", day)
-        log_dir_path = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\" + Name_Creator("Folder", day) + "\\logs"
+        if not path:
+            dirPath = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\" + Name_Creator("Folder", day)
+        else:
+            dirPath = path
+        log_dir_path = os.path.join(dirPath, "logs")
         logging.info(f"Directory path for files: {dirPath}")
         logging.info(f"Connecting to FTP as user a20V0190")
         
         conn.login(CREDS['USER'], CREDS['PASS'])
         conn.cwd('outgoing')
-        names = conn.nlst() 
-        logging.info(f"Found {len(names)} files in FTP directory")
+        index = _list_outgoing(conn)
+        logging.info(f"Found {len(index)} files in FTP directory")
 
         cdt_pattern = Name_Creator("CDT", day)
         cdp_pattern = Name_Creator("CDP", day)
         logging.info(f"Looking for CDT files matching: {cdt_pattern}")
         logging.info(f"Looking for CDP files matching: {cdp_pattern}")
-        
-        cdtNames = fnmatch.filter(names, cdt_pattern)
-        cdpNames = fnmatch.filter(names, cdp_pattern)
-        
-        logging.info(f"Found {len(cdtNames)} CDT files matching pattern")
-        logging.info(f"Found {len(cdpNames)} CDP files matching pattern")
-
-        latest_cdtname = None
-        latest_cdpname = None
-        latest_cdttime = None
-        latest_cdptime = None
-
-        for cdt in cdtNames:
-            cdttime = conn.voidcmd("MDTM " + cdt)
-            logging.info(f"CDT file {cdt} has timestamp {cdttime}")
-            if (latest_cdttime is None) or (cdttime > latest_cdttime):
-                latest_cdtname = cdt
-                latest_cdttime = cdttime
-                logging.info(f"New latest CDT: {latest_cdtname}")
-
-        for cdp in cdpNames:
-            cdptime = conn.voidcmd("MDTM " + cdp)
-            logging.info(f"CDP file {cdp} has timestamp {cdptime}")
-            if (latest_cdptime is None) or (cdptime > latest_cdptime):
-                latest_cdpname = cdp
-                latest_cdptime = cdptime
-                logging.info(f"New latest CDP: {latest_cdpname}")
+
+        for remote in index.matching(cdt_pattern) + index.matching(cdp_pattern):
+            logging.info(f"File {remote.name} has timestamp {remote.modify} and size {remote.size}")
+
+        selected = _day_files(index, day, conn)
+        latest_cdt = selected["CDT"]
+        latest_cdp = selected["CDP"]
+        latest_cdtname = latest_cdt.name if latest_cdt else None
+        latest_cdpname = latest_cdp.name if latest_cdp else None
 
         logging.info(f"Selected latest CDT: {latest_cdtname}")
         logging.info(f"Selected latest CDP: {latest_cdpname}")
@@ -81,67 +489,92 @@ def FTP_pull(day):
         logging.info(f"Transaction file name: {trans_name}")
         
         """
-        Download all the files to dailyfiles dir for use
+        Retrieve each remote file once into local staging, then lay down the dailyfiles dir,
+        INPRO.CDP and logs copies from the staged file
         """
-        logging.info(f"Downloading {latest_cdtname} to {dirPath}")
-        with open(dirPath + "\\" + str(latest_cdtname), 'wb') as CDT:
-            conn.retrbinary("RETR " + str(latest_cdtname), CDT.write)
-        
-        logging.info(f"Downloading {latest_cdpname} to {dirPath}")
-        with open(dirPath + "\\" + str(latest_cdpname), 'wb') as CDP:
-            conn.retrbinary("RETR " + str(latest_cdpname), CDP.write)
-        
-        logging.info(f"Creating INPRO.CDP from {latest_cdpname}")
-        with open(dirPath + "\\INPRO.CDP", 'wb') as INPRO:
-            conn.retrbinary("RETR " + str(latest_cdpname), INPRO.write)
-        
-        logging.info(f"Downloading {trans_name}")
-        with open(dirPath + "\\" + trans_name, 'wb') as Trans:
-            conn.retrbinary("RETR " + trans_name, Trans.write)
-
-        """
-        Copy all the files for retrbinary 
-        """
-
-        logging.info(f"Donloading {latest_cdtname} to logs")
-        with open(os.path.join(dirPath,f'logs\\{latest_cdtname}'),'wb') as CDTCOPY:
-            conn.retrbinary(f"RETR {latest_cdtname}", CDTCOPY.write)
-
-        logging.info(f"Downdloading {latest_cdpname} to logs")
-        with open(os.path.join(dirPath,f"logs\\{latest_cdpname}"),'wb') as CDPCOPY:
-            conn.retrbinary(f"RETR {latest_cdpname}",CDPCOPY.write)
-
-        logging.info(f"Downloading {trans_name} to logs")
-        with open(os.path.join(dirPath,f"logs\\{trans_name}"),'wb') as TRANSFILE:
-            conn.retrbinary(f"RETR {trans_name}",TRANSFILE.write)
-
-        
-        # All downloads complete we now must delete the files
-        logging.info("All files downloaded successfully, now deleting from FTP server")
-        
-        conn.quit()
+        copies = {
+            str(latest_cdtname): [
+                os.path.join(dirPath, str(latest_cdtname)),
+                os.path.join(log_dir_path, str(latest_cdtname)),
+            ],
+            str(latest_cdpname): [
+                os.path.join(dirPath, str(latest_cdpname)),
+                os.path.join(dirPath, "INPRO.CDP"),
+                os.path.join(log_dir_path, str(latest_cdpname)),
+            ],
+            trans_name: [
+                os.path.join(dirPath, trans_name),
+                os.path.join(log_dir_path, trans_name),
+            ],
+        }
+        staging_dir = DailyFilesContext.ftp_staging_path().joinpath(Name_Creator("Folder", day))
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        # files already mirrored locally with the same size and modify time are served without a RETR,
+        # partial downloads stay in staging so a failed run resumes them instead of pulling again
+        cache = _mirror_cache()
+        remotes = [index.get(remote_name) or RemoteFile(remote_name, None, None) for remote_name in copies]
+        # Check the dates to make sure Ingram didn't make a mistake, every CDT/CDP record is checked
+        # as it arrives so the verdict is ready when the transfer completes
+        validators = {
+            str(latest_cdtname): DateValidator(curr_date, strict=FTP_STRICT_DATES),
+            str(latest_cdpname): DateValidator(curr_date, strict=FTP_STRICT_DATES),
+        }
+
+        def lay_down(name, source):
+            _materialize(source, copies[name])
+            size = os.path.getsize(source)
+            metrics.current().add(bytes_read=size, bytes_written=size * len(copies[name]))
+
+        # every file is laid down as soon as it is served or put, a mirror cache smaller than the
+        # day's files evicts earlier files of this same pull on the next put
+        jobs = []
+        for remote in remotes:
+            cached = cache.get(remote.name, remote.size, remote.modify) if cache else None
+            if cached is not None:
+                logging.info(f"Serving {remote.name} from mirror cache")
+                if remote.name in validators:
+                    validators[remote.name].feed_file(cached)
+                lay_down(remote.name, str(cached))
+            else:
+                jobs.append((remote, str(staging_dir.joinpath(remote.name)), validators.get(remote.name)))
+
+        if sessions > 1 or not jobs:
+            # the control connection would sit idle through the transfers, close it first
+            _ftp_close(conn)
+            if jobs:
+                _download_parallel(jobs, sessions)
+        else:
+            for remote, local_path, validator in jobs:
+                conn = _retrieve(conn, remote, local_path, validator=validator)
+            if conn is not None:
+                conn.quit()
+
+        for remote, local_path, _ in jobs:
+            lay_down(remote.name, str(cache.put(remote.name, remote.size, remote.modify, local_path)) if cache else local_path)
+        for remote, local_path, _ in jobs:
+            if os.path.exists(local_path):
+                os.remove(local_path)
+        if cache:
+            logging.info(
+                f"FTP mirror cache: {cache.hits} hits, {cache.misses} misses, "
+                f"{cache.size_bytes} of {cache.max_bytes} bytes used"
+            )
+
+        logging.info("All files downloaded successfully")
         logging.info("FTP connection closed")
 
         filenames = dict()
         filenames["CDT"] = latest_cdtname
         filenames["CDP"] = latest_cdpname
-        # Check the dates to make sure Ingram didn't make a mistake
-        # letest cdp
         date_problems = False
-        with open(dirPath + "\\" + str(latest_cdpname)) as f:
-            for i in range(10):
-                line = f.readline().strip()
-                line_list = line.split(',')
-                if line_list[1] != curr_date:
-                    date_problems = True
-        
-        with open(dirPath + "\\" + str(latest_cdtname)) as f:
-            for i in range(10):
-                line = f.readline().strip()
-                line_list = line.split(',')
-                if line_list[1] != curr_date:
-                    date_problems = True
-        
+        for name, validator in validators.items():
+            validator.finish()
+            logging.info(f"{name}: {validator.rows} records, {validator.bad_rows} not dated {curr_date}")
+            metrics.current().add(rows_in=validator.rows)
+            if not validator.ok:
+                logging.warning(f"{name} has records with the wrong date, first at record {validator.first_bad}")
+                date_problems = True
+
         if date_problems:
             send_warning_email()
 
@@ -149,14 +582,15 @@ def FTP_pull(day):
         return filenames
     except ftplib.all_errors as e:
         logging.error(f"FTP error: {e}")
-        conn.quit()
+        _ftp_close(conn)
         raise
     except Exception as e:
         logging.error(f"Unexpected error in FTP_pull: {e}")
         if conn:
-            conn.quit()
+            _ftp_close(conn)
         raise
 
+@metrics.instrumented()
 def File_Copy(names, day):
     """
     Copies downloaded files to the Daily Files directory and renames them to standard names.
@@ -219,6 +653,7 @@ def File_Copy(names, day):
             try:
                 shutil.copy(fullfilename, dest)
                 logging.info(f"Copied {fileName} to destination")
+                metrics.current().read_file(fullfilename).wrote_file(os.path.join(dest, fileName))
             except Exception as e:
                 logging.error(f"Failed to copy {fileName}: {e}")
         
@@ -349,6 +784,57 @@ def Name_Creator(NameType, day):
         logging.error(f"Error in Name_Creator: {e}")
         raise
 
+# bytes read per block when rewriting the Ingram files, keeps memory flat whatever the file size
+FIX_CHUNK_SIZE = 1024 * 1024
+# quote, apostrophe and comma break the SQL import of the TransactionFile
+_TRANS_STRIP = b"\"',"
+
+def _prepend_newline(src, dest):
+    """
+    Copies src to dest in binary blocks with a newline in front.
+    The newline is the platform one, matching what the text mode copy used to write.
+    """
+    with open(src, 'rb') as read_f, open(dest, 'wb') as write_f:
+        write_f.write(os.linesep.encode('ascii'))
+        shutil.copyfileobj(read_f, write_f, FIX_CHUNK_SIZE)
+
+def _strip_transaction_file(src, dest):
+    """
+    Streams the TransactionFile from src to dest in FIX_CHUNK_SIZE chunks, dropping quotes,
+    apostrophes and commas with a single translate per chunk.
+
+    Those three bytes can't appear inside a multibyte UTF-8 sequence or mean anything else in cp1252,
+    so they are stripped before decoding. The file is decoded as UTF-8 until the first invalid byte,
+    from there on it is decoded as cp1252 (ANSI) without going back over what was already written.
+    Line endings are normalised the same way text mode reading does.
+
+    Returns:
+        str: 'utf-8', or 'cp1252' if the decoder had to switch
+    """
+    encoding = 'utf-8'
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    newlines = io.IncrementalNewlineDecoder(None, translate=True)
+    offset = 0
+    with open(src, 'rb') as read_f, open(dest, 'w') as write_f:
+        while True:
+            chunk = read_f.read(FIX_CHUNK_SIZE)
+            final = not chunk
+            stripped = chunk.translate(None, _TRANS_STRIP)
+            try:
+                text = decoder.decode(stripped, final=final)
+            except UnicodeDecodeError as e:
+                # e.object is the decoder's buffered bytes plus this chunk
+                logging.warning(f"UTF-8 decode failed near byte {offset}, switching to cp1252 (ANSI)...")
+                text = e.object[:e.start].decode('utf-8') + e.object[e.start:].decode('cp1252', errors='replace')
+                decoder = codecs.getincrementaldecoder('cp1252')(errors='replace')
+                encoding = 'cp1252'
+            write_f.write(newlines.decode(text, final=final))
+            offset += len(chunk)
+            if final:
+                break
+    return encoding
+
+@metrics.instrumented()
 def File_Fixes(names, day):
     """
     Processes downloaded files to add required formatting and remove special characters.
@@ -381,11 +867,9 @@ def File_Fixes(names, day):
         logging.info(f"Processing CDT file")
         logging.info(f"Source CDT exists: {os.path.exists(CDT)}")
         if os.path.exists(CDT):
-            with open(CDT, 'r') as read_CDT, open(CDTTemp, 'w') as write_CDT:
-                logging.info(f"Adding newline to beginning of CDT file")
-                write_CDT.write("\n")
-                for line in read_CDT:
-                    write_CDT.write(line)
+            logging.info(f"Adding newline to beginning of CDT file")
+            _prepend_newline(CDT, CDTTemp)
+            metrics.current().read_file(CDT).wrote_file(CDTTemp)
             logging.info(f"CDT processing complete")
             logging.info(f"Output CDT exists: {os.path.exists(CDTTemp)}")
             if os.path.exists(CDTTemp):
@@ -394,11 +878,9 @@ def File_Fixes(names, day):
         logging.info(f"Processing CDP file")
         logging.info(f"Source CDP exists: {os.path.exists(CDP)}")
         if os.path.exists(CDP):
-            with open(CDP, 'r') as read_CDP, open(CDPTemp, 'w') as write_CDP:
-                logging.info(f"Adding newline to beginning of CDP file")
-                write_CDP.write("\n")
-                for line in read_CDP:
-                    write_CDP.write(line)
+            logging.info(f"Adding newline to beginning of CDP file")
+            _prepend_newline(CDP, CDPTemp)
+            metrics.current().read_file(CDP).wrote_file(CDPTemp)
             logging.info(f"CDP processing complete")
             logging.info(f"Output CDP exists: {os.path.exists(CDPTemp)}")
             if os.path.exists(CDPTemp):
@@ -410,24 +892,10 @@ def File_Fixes(names, day):
 
         #defensive if they send wrongly encoded cdt/cdp/csv (has happened before)
         if os.path.exists(Trans):
-            try:
-                with open(Trans, 'r', encoding='utf-8') as read_Trans, open(TransTemp, 'w') as write_Trans:
-                    data = read_Trans.read()
-                    logging.info(f"Removing special characters from Trans file")
-                    data = data.replace("\"", "")
-                    data = data.replace("'", "")
-                    data = data.replace(",", "")
-                    write_Trans.write(data)
-
-            except UnicodeDecodeError:
-                logging.warning("UTF-8 decode failed, trying cp1252 (ANSI)...")
-                with open(Trans, 'r', encoding='cp1252', errors='replace') as read_Trans, open(TransTemp, 'w') as write_Trans:
-                    data = read_Trans.read()
-                    logging.info(f"Removing special characters from Trans file")
-                    data = data.replace("\"", "")
-                    data = data.replace("'", "")
-                    data = data.replace(",", "")
-                    write_Trans.write(data)
+            logging.info(f"Removing special characters from Trans file")
+            encoding = _strip_transaction_file(Trans, TransTemp)
+            metrics.current().read_file(Trans).wrote_file(TransTemp)
+            logging.info(f"Trans file decoded as {encoding}")
 
             logging.info(f"Trans processing complete")
             logging.info(f"Output Trans exists: {os.path.exists(TransTemp)}")
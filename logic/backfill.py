@@ -0,0 +1,182 @@
+import csv
+import datetime
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+from logic.manual_rerun_logic import RerunLookups, fetch_rerun_lookups, proccess_daily_files_rerun
+
+"""
+Backfill: the manual rerun for every dated CDT/CDP/TransactionFile triple in a folder, a day per
+worker process.
+
+Files are paired on the date in their names: MMDD????.CDT and MMDD????.CDP, as Name_Creator
+matches them, and TransactionFileYYYYMMDD.txt, which also gives the year. crossref and INGQTY
+are fetched once and handed to every worker, each day writes into its own YYYYMMDD subfolder and
+backfill_status.csv records how every day went.
+"""
+
+STATUS_FILE = "backfill_status.csv"
+
+_CDT_NAME = re.compile(r"^(\d{4})\w*\.CDT$", re.IGNORECASE)
+_CDP_NAME = re.compile(r"^(\d{4})\w*\.CDP$", re.IGNORECASE)
+_TRANS_NAME = re.compile(r"^TransactionFile(\d{8})\.txt$", re.IGNORECASE)
+
+# set once per worker by _init_worker, so the lookups cross the process boundary once per worker
+_worker_lookups: RerunLookups | None = None
+
+
+class RerunDay(NamedTuple):
+    day: datetime.date
+    cdt: str
+    cdp: str
+    trans: str
+
+
+class BackfillResult(NamedTuple):
+    day: datetime.date
+    status: str  # ok or failed
+    seconds: float
+    output_path: str
+    error: str | None = None
+
+
+def _newest(paths: list[str]) -> str:
+    return max(paths, key=os.path.getmtime)
+
+
+def find_rerun_days(resources_dir: str) -> tuple[list[RerunDay], list[str]]:
+    """
+    Pairs the CDT, CDP and TransactionFile of each day in resources_dir. When Ingram resent a
+    day's CDT or CDP the newest one is used.
+
+    Returns:
+        tuple[list[RerunDay], list[str]]: Complete days in date order, and the files that could
+        not be paired with the rest of their day
+    """
+    cdts: dict[str, list[str]] = {}
+    cdps: dict[str, list[str]] = {}
+    trans: dict[str, tuple[datetime.date, str]] = {}
+    for name in sorted(os.listdir(resources_dir)):
+        path = os.path.join(resources_dir, name)
+        if (m := _CDT_NAME.match(name)):
+            cdts.setdefault(m.group(1), []).append(path)
+        elif (m := _CDP_NAME.match(name)):
+            cdps.setdefault(m.group(1), []).append(path)
+        elif (m := _TRANS_NAME.match(name)):
+            try:
+                day = datetime.datetime.strptime(m.group(1), "%Y%m%d").date()
+            except ValueError:
+                continue
+            mmdd = day.strftime("%m%d")
+            if mmdd in trans:
+                logging.warning(f"Two TransactionFiles for {mmdd}, keeping {trans[mmdd][1]} and skipping {path}")
+                continue
+            trans[mmdd] = (day, path)
+
+    days = []
+    unpaired = []
+    for mmdd in sorted(set(cdts) | set(cdps) | set(trans)):
+        if mmdd in cdts and mmdd in cdps and mmdd in trans:
+            day, trans_path = trans[mmdd]
+            days.append(RerunDay(day, _newest(cdts[mmdd]), _newest(cdps[mmdd]), trans_path))
+        else:
+            unpaired += cdts.get(mmdd, []) + cdps.get(mmdd, []) + ([trans[mmdd][1]] if mmdd in trans else [])
+    days.sort(key=lambda d: d.day)
+    return days, unpaired
+
+
+def _init_worker(lookups: RerunLookups) -> None:
+    global _worker_lookups
+    _worker_lookups = lookups
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+
+
+def _run_day(day: RerunDay, output_path: str, columnar: bool, csv_backend: str | None, incremental: bool,
+             force: tuple[str, ...]) -> BackfillResult:
+    """One day's rerun, top level so a process pool can run it. Failures come back as a result."""
+    started = time.perf_counter()
+    try:
+        proccess_daily_files_rerun(day.cdt, day.cdp, day.trans, output_path, columnar=columnar,
+                                   csv_backend=csv_backend, lookups=_worker_lookups, incremental=incremental,
+                                   force=force)
+        return BackfillResult(day.day, "ok", round(time.perf_counter() - started, 2), output_path)
+    except Exception as e:
+        logging.error(f"Backfill of {day.day} failed: {e}", exc_info=True)
+        return BackfillResult(day.day, "failed", round(time.perf_counter() - started, 2), output_path,
+                              f"{type(e).__name__}: {e}")
+
+
+def write_status_report(path: str, results: list[BackfillResult]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["day", "status", "seconds", "output_path", "error"])
+        for r in sorted(results, key=lambda r: r.day):
+            writer.writerow([r.day.isoformat(), r.status, r.seconds, r.output_path, r.error or ""])
+
+
+def run_backfill(resources_dir: str, output_dir: str, max_workers: int | None = None, columnar: bool = True,
+                 csv_backend: str | None = None, lookups: RerunLookups | None = None, incremental: bool = False,
+                 force: tuple[str, ...] = ()) -> list[BackfillResult]:
+    """
+    Reruns every complete day in resources_dir, in parallel.
+
+    Args:
+        resources_dir (str): Folder holding the days' CDT, CDP and TransactionFiles
+        output_dir (str): Each day is written to output_dir/YYYYMMDD, with backfill_status.csv next to them
+        max_workers (int, optional): Worker processes, defaults to the number of cores
+        columnar (bool): Load and keep the Parquet copies of the Ingram files
+        csv_backend (str, optional): CSV backend for the text parse
+        lookups (RerunLookups, optional): crossref and INGQTY, fetched here when not given
+        incremental (bool): Skip the stages of each day that are unchanged since its last rerun
+        force (tuple[str, ...]): Stages to run even when unchanged, see proccess_daily_files_rerun
+
+    Returns:
+        list[BackfillResult]: One per day, in date order. A day that failed doesn't stop the others
+
+    Raises:
+        FileNotFoundError: resources_dir holds no complete day
+    """
+    days, unpaired = find_rerun_days(resources_dir)
+    for path in unpaired:
+        logging.warning(f"Not part of a complete CDT/CDP/TransactionFile day, skipped: {path}")
+    if not days:
+        raise FileNotFoundError(f"No complete CDT/CDP/TransactionFile day in {resources_dir}")
+    logging.info(f"Backfilling {len(days)} days: {', '.join(d.day.isoformat() for d in days)}")
+
+    if lookups is None:
+        lookups = fetch_rerun_lookups()
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(len(days), max_workers or os.cpu_count() or 1)
+
+    results = []
+    # spawn on every platform, like the report rendering pool
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(lookups,)) as pool:
+        futures = {
+            pool.submit(_run_day, day, os.path.join(output_dir, day.day.strftime("%Y%m%d")), columnar, csv_backend,
+                        incremental, tuple(force)): day
+            for day in days
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker itself died
+                day = futures[future]
+                result = BackfillResult(day.day, "failed", 0.0, os.path.join(output_dir, day.day.strftime("%Y%m%d")),
+                                        f"{type(e).__name__}: {e}")
+            logging.info(f"Backfill {result.day}: {result.status} in {result.seconds}s")
+            results.append(result)
+
+    results.sort(key=lambda r: r.day)
+    status_path = os.path.join(output_dir, STATUS_FILE)
+    write_status_report(status_path, results)
+    failed = [r for r in results if r.status != "ok"]
+    logging.info(f"Backfill done: {len(results) - len(failed)} of {len(results)} days ok, status in {status_path}")
+    for r in failed:
+        logging.error(f"Backfill {r.day} failed: {r.error}")
+    return results
@@ -0,0 +1,198 @@
+import logging
+import os
+import time
+from typing import NamedTuple
+import pandas as pd
+import sqlalchemy
+from sqlalchemy.engine import Engine
+from helpers import metrics
+from helpers.db_conn import get_engine
+from logic.FIX import assign_line_nums
+from logic.manual_rerun_logic import procces_cdt_file, proccess_cdp_file, proccess_transfile
+
+"""
+Bulk load of the parsed Ingram files into staging tables, straight from the dataframes instead of
+through Daily Files and the SSIS imports of the Daily Rerun job.
+
+Each load replaces its staging table in one transaction: the table is dropped, created with
+columns typed from the frame and filled in batches over the pooled engine. SQL Server rolls the
+drop back with the rest when a load fails, sqlite (the local stand-in) commits DDL on its own. Drivers that can
+send a batch in one round trip (pyodbc with fast_executemany, sqlite in process) get
+executemany, others (pymssql) a multi-row INSERT ... VALUES per batch, which is what keeps
+pymssql from going to the server once per row.
+"""
+
+# load the staging tables as part of the daily run, alongside the SQL job until it reads them
+BULK_LOAD = os.getenv("BULK_LOAD", "").lower() in ("1", "true", "yes")
+# schema holding the staging tables, database.owner on SQL Server. Empty for the default schema
+STAGING_SCHEMA = os.getenv("BULK_LOAD_SCHEMA", "IPS.dbo") or None
+# rows handed to the driver per executemany
+BULK_LOAD_BATCH_ROWS = int(os.getenv("BULK_LOAD_BATCH_ROWS", "10000"))
+# SQL Server takes at most 2100 parameters and 1000 rows in one INSERT ... VALUES
+MAX_STATEMENT_PARAMS = 2000
+MAX_VALUES_ROWS = 1000
+
+# frame -> staging table, the frames are the ones the SQL job imports as IPS_INV, IPS_DAILY and LOCKED
+STAGING_TABLES = {"IPS_INV": "IPS_INV_STAGING", "IPS_DAILY": "IPS_DAILY_STAGING", "LOCKED": "LOCKED_STAGING"}
+
+INSERT_METHODS = ("executemany", "values")
+_EXECUTEMANY_DRIVERS = {"pyodbc", "pysqlite"}
+
+
+class LoadResult(NamedTuple):
+    table: str
+    rows: int
+    seconds: float
+    method: str
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def insert_method(engine: Engine) -> str:
+    """executemany where the driver batches it, a multi-row VALUES insert everywhere else."""
+    return "executemany" if engine.dialect.driver in _EXECUTEMANY_DRIVERS else "values"
+
+
+def _column_type(series: pd.Series) -> sqlalchemy.types.TypeEngine:
+    if pd.api.types.is_bool_dtype(series):
+        return sqlalchemy.Boolean()
+    if pd.api.types.is_integer_dtype(series):
+        return sqlalchemy.BigInteger()
+    if pd.api.types.is_float_dtype(series):
+        return sqlalchemy.Float()
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return sqlalchemy.DateTime()
+    # sized to the data, the table is recreated on every load so a longer value next time is fine
+    longest = series.dropna().astype(str).str.len().max()
+    return sqlalchemy.Unicode(max(int(longest) if pd.notna(longest) else 0, 1))
+
+
+def _column_values(series: pd.Series, col_type: sqlalchemy.types.TypeEngine) -> list:
+    """The column as python values the DB-API drivers take, missing values as None."""
+    if isinstance(col_type, sqlalchemy.DateTime):
+        return [None if pd.isna(v) else v.to_pydatetime() for v in series]
+    values = series.to_numpy(dtype=object, na_value=None).tolist()
+    if isinstance(col_type, sqlalchemy.Unicode):
+        # object columns mix None with numbers, e.g. the CDT's Qtyreq
+        return [v if v is None or isinstance(v, str) else str(v) for v in values]
+    return values
+
+
+def _insert_sql(dialect, table: sqlalchemy.Table, rows: int) -> str:
+    """INSERT of rows rows in the driver's own parameter style, sent as is so nothing is compiled per batch."""
+    prep = dialect.identifier_preparer
+    marker = "?" if dialect.paramstyle == "qmark" else "%s"
+    row = "(" + ", ".join([marker] * len(table.columns)) + ")"
+    columns = ", ".join(prep.quote(c.name) for c in table.columns)
+    return f"INSERT INTO {prep.format_table(table)} ({columns}) VALUES " + ", ".join([row] * rows)
+
+
+def staging_table(df: pd.DataFrame, name: str, schema: str | None = STAGING_SCHEMA) -> sqlalchemy.Table:
+    """The staging table for a frame, one column per frame column."""
+    return sqlalchemy.Table(
+        name, sqlalchemy.MetaData(),
+        *(sqlalchemy.Column(str(c), _column_type(df[c])) for c in df.columns),
+        schema=schema,
+    )
+
+
+def bulk_load_frame(df: pd.DataFrame, name: str, engine: Engine | None = None, schema: str | None = STAGING_SCHEMA,
+                    batch_rows: int | None = None, method: str | None = None) -> LoadResult:
+    """
+    Replaces staging table name with the rows of df.
+
+    Args:
+        df (pd.DataFrame): Rows to load, column names become the table's
+        name (str): Staging table
+        engine (Engine, optional): Defaults to the pooled engine from get_engine
+        schema (str, optional): Defaults to STAGING_SCHEMA
+        batch_rows (int, optional): Rows per executemany, defaults to BULK_LOAD_BATCH_ROWS. A values
+            insert also stays under MAX_VALUES_ROWS and MAX_STATEMENT_PARAMS
+        method (str, optional): executemany or values, defaults to insert_method(engine)
+
+    Returns:
+        LoadResult: Rows loaded and how long it took
+    """
+    engine = engine if engine is not None else get_engine()
+    method = method or insert_method(engine)
+    if method not in INSERT_METHODS:
+        raise ValueError(f"Unknown insert method {method!r}, expected one of {INSERT_METHODS}")
+    batch_rows = batch_rows or BULK_LOAD_BATCH_ROWS
+    if method == "values":
+        batch_rows = min(batch_rows, MAX_VALUES_ROWS, max(MAX_STATEMENT_PARAMS // max(len(df.columns), 1), 1))
+
+    table = staging_table(df, name, schema)
+    columns = [_column_values(df[c], table.columns[str(c)].type) for c in df.columns]
+    rows = list(zip(*columns))
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        table.drop(conn, checkfirst=True)
+        table.create(conn)
+        statements: dict[int, str] = {}  # by rows per statement, only the last batch differs
+        for start in range(0, len(rows), batch_rows):
+            batch = rows[start:start + batch_rows]
+            per_statement = 1 if method == "executemany" else len(batch)
+            if per_statement not in statements:
+                statements[per_statement] = _insert_sql(conn.dialect, table, per_statement)
+            if method == "executemany":
+                conn.exec_driver_sql(statements[1], batch)
+            else:
+                conn.exec_driver_sql(statements[per_statement], tuple(v for row in batch for v in row))
+    result = LoadResult(table.fullname, len(rows), round(time.perf_counter() - started, 3), method)
+    logging.info(
+        f"Bulk loaded {result.rows} rows into {result.table} in {result.seconds}s "
+        f"({result.rows_per_sec:,.0f} rows/s, {method}, batches of {batch_rows})"
+    )
+    return result
+
+
+def ingram_frames(cdt_path: str, cdp_path: str, transfile_path: str, columnar: bool = True,
+                  csv_backend: str | None = None) -> dict[str, pd.DataFrame]:
+    """
+    The day's IPS_INV, IPS_DAILY and LOCKED frames as the rerun parses them. IPS_DAILY gets the
+    Line_num and Order_id FIX.Fixes gives the text file the SQL job imports.
+    """
+    daily_df = proccess_transfile(transfile_path, columnar=columnar, csv_backend=csv_backend)
+    line_nums, order_ids = assign_line_nums(daily_df['Ordnum'].astype(str), id_start=6300)
+    daily_df['Line_num'] = line_nums
+    daily_df['Order_id'] = order_ids
+    return {
+        "IPS_INV": procces_cdt_file(cdt_path, columnar=columnar, csv_backend=csv_backend),
+        "IPS_DAILY": daily_df,
+        "LOCKED": proccess_cdp_file(cdp_path, columnar=columnar, csv_backend=csv_backend),
+    }
+
+
+@metrics.instrumented()
+def load_ingram_staging(cdt_path: str, cdp_path: str, transfile_path: str, engine: Engine | None = None,
+                        schema: str | None = STAGING_SCHEMA, columnar: bool = True, csv_backend: str | None = None,
+                        batch_rows: int | None = None, method: str | None = None) -> list[LoadResult]:
+    """
+    Parses a day's CDT, TransactionFile and CDP and replaces the STAGING_TABLES with them.
+
+    Args:
+        engine (Engine, optional): Defaults to the pooled engine, a sqlite engine works as a local stand-in
+        schema (str, optional): Defaults to STAGING_SCHEMA, None for the engine's default schema
+        columnar (bool): Load and keep the Parquet copies of the Ingram files
+        csv_backend (str, optional): CSV backend for the text parse
+        batch_rows (int, optional): See bulk_load_frame
+        method (str, optional): See bulk_load_frame
+
+    Returns:
+        list[LoadResult]: One per staging table
+    """
+    frames = ingram_frames(cdt_path, cdp_path, transfile_path, columnar=columnar, csv_backend=csv_backend)
+    results = [
+        bulk_load_frame(df, STAGING_TABLES[name], engine=engine, schema=schema, batch_rows=batch_rows, method=method)
+        for name, df in frames.items()
+    ]
+    rows = sum(r.rows for r in results)
+    seconds = sum(r.seconds for r in results)
+    logging.info(f"Bulk load done: {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0.0:,.0f} rows/s)")
+    metrics.current().add(rows_in=rows, rows_out=rows)
+    for path in (cdt_path, cdp_path, transfile_path):
+        metrics.current().read_file(path)
+    return results
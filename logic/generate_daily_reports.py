@@ -1,13 +1,19 @@
 import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.pagesizes import landscape, A4
 from reportlab.lib import colors
 import pandas as pd
+from helpers import metrics
 from helpers.context import DailyFilesContext
 from helpers.db_conn import get_db
+from helpers.item_titles import ItemTitleSnapshot, item_key
 from sqlalchemy import text
+from typing import NamedTuple
 
 CC_REPORTS = {"INV_ADJ_CC_IPS", "INV_ADJ_CC_ING"}
 
@@ -66,6 +72,126 @@ REPORT_SQL : dict[str,str] = {
 STANDARD_COLS = ["REASONCODE", "WHS", "EAN", "TITLE", "QTY"]
 
 
+class ScanReport(NamedTuple):
+    """Where an IPS_INV report's rows sit in the single scan and what its columns are called."""
+    whs: str | None  # None for every warehouse
+    acttypes: frozenset[str]
+    columns: list[tuple[str, str]]  # (scan column, report column)
+
+
+_STANDARD_SCAN_COLS = [("ACTTYPE", "REASONCODE"), ("WHS", "WHS"), ("EAN", "EAN"), ("TITLE", "TITLE"), ("QTY", "QTY")]
+
+# the IPS_INV reports of REPORT_SQL, split out of one scan instead of queried one by one
+SCAN_REPORTS: dict[str, ScanReport] = {
+    "INV_ADJ_CC_IPS": ScanReport("IPS", frozenset({"CC"}), _STANDARD_SCAN_COLS),
+    "INV_ADJ_OH_ING": ScanReport("ING", frozenset({"OH", "KA", "KW"}), _STANDARD_SCAN_COLS),
+    "INV_ADJ_OH_IPS": ScanReport("IPS", frozenset({"OH", "KA", "KW"}), _STANDARD_SCAN_COLS),
+    "INV_ADJ_CC_ING": ScanReport("ING", frozenset({"CC"}), _STANDARD_SCAN_COLS),
+    "INV_RR": ScanReport(None, frozenset({"RR"}),
+                         [("ACTTYPE", "REASONCODE"), ("WHS", "WHS"), ("EAN", "ISBN"), ("TITLE", "TITLE"), ("QTY", "QTY")]),
+    "INV_TI": ScanReport(None, frozenset({"TI"}),
+                         [("WHS", "WHS"), ("EAN", "EAN"), ("TITLE", "TITLE"), ("QTY", "QTY"), ("ACTTYPE", "ACTTYPE")]),
+}
+
+IPS_INV_SCAN_SQL = """
+    SELECT IPS.Acttype AS ACTTYPE, IPS.WHS, CAST(IPS.EAN AS Char(24)) AS EAN,
+           I.[DESC] AS TITLE, IPS.Qty AS QTY
+    FROM IPS.dbo.IPS_INV AS IPS
+    LEFT JOIN TUTLIV.dbo.ICITEM I ON TRIM(I.ITEMNO) = TRIM(CAST(IPS.EAN AS Char(24)))
+    WHERE IPS.Acttype IN ({acttypes})
+"""
+
+# the same two reads without ICITEM, titles come from the local ItemTitleSnapshot instead
+IPS_INV_SCAN_NO_TITLES_SQL = """
+    SELECT IPS.Acttype AS ACTTYPE, IPS.WHS, CAST(IPS.EAN AS Char(24)) AS EAN, IPS.Qty AS QTY
+    FROM IPS.dbo.IPS_INV AS IPS
+    WHERE IPS.Acttype IN ({acttypes})
+"""
+
+ADJ_S_R_NO_TITLES_SQL = """
+    SELECT CAST(ISBN AS Char(24)) AS ISBN, Ordnum, Otype, Ponumber,
+           Otypesra, Billto, Billtoname, Qty AS QTY, Price, ROUND(Ext, 2) AS Ext, Discount
+    FROM IPS.dbo.ips_daily_pre_ips_queries
+    WHERE Substring(Otypesra,1,1) IN ('S', 'R')
+"""
+
+
+def _sql_key(value) -> str | None:
+    """Compares the way SQL Server's = does on CHAR columns: trailing blanks and case don't count."""
+    return None if value is None else str(value).rstrip().upper()
+
+
+def _lookup_titles(items: list, titles: pd.Series) -> list:
+    """Title for each item number, None where ICITEM has none (what the LEFT JOIN gave)."""
+    found = item_key(pd.Series(items, dtype=object)).map(titles)
+    return [None if pd.isna(t) else t for t in found]
+
+
+def _adj_s_r_frame(conn, titles: pd.Series) -> pd.DataFrame:
+    """ADJ_S_R with its inner join to ICITEM done against the local titles."""
+    res = conn.execute(text(ADJ_S_R_NO_TITLES_SQL))
+    cols = list(res.keys())
+    rows = res.fetchall()
+    found = _lookup_titles([row[0] for row in rows], titles)
+    selected = [(row[0], title, *row[1:]) for row, title in zip(rows, found) if title is not None]
+    return pd.DataFrame.from_records(selected, columns=[cols[0], "TITLE", *cols[1:]], coerce_float=True)
+
+
+def _single_scan_frames(db, reports: list[str], titles: pd.Series | None = None):
+    """
+    Fetches IPS_INV joined to titles once and splits it into every requested IPS_INV report.
+    ADJ_S_R reads a different table and keeps its own query on the same connection, so a run
+    makes at most two data queries however many reports it writes.
+
+    Each report frame is built from its rows the same way read_sql_query builds one, so
+    column dtypes match what the report's own query would have returned.
+
+    Args:
+        db: Engine to query
+        reports (list[str]): Reports to produce
+        titles (pd.Series, optional): DESC by normalized ITEMNO. When given neither query joins
+            ICITEM on the server, titles are looked up here instead
+
+    Yields:
+        tuple[str, pd.DataFrame]: Report name and its rows, in the order given
+    """
+    scan_reports = [r for r in reports if r in SCAN_REPORTS]
+    with db.connect() as conn:
+        rows, scan_cols, keys = [], [], []
+        if scan_reports:
+            acttypes = sorted(set().union(*(SCAN_REPORTS[r].acttypes for r in scan_reports)))
+            scan_sql = IPS_INV_SCAN_SQL if titles is None else IPS_INV_SCAN_NO_TITLES_SQL
+            res = conn.execute(text(scan_sql.format(acttypes=", ".join(f"'{a}'" for a in acttypes))))
+            scan_cols = list(res.keys())
+            rows = res.fetchall()
+            if titles is not None:
+                ean_at = scan_cols.index("EAN")
+                found = _lookup_titles([row[ean_at] for row in rows], titles)
+                rows = [(*row, title) for row, title in zip(rows, found)]
+                scan_cols.append("TITLE")
+            logging.info(f"Single scan of IPS_INV returned {len(rows)} rows for {len(scan_reports)} reports")
+            whs_at, act_at = scan_cols.index("WHS"), scan_cols.index("ACTTYPE")
+            keys = [(_sql_key(row[whs_at]), _sql_key(row[act_at])) for row in rows]
+
+        for report in reports:
+            spec = SCAN_REPORTS.get(report)
+            if spec is None and report == "ADJ_S_R" and titles is not None:
+                yield report, _adj_s_r_frame(conn, titles)
+                continue
+            if spec is None:
+                yield report, pd.read_sql_query(text(REPORT_SQL[report]), con=conn)
+                continue
+            picks = [scan_cols.index(c) for c, _ in spec.columns]
+            selected = [
+                tuple(row[i] for i in picks)
+                for row, (whs, act) in zip(rows, keys)
+                if act in spec.acttypes and (spec.whs is None or whs == spec.whs)
+            ]
+            yield report, pd.DataFrame.from_records(
+                selected, columns=[name for _, name in spec.columns], coerce_float=True
+            )
+
+
 def _write_pdf(df: pd.DataFrame, path: Path, title: str = "") -> None:
     doc = SimpleDocTemplate(str(path), pagesize=landscape(A4))
     styles = getSampleStyleSheet()
@@ -96,7 +222,45 @@ def _write_pdf(df: pd.DataFrame, path: Path, title: str = "") -> None:
     flowables.append(table)
     doc.build(flowables)
 
-def generate_daily_reports(path : str | None = None):
+def _render_report(report: str, df: pd.DataFrame, reports_dir: Path, new_pdf_reports_path: Path) -> str:
+    """
+    Writes one report's xlsx and pdf. Top level so a process pool can run it.
+
+    Returns:
+        str: The report name
+    """
+    startrow = 0 if report in CC_REPORTS else 1
+    path = reports_dir.joinpath(f"{report}.xlsx")
+
+    with pd.ExcelWriter(path) as writer:
+        df.to_excel(writer, sheet_name=report, index=False, startrow=startrow)
+
+    logging.info("Wrote %s to %s (excel version)", report, path)
+
+    _write_pdf(df, new_pdf_reports_path.joinpath(f"{report}.pdf"), title=report)
+    return report
+
+
+@metrics.instrumented()
+def generate_daily_reports(path : str | None = None, single_scan: bool = False, parallel: bool = False,
+                           max_workers: int | None = None, local_titles: bool = False):
+    """
+    Writes every report marked as having data in IPS.dbo.Reports to xlsx and pdf.
+
+    Args:
+        path (str, optional): Writes into path/Test_Reports instead of the daily Reports folders
+        single_scan (bool): Read IPS_INV once and split it into the reports in memory, instead of
+            one query per report
+        parallel (bool): Render the xlsx and pdf files in a process pool, one report per worker.
+            Queries still run here, only the finished frames go to the workers
+        max_workers (int, optional): Pool size for parallel, defaults to the number of cores
+        local_titles (bool): Look titles up in the local ICITEM snapshot instead of joining ICITEM on
+            the server. Implies single_scan
+
+    Raises:
+        RuntimeError: No reports have data, a report's query came back empty, or (parallel) any
+            report failed to render. Reports that rendered fine are still written
+    """
 
     if path is not None:
         reports_dir = Path(path).joinpath("Test_Reports")
@@ -127,37 +291,71 @@ def generate_daily_reports(path : str | None = None):
             )
 
         logging.info("beginning excel write to reports path")
+        reports = []
         for report in available_reports:
             if report not in REPORT_SQL:
                 logging.warning("report not in report sql skipping")
                 continue
-            df: pd.DataFrame = pd.read_sql_query(text(REPORT_SQL[report]), con=db)
+            reports.append(report)
 
-            if df.empty:
-                raise RuntimeError(
-                    f"Report {report} marked as having data but query returned no rows."
-                )
+        if local_titles:
+            titles = ItemTitleSnapshot().titles(db)
+            frames = _single_scan_frames(db, reports, titles=titles)
+        elif single_scan:
+            frames = _single_scan_frames(db, reports)
+        else:
+            frames = ((report, pd.read_sql_query(text(REPORT_SQL[report]), con=db)) for report in reports)
+
+        pool = None
+        if parallel and reports:
+            workers = min(len(reports), max_workers or os.cpu_count() or 1)
+            # spawn on every platform, the pipeline calls this from a stage thread and fork there can deadlock
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            logging.info(f"Rendering {len(reports)} reports with {workers} worker processes")
+        rendering = {}
 
-            has_standard = all(c in df.columns for c in STANDARD_COLS)
+        try:
+            for report, df in frames:
 
-            if not has_standard and "ISBN" in df.columns:
-                order = ["REASONCODE", "WHS", "ISBN", "TITLE", "QTY"]
-                has_standard = all(c in df.columns for c in order)
-                if has_standard:
-                    df = df[order]
+                if df.empty:
+                    raise RuntimeError(
+                        f"Report {report} marked as having data but query returned no rows."
+                    )
 
-            elif has_standard:
-                df = df[STANDARD_COLS]
+                has_standard = all(c in df.columns for c in STANDARD_COLS)
 
-            startrow = 0 if report in CC_REPORTS else 1
-            path = reports_dir.joinpath(f"{report}.xlsx")
+                if not has_standard and "ISBN" in df.columns:
+                    order = ["REASONCODE", "WHS", "ISBN", "TITLE", "QTY"]
+                    has_standard = all(c in df.columns for c in order)
+                    if has_standard:
+                        df = df[order]
 
-            with pd.ExcelWriter(path) as writer:
-                df.to_excel(writer, sheet_name=report, index=False, startrow=startrow)
+                elif has_standard:
+                    df = df[STANDARD_COLS]
 
-            logging.info("Wrote %s to %s (excel version)", report, path)
+                metrics.current().add(rows_in=len(df))
+                if pool is None:
+                    _render_report(report, df, reports_dir, new_pdf_reports_path)
+                else:
+                    rendering[pool.submit(_render_report, report, df, reports_dir, new_pdf_reports_path)] = report
 
-            _write_pdf(df, new_pdf_reports_path.joinpath(f"{report}.pdf"), title=report)
+            failed = []
+            for future in as_completed(rendering):
+                report = rendering[future]
+                try:
+                    future.result()
+                    logging.info("Rendered %s in worker process", report)
+                except Exception as e:
+                    logging.error("Rendering %s failed: %s", report, e)
+                    failed.append(f"{report} ({e})")
+            if failed:
+                raise RuntimeError(f"Failed to render reports: {'; '.join(sorted(failed))}")
+            for report in reports:
+                metrics.current().wrote_file(reports_dir.joinpath(f"{report}.xlsx")) \
+                    .wrote_file(new_pdf_reports_path.joinpath(f"{report}.pdf"))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
 
     return "Passed"
 
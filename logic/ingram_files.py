@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import NamedTuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from helpers.process_stats import format_bytes, peak_rss_bytes
+
+"""
+Layouts of the Ingram CDT, CDP and TransactionFile and a typed Parquet copy of each parsed file.
+
+The copy sits next to the text file as <file>.parquet and records the size and modified time of
+the text file it was parsed from. Readers load the copy while it still matches the text file and
+parse the text (writing a fresh copy) when it doesn't, so a day is only ever parsed from text once.
+"""
+
+COLUMNAR_SUFFIX = ".parquet"
+
+# "pandas" is read_csv's C parser, "arrow" pyarrow's multithreaded reader falling back to pandas on
+# anything it can't parse
+CSV_BACKENDS = ("pandas", "arrow")
+INGRAM_CSV_BACKEND = os.getenv("INGRAM_CSV_BACKEND", "pandas")
+_ARROW_TYPES = {str: pa.string(), int: pa.int64(), float: pa.float64()}
+# the strings read_csv reads as missing by default, the arrow backend has to be told them
+CSV_NA_VALUES = (
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+)
+# key of the schema metadata holding what the copy was parsed from
+_SOURCE_KEY = b"ingram_source"
+
+
+class IngramLayout(NamedTuple):
+    name: str
+    sep: str
+    dtypes: dict[int, type]
+    columns: list[str]
+
+
+TRANSFILE_LAYOUT = IngramLayout(
+    name="transfile",
+    sep="\t",
+    dtypes={**{i: str for i in range(12)}, 12: int, 13: float, 14: float, 15: float, **{i: str for i in range(16, 22)}},
+    columns=[
+        "Ordnum", "Otype", "Otypesra",
+        "Ponumber", "Billto", "Billtoname",
+        "Bcntry", "Shipto", "Shipname",
+        "ISBN", "Title", "Client",
+        "Qty", "Ext", "Price", "Discount",
+        "Currenttyp", "RettyP", "Linekey",
+        "Ingwhs", "St_name", "Pdate",
+    ],
+)
+
+CDT_LAYOUT = IngramLayout(
+    name="cdt",
+    sep=",",
+    dtypes={**{i: str for i in range(13)}, 5: int, 7: int},
+    columns=[
+        "TutNum", "FileDate", "WHS",
+        "ISBN10", "UPS", "EAN",
+        "Transcode", "Qty", "Each",
+        "Dispcode", "Linenum", "Acttype",
+        "FromLoc",
+    ],
+)
+
+# mirrors the column structure of the dbo.LOCKED table from Locked_Import.dtsx
+CDP_LAYOUT = IngramLayout(
+    name="cdp",
+    sep=",",
+    dtypes={**{i: str for i in range(13)}, 7: int},
+    columns=[
+        'F1', 'Fdate', 'San', 'ISBN10', 'F5', 'ISBN',
+        'Invcode', 'QTY',
+        'column9', 'column10', 'column11', 'column12', 'column13',
+    ],
+)
+
+# the fixed files File_Fixes leaves in the daily folder
+DAILY_FOLDER_FILES = {
+    "IPS_INV.CDT": CDT_LAYOUT,
+    "Locked.CDP": CDP_LAYOUT,
+    "IPS_DALY.txt": TRANSFILE_LAYOUT,
+}
+
+
+def _read_csv_pandas(path: str | Path, layout: IngramLayout) -> pd.DataFrame:
+    df = pd.read_csv(path, sep=layout.sep, header=None, dtype=layout.dtypes)
+    df.columns = layout.columns
+    return df
+
+
+def _read_csv_arrow(path: str | Path, layout: IngramLayout) -> pd.DataFrame:
+    """
+    The pandas parse done by pyarrow's CSV reader across threads. Blank lines are skipped and
+    read_csv's default NA strings become missing values, so the frame is the one read_csv gives.
+    """
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(column_names=layout.columns, use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=layout.sep),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={layout.columns[i]: _ARROW_TYPES[t] for i, t in layout.dtypes.items()},
+            null_values=list(CSV_NA_VALUES),
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+
+def parse_ingram_file(path: str | Path, layout: IngramLayout, backend: str | None = None) -> pd.DataFrame:
+    """
+    Parses an Ingram text file with its declared dtypes and column names, logging how long it took
+    and the process's peak RSS afterwards.
+
+    Args:
+        path (str | Path): The text file
+        layout (IngramLayout): Its layout
+        backend (str, optional): One of CSV_BACKENDS. Defaults to INGRAM_CSV_BACKEND
+
+    Returns:
+        pd.DataFrame: One row per line, the same columns and dtypes whichever backend parsed it
+    """
+    backend = INGRAM_CSV_BACKEND if backend is None else backend
+    if backend not in CSV_BACKENDS:
+        raise ValueError(f"Unknown CSV backend {backend!r}, expected one of {CSV_BACKENDS}")
+
+    started = time.perf_counter()
+    df = None
+    if backend == "arrow":
+        try:
+            df = _read_csv_arrow(path, layout)
+        except pa.ArrowException as e:
+            logging.warning(f"Arrow could not parse {path}, falling back to pandas: {e}")
+            backend = "pandas"
+    if df is None:
+        df = _read_csv_pandas(path, layout)
+    logging.info(
+        f"Parsed {path} with {backend}: {len(df)} rows in {time.perf_counter() - started:.2f}s, "
+        f"peak RSS {format_bytes(peak_rss_bytes())}"
+    )
+    return df
+
+
+def columnar_path(path: str | Path) -> Path:
+    """The Parquet copy of path, e.g. IPS_INV.CDT -> IPS_INV.CDT.parquet"""
+    return Path(str(path) + COLUMNAR_SUFFIX)
+
+
+def _source_stamp(path: str | Path, layout: IngramLayout) -> dict:
+    st = os.stat(path)
+    return {"layout": layout.name, "columns": layout.columns, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def write_columnar(path: str | Path, layout: IngramLayout, df: pd.DataFrame | None = None) -> Path:
+    """
+    Writes the Parquet copy of an Ingram text file.
+
+    Args:
+        path (str | Path): The text file
+        layout (IngramLayout): Its layout
+        df (pd.DataFrame, optional): The already parsed file, parsed here when not given
+
+    Returns:
+        Path: The Parquet copy
+    """
+    stamp = _source_stamp(path, layout)
+    if df is None:
+        df = parse_ingram_file(path, layout)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SOURCE_KEY: json.dumps(stamp).encode()})
+
+    out = columnar_path(path)
+    tmp = out.with_name(out.name + ".tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, out)
+    logging.info(f"Wrote columnar copy of {path}: {len(df)} rows -> {out}")
+    return out
+
+
+def read_columnar(path: str | Path, layout: IngramLayout) -> pd.DataFrame | None:
+    """
+    Loads the Parquet copy of an Ingram text file if it was parsed from the file as it is now.
+
+    Returns:
+        pd.DataFrame | None: The parsed file, None when there is no copy or it is stale
+    """
+    out = columnar_path(path)
+    if not out.exists():
+        return None
+    try:
+        metadata = pq.read_schema(out).metadata or {}
+        stamp = json.loads(metadata.get(_SOURCE_KEY, b"null"))
+    except (OSError, ValueError, pa.ArrowException) as e:
+        logging.warning(f"Columnar copy {out} unreadable, parsing {path} again: {e}")
+        return None
+    if stamp != _source_stamp(path, layout):
+        logging.info(f"Columnar copy {out} is stale, parsing {path} again")
+        return None
+    return pq.read_table(out, memory_map=True).to_pandas()
+
+
+def load_ingram_file(path: str | Path, layout: IngramLayout, columnar: bool = True,
+                     backend: str | None = None) -> pd.DataFrame:
+    """
+    Loads an Ingram file, from its Parquet copy when there is a current one.
+
+    Args:
+        path (str | Path): The text file
+        layout (IngramLayout): Its layout
+        columnar (bool): Use and keep the Parquet copy, False always parses the text and writes nothing
+        backend (str, optional): CSV backend for the text parse, see parse_ingram_file
+
+    Returns:
+        pd.DataFrame: One row per line, the same frame parse_ingram_file gives
+    """
+    if not columnar:
+        return parse_ingram_file(path, layout, backend)
+    df = read_columnar(path, layout)
+    if df is not None:
+        logging.info(f"Loaded {path} from its columnar copy: {len(df)} rows")
+        return df
+    df = parse_ingram_file(path, layout, backend)
+    try:
+        write_columnar(path, layout, df)
+    except (OSError, pa.ArrowException) as e:
+        # the copy only saves the next parse, not having it is no reason to fail
+        logging.warning(f"Could not write columnar copy of {path}: {e}")
+    return df
+
+
+def write_daily_columnar(dir_path: str | Path, files: dict[str, IngramLayout] | None = None) -> list[Path]:
+    """
+    Writes the Parquet copies of the fixed Ingram files in a daily folder. A file that is missing
+    or doesn't parse is logged and skipped, the SQL job still reads the text files.
+
+    Args:
+        dir_path (str | Path): The daily folder
+        files (dict[str, IngramLayout], optional): File name to layout. Defaults to DAILY_FOLDER_FILES
+
+    Returns:
+        list[Path]: The copies written
+    """
+    files = DAILY_FOLDER_FILES if files is None else files
+    written = []
+    for name, layout in files.items():
+        path = os.path.join(dir_path, name)
+        if not os.path.exists(path):
+            logging.warning(f"No {name} in {dir_path}, no columnar copy written")
+            continue
+        try:
+            written.append(write_columnar(path, layout))
+        except Exception as e:
+            logging.warning(f"Columnar copy of {path} failed: {e}")
+    return written
@@ -2,13 +2,13 @@ import os
 import pandas as pd
 import logging
 from datetime import datetime
+from typing import NamedTuple
 from helpers.db_conn import get_db
-from openpyxl import load_workbook as pyxl_load_workbook
-from openpyxl import Workbook
-from openpyxl.workbook.defined_name import DefinedName
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.styles import Font
+from helpers.run_manifest import MANIFEST_FILE, RunManifest, frame_digest
+from logic.sage_workbook import write_sage_workbook
+from logic.FIX import assign_line_nums
+from logic.ingram_files import CDP_LAYOUT, CDT_LAYOUT, TRANSFILE_LAYOUT, load_ingram_file
+from logic.transforms import format_mdy, map_warehouse
 
 
 logger = logging.getLogger(__name__)
@@ -27,82 +27,18 @@ Replicates the SQL Server 'Daily Rerun' job steps 8-29 entirely in-memory.
 """
 
 #take in full nework path with escapes e.g \\\\tutpub3\\VOL2\\TestFiles\\Manual_Reruns\\rerun_resources
-def proccess_transfile(transfile_path: str) -> pd.DataFrame:
-    transfile_df = pd.read_csv(transfile_path, sep='\t', header = None, dtype = {
-        0 : str,
-        1 : str,
-        2 : str,
-        3 : str,
-        4 : str,
-        5 : str,
-        6 : str,
-        7 : str,
-        8 : str,
-        9 : str,
-        10 : str,
-        11 : str,
-        12 : int,
-        13 : float,
-        14 : float,
-        15 : float,
-        16 : str,
-        17 : str,
-        18 : str,
-        19 : str,
-        20 : str,
-        21 : str,
-    })
-
-    transfile_df.columns = [
-        "Ordnum","Otype","Otypesra",
-        "Ponumber","Billto","Billtoname",
-        "Bcntry","Shipto","Shipname",
-        "ISBN","Title","Client",
-        "Qty","Ext","Price","Discount"
-        ,"Currenttyp","RettyP","Linekey",
-        "Ingwhs","St_name","Pdate"
-    ]
-
-    return transfile_df
-
-def procces_cdt_file(cdt_path : str) -> pd.DataFrame:
-    cdt_df = pd.read_csv(cdt_path, header = None, dtype  = {
-        0 : str,
-        1 : str,
-        2 : str,
-        3 : str,
-        4 : str,
-        5 : int,
-        6 : str,
-        7 : int,
-        8 : str,
-        9 : str,
-        10 : str,
-        11 : str,
-        12 : str
-    })
-
-    cdt_df.columns = [
-        "TutNum","FileDate","WHS",
-        "ISBN10","UPS","EAN",
-        "Transcode","Qty","Each",
-        "Dispcode","Linenum","Acttype",
-        "FromLoc"
-    ]
+def proccess_transfile(transfile_path: str, columnar: bool = True, csv_backend: str | None = None) -> pd.DataFrame:
+    return load_ingram_file(transfile_path, TRANSFILE_LAYOUT, columnar=columnar, backend=csv_backend)
+
+def procces_cdt_file(cdt_path : str, columnar: bool = True, csv_backend: str | None = None) -> pd.DataFrame:
+    cdt_df = load_ingram_file(cdt_path, CDT_LAYOUT, columnar=columnar, backend=csv_backend)
 
     cdt_df['ToLoc'] = None
     cdt_df['PONum'] = None
     cdt_df['Qtyreq'] = None
 
-    def whs_updates(x: str) -> str:
-        if x.startswith('631760'):
-            return "IPS"
-        elif x == "6318681":
-            return "DAMAGE"
-        else:
-            return "ING"
-
-    cdt_df['WHS'] = cdt_df['WHS'].apply(lambda x : whs_updates(x))
+    # 631760* -> IPS, 6318681 -> DAMAGE, everything else ING
+    cdt_df['WHS'] = map_warehouse(cdt_df['WHS'])
 
     #DELETE FROM ips.dbo.IPS_INV WHERE Acttype = 'SS' OR Acttype = 'IM' OR Acttype ='RT'
     cdt_df = cdt_df[~cdt_df["Acttype"].isin(['SS','IM','RT'])]
@@ -140,31 +76,111 @@ def procces_cdt_file(cdt_path : str) -> pd.DataFrame:
     return cdt_df
 
 
-def proccess_cdp_file(cdp_path: str) -> pd.DataFrame:
+def proccess_cdp_file(cdp_path: str, columnar: bool = True, csv_backend: str | None = None) -> pd.DataFrame:
     """
     Reads the LOCKED.CDP file (comma-delimited, 13 columns) into a DataFrame.
     Mirrors the column structure of the dbo.LOCKED table from Locked_Import.dtsx.
     """
-    cdp_df = pd.read_csv(cdp_path, header=None, dtype={
-        0: str, 1: str, 2: str, 3: str, 4: str, 5: str, 6: str,
-        7: int,
-        8: str, 9: str, 10: str, 11: str, 12: str
-    })
-    cdp_df.columns = [
-        'F1', 'Fdate', 'San', 'ISBN10', 'F5', 'ISBN',
-        'Invcode', 'QTY',
-        'column9', 'column10', 'column11', 'column12', 'column13'
-    ]
-    return cdp_df
+    return load_ingram_file(cdp_path, CDP_LAYOUT, columnar=columnar, backend=csv_backend)
+
+
+CROSSREF_SQL = 'SELECT Billto, Ssacct FROM IPS.dbo.crossref'
+INGQTY_SQL = 'SELECT ISBN, CAST(INGOH AS int) AS INGOH FROM TUTLIV.dbo.INGQTY'
+
+
+class RerunLookups(NamedTuple):
+    """crossref and INGQTY fetched once for several reruns, a lookup that failed holds its error."""
+    crossref: pd.DataFrame | LookupError
+    ingqty: pd.DataFrame | LookupError
+
+
+def _query(sql: str) -> pd.DataFrame:
+    with get_db() as conn:
+        return pd.read_sql(sql, con=conn)
+
+
+def fetch_rerun_lookups() -> RerunLookups:
+    """
+    Reads crossref and INGQTY for reruns to share. A failure is kept as a LookupError (picklable,
+    unlike some driver errors) so each rerun skips that step the way it does when its own query fails.
+    """
+    def fetch(sql):
+        try:
+            return _query(sql)
+        except Exception as e:
+            logger.warning(f"Lookup failed, reruns will go without it: {sql}: {e}")
+            return LookupError(f"{type(e).__name__}: {e}")
+    return RerunLookups(crossref=fetch(CROSSREF_SQL), ingqty=fetch(INGQTY_SQL))
+
+
+def _lookup_params(lookups: RerunLookups) -> dict:
+    """What the IPS_DAILY outputs depend on from the database, for the run manifest."""
+    return {name: str(value) if isinstance(value, LookupError) else frame_digest(value)
+            for name, value in lookups._asdict().items()}
+
+
+def _lookup(lookups: RerunLookups | None, name: str, sql: str) -> pd.DataFrame:
+    if lookups is None:
+        return _query(sql)
+    value = getattr(lookups, name)
+    if isinstance(value, LookupError):
+        raise value
+    return value
 
 
 #take in full nework path with escapes e.g \\\\tutpub3\\VOL2\\TestFiles\\Manual_Reruns\\rerun_resources
-def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str, output_path: str) -> None:
+# stages of the rerun, in the order they run, as --force takes them
+RERUN_STAGES = ("transfer", "ips_daily", "cdp")
+# a fix to this module or the ones these come from reruns every stage
+RERUN_CODE = (__file__, assign_line_nums, load_ingram_file, write_sage_workbook, format_mdy)
+
+
+def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str, output_path: str,
+                               columnar: bool = True, csv_backend: str | None = None,
+                               lookups: RerunLookups | None = None, incremental: bool = False,
+                               force: tuple[str, ...] = ()) -> list[str]:
+    """
+    Writes a day's Transfer, RV, CR, SL, ING_Transfers, LOCKEDT and INPRO outputs into output_path.
+
+    Args:
+        columnar (bool): Load and keep the Parquet copies of the Ingram files
+        csv_backend (str, optional): CSV backend for the text parse, see ingram_files.parse_ingram_file
+        lookups (RerunLookups, optional): crossref and INGQTY already fetched, queried here when not given
+        incremental (bool): Keep a run manifest in output_path and skip the stages (RERUN_STAGES)
+            whose input files, lookups and code are unchanged since their last successful run
+        force (tuple[str, ...]): Stages to run even when unchanged, "all" for every stage
+
+    Returns:
+        list[str]: The stages skipped as unchanged
+    """
     os.makedirs(output_path, exist_ok=True)
+    manifest = RunManifest(os.path.join(output_path, MANIFEST_FILE) if incremental else None, force)
+    # the IPS_DAILY stage's key needs the lookups up front, so they're read once here instead of in the stage
+    if incremental and lookups is None:
+        lookups = fetch_rerun_lookups()
+
+    def outputs(*names):
+        return [os.path.join(output_path, n) for n in names]
+
+    manifest.run("transfer", lambda: _rerun_transfer(CDT_path, output_path, columnar, csv_backend),
+                 inputs=[CDT_path], outputs=outputs('Transfer.csv', 'TRANSFER_SAGE_UPLOAD.xlsx'), code=RERUN_CODE)
+    manifest.run("ips_daily", lambda: _rerun_ips_daily(transfile_path, output_path, columnar, csv_backend, lookups),
+                 inputs=[transfile_path],
+                 outputs=outputs('RV_SAGE_UPLOAD.xlsx', 'CR_SAGE_UPLOAD.xlsx', 'SL_SAGE_UPLOAD.xlsx', 'ING_Transfers.csv'),
+                 params=_lookup_params(lookups) if lookups is not None else None, code=RERUN_CODE)
+    manifest.run("cdp", lambda: _rerun_cdp(CDP_path, output_path, columnar, csv_backend),
+                 inputs=[CDP_path], outputs=outputs('LOCKEDT.TXT', 'INPRO.TXT'), code=RERUN_CODE)
+
+    if manifest.skipped:
+        logger.info(f"Reused unchanged outputs of {manifest.skipped}")
+    logger.info("Manual rerun complete — all output files generated.")
+    return manifest.skipped
+
 
+def _rerun_transfer(CDT_path: str, output_path: str, columnar: bool, csv_backend: str | None) -> None:
     # ─── Phase 1: CDT → IPS_INV → Transfer outputs (steps 8-10) ─────────────
     logger.info("Processing CDT file")
-    inv_df = procces_cdt_file(CDT_path)
+    inv_df = procces_cdt_file(CDT_path, columnar=columnar, csv_backend=csv_backend)
 
     # Transfer.csv — matches Transfer output.dtsx: fromloc starts with 'I'
     transfer_mask = inv_df['FromLoc'].notna() & inv_df['FromLoc'].str[:1].eq('I')
@@ -180,53 +196,20 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
     transfer_sage.columns = ['LINENUM', 'EAN', 'FROMLOC', 'TOLOC', 'QTY', 'PONUM', 'QTYREQ']
     transfer_sage_path = os.path.join(output_path, 'TRANSFER_SAGE_UPLOAD.xlsx')
 
-    for col in transfer_sage.columns:
-        transfer_sage[col] = transfer_sage[col].astype(str)
-
-    with pd.ExcelWriter(transfer_sage_path) as f:
-        transfer_sage.to_excel(f, sheet_name='Transfer', index=False)
-
-    wb: Workbook = pyxl_load_workbook(transfer_sage_path)
-
-    for sheet in ['Transfer']:
-        ws: Worksheet = wb[sheet]
-        for col_idx in range(1, ws.max_column + 1):
-            ws.column_dimensions[get_column_letter(col_idx)].number_format = '@'
-        for cell in ws[1]:
-            cell.font = Font(bold=False, underline='none')
-
-        cell_range = f"'{sheet}'!$A$1:${get_column_letter(ws.max_column)}${ws.max_row}"
-        wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
-
-    wb.save(transfer_sage_path)
-    wb.close()
+    write_sage_workbook(transfer_sage_path, {'Transfer': transfer_sage})
     logger.info(f"TRANSFER_SAGE_UPLOAD.xlsx written → {transfer_sage_path}")
 
+
+def _rerun_ips_daily(transfile_path: str, output_path: str, columnar: bool, csv_backend: str | None,
+                     lookups: RerunLookups | None) -> None:
     # ─── Phase 2: TransactionFile → IPS_DAILY (step 11) ──────────────────────
     logger.info("Processing TransactionFile")
-    daily_df = proccess_transfile(transfile_path)
+    daily_df = proccess_transfile(transfile_path, columnar=columnar, csv_backend=csv_backend)
 
     # Generate Line_num and Order_id — mirrors FIX.py logic
-    orddict = {}
-    ordIddict = {}
-    id_start = 6300
-    line_nums = []
-    order_ids = []
-
-    for ordnum in daily_df['Ordnum']:
-        if ordnum in orddict:
-            orddict[ordnum] += 1
-        else:
-            orddict[ordnum] = 1
-        line_nums.append(orddict[ordnum])
-
-        if ordnum not in ordIddict:
-            ordIddict[ordnum] = str(id_start)
-            id_start += 1
-        order_ids.append(ordIddict[ordnum])
-
+    line_nums, order_ids = assign_line_nums(daily_df['Ordnum'], id_start=6300)
     daily_df['Line_num'] = line_nums
-    daily_df['Order_id'] = order_ids
+    daily_df['Order_id'] = order_ids.astype(str)
 
     # ─── Step 15: IPS_DAILY Queries Part 1 ───────────────────────────────────
     daily_df = daily_df[daily_df['Qty'] != 0]
@@ -241,8 +224,7 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
     # Crossref lookup: remap Billto → Ssacct, set Crossref = 'X'
     daily_df['Crossref'] = None
     try:
-        with get_db() as conn:
-            crossref_df = pd.read_sql('SELECT Billto, Ssacct FROM IPS.dbo.crossref', con=conn)
+        crossref_df = _lookup(lookups, 'crossref', CROSSREF_SQL)
         crossref_map = dict(zip(crossref_df['Billto'], crossref_df['Ssacct']))
         xref_mask = daily_df['Billto'].isin(crossref_map.keys())
         daily_df.loc[xref_mask, 'Crossref'] = 'X'
@@ -309,38 +291,13 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
     ].copy()
 
     rv_header.columns = ['ORDUNIQ', 'ORDNUMBER', 'CUSTOMER', 'PONUMBER', 'ORDDATE', 'DESC', 'COMMENT', 'POSTINV']
-    rv_header['ORDDATE'] = pd.to_datetime(rv_header['ORDDATE'], errors='coerce').apply(
-        lambda x: f"{x.month}/{x.day}/{x.year}" if pd.notna(x) else None
-    )
+    rv_header['ORDDATE'] = format_mdy(pd.to_datetime(rv_header['ORDDATE'], errors='coerce'))
 
     rv_detail = rv_df[['Order_id', 'Line_num', 'ISBN', 'Review', 'Whs', 'Qty', 'Price', 'Discount', 'Repqty']].copy()
     rv_detail.columns = ['ORDUNIQ', 'LINENUM', 'ITEM', 'REVIEW', 'LOCATION', 'QTYORDERED', 'PRIUNTPRC', 'DISCPER', 'QTYSHIPPED']
 
     rv_path = os.path.join(output_path, 'RV_SAGE_UPLOAD.xlsx')
-    for col in rv_header.columns:
-        rv_header[col] = rv_header[col].astype(str)
-
-    for col in rv_detail.columns:
-        rv_detail[col] = rv_detail[col].astype(str)
-
-    with pd.ExcelWriter(rv_path) as f:
-        rv_header.to_excel(f, sheet_name='RV_Header', index=False)
-        rv_detail.to_excel(f, sheet_name='RV_Detail', index=False)
-
-    wb: Workbook = pyxl_load_workbook(rv_path)
-    for sheet in ['RV_Header', 'RV_Detail']:
-        ws: Worksheet = wb[sheet]
-        for col_idx in range(1, ws.max_column + 1):
-            ws.column_dimensions[get_column_letter(col_idx)].number_format = '@' #set all cells text format
-
-        for cell in ws[1]:
-            cell.font = Font(bold=False, underline='none')
-
-        cell_range = f"'{sheet}'!$A$1:${get_column_letter(ws.max_column)}${ws.max_row}"
-        wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
-
-    wb.save(rv_path)
-    wb.close()
+    write_sage_workbook(rv_path, {'RV_Header': rv_header, 'RV_Detail': rv_detail})
     logger.info(f"RV written: {len(rv_header)} header, {len(rv_detail)} detail → {rv_path}")
 
     # ─── Step 20: Delete reviews from working set 
@@ -353,9 +310,7 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
         ['Order_id', 'Ordnum', 'Billto', 'Ponumber', 'Pdate']
     ].copy()
     cr_header.columns = ['CRDUNIQ', 'ORDNUMBER', 'CUSTOMER', 'PONUMBER', 'ORDDATE']
-    cr_header['ORDDATE'] = pd.to_datetime(cr_header['ORDDATE'], errors='coerce').apply(
-        lambda x: f"{x.month}/{x.day}/{x.year}" if pd.notna(x) else None
-    )
+    cr_header['ORDDATE'] = format_mdy(pd.to_datetime(cr_header['ORDDATE'], errors='coerce'))
 
     cr_detail = cr_df[['Order_id', 'Line_num', 'ISBN', 'Qty', 'Price', 'Discount']].copy()
     cr_detail.columns = ['CRDUNIQ', 'LINENUM', 'ITEM', 'QTYRETURN', 'PRIUNTPRC', 'DISCPER']
@@ -363,29 +318,7 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
 
     cr_path = os.path.join(output_path, 'CR_SAGE_UPLOAD.xlsx')
 
-    for col in cr_header.columns:
-        cr_header[col] = cr_header[col].astype(str)
-
-    for col in cr_detail.columns:
-        cr_detail[col] = cr_detail[col].astype(str)
-
-    with pd.ExcelWriter(cr_path) as f:
-        cr_header.to_excel(f, sheet_name='Credit_Debit_Notes', index=False)
-        cr_detail.to_excel(f, sheet_name='Credit_Debit_Detail', index=False)
-
-    wb: Workbook = pyxl_load_workbook(cr_path)
-
-    for sheet in ['Credit_Debit_Notes', 'Credit_Debit_Detail']:
-        ws: Worksheet = wb[sheet]
-        for col_idx in range(1, ws.max_column + 1):
-            ws.column_dimensions[get_column_letter(col_idx)].number_format = '@'
-        for cell in ws[1]:
-            cell.font = Font(bold=False, underline='none')
-        cell_range = f"'{sheet}'!$A$1:${get_column_letter(ws.max_column)}${ws.max_row}"
-        wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
-
-    wb.save(cr_path)
-    wb.close()
+    write_sage_workbook(cr_path, {'Credit_Debit_Notes': cr_header, 'Credit_Debit_Detail': cr_detail})
     logger.info(f"CR written: {len(cr_header)} header, {len(cr_detail)} detail → {cr_path}")
 
     # ─── Steps 23-24: Export SLs
@@ -396,39 +329,13 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
     ].copy()
 
     sl_header.columns = ['ORDUNIQ', 'ORDNUMBER', 'CUSTOMER', 'PONUMBER', 'ORDDATE', 'DESC', 'COMMENT', 'POSTINV']
-    sl_header['ORDDATE'] = pd.to_datetime(sl_header['ORDDATE'], errors='coerce').apply(
-        lambda x: f"{x.month}/{x.day}/{x.year}" if pd.notna(x) else None
-    )
+    sl_header['ORDDATE'] = format_mdy(pd.to_datetime(sl_header['ORDDATE'], errors='coerce'))
 
     sl_detail = sl_df[['Order_id', 'Line_num', 'ISBN', 'Whs', 'Qty', 'Price', 'Discount', 'Repqty']].copy()
     sl_detail.columns = ['ORDUNIQ', 'LINENUM', 'ITEM', 'LOCATION', 'QTYORDERED', 'PRIUNTPRC', 'DISCPER', 'QTYSHIPPED']
 
     sl_path = os.path.join(output_path, 'SL_SAGE_UPLOAD.xlsx')
-    for col in sl_header.columns:
-        sl_header[col] = sl_header[col].astype(str)
-    for col in sl_detail.columns:
-        sl_detail[col] = sl_detail[col].astype(str)
-
-    with pd.ExcelWriter(sl_path) as f:
-        sl_header.to_excel(f, sheet_name='Orders', index=False)
-        sl_detail.to_excel(f, sheet_name='Order_Details', index=False)
-
-    wb: Workbook = pyxl_load_workbook(sl_path)
-
-    for sheet in ['Orders', 'Order_Details']:
-        ws: Worksheet = wb[sheet]
-
-        for col_idx in range(1, ws.max_column + 1):
-            ws.column_dimensions[get_column_letter(col_idx)].number_format = '@'
-
-        for cell in ws[1]:
-            cell.font = Font(bold=False, underline='none')
-            
-        cell_range = f"'{sheet}'!$A$1:${get_column_letter(ws.max_column)}${ws.max_row}"
-        wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
-
-    wb.save(sl_path)
-    wb.close()
+    write_sage_workbook(sl_path, {'Orders': sl_header, 'Order_Details': sl_detail})
     logger.info(f"SL written: {len(sl_header)} header, {len(sl_detail)} detail → {sl_path}")
 
     # ─── Step 25: ING_Transfers.csv ───────────────────────────────────────────
@@ -442,8 +349,7 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
         )
         ips_qtys.columns = ['ISBN', 'IPS_Qty']
 
-        with get_db() as conn:
-            ingqty_df = pd.read_sql('SELECT ISBN, CAST(INGOH AS int) AS INGOH FROM TUTLIV.dbo.INGQTY', con=conn)
+        ingqty_df = _lookup(lookups, 'ingqty', INGQTY_SQL)
 
         ing_merged = ingqty_df.merge(ips_qtys, on='ISBN', how='inner')
         ing_merged['TOTAL_QTY_ING'] = ing_merged['INGOH'] - ing_merged['IPS_Qty']
@@ -456,9 +362,11 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
     except Exception as e:
         logger.warning(f"ING_Transfers.csv skipped — could not query TUTLIV.dbo.INGQTY: {e}")
 
+
+def _rerun_cdp(CDP_path: str, output_path: str, columnar: bool, csv_backend: str | None) -> None:
     # ─── Steps 27-29: CDP file → LOCKEDT.TXT + INPRO.TXT ─────────────────────
     logger.info("Processing CDP file")
-    cdp_df = proccess_cdp_file(CDP_path)
+    cdp_df = proccess_cdp_file(CDP_path, columnar=columnar, csv_backend=csv_backend)
 
     # LOCKEDT.TXT — mirrors LOCKED_EXPORT.dtsx: Invcode='QH' AND San='631760X'
     # Output: F1,Fdate,San,ISBN10,F5,ISBN,Invcode,QTY
@@ -479,5 +387,3 @@ def proccess_daily_files_rerun(CDT_path: str, CDP_path: str, transfile_path: str
     inpro_path = os.path.join(output_path, 'INPRO.TXT')
     inpro_df.to_csv(inpro_path, index=False, header=True)
     logger.info(f"INPRO.TXT written: {len(inpro_df)} rows → {inpro_path}")
-
-    logger.info("Manual rerun complete — all output files generated.")
@@ -1,20 +1,89 @@
 import logging
+from helpers import metrics
 from helpers.db_conn import get_db
 from helpers.context import DailyFilesContext
 import pandas as pd
-from openpyxl import load_workbook as pyxl_load_workbook
-from openpyxl.workbook.defined_name import DefinedName
-from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.styles import Font
+from sqlalchemy import text
+from logic.sage_workbook import write_sage_workbook
+from logic.transforms import format_mdy
+
+IPS_DAILY_TABLE = "IPS.dbo.IPS_DAILY"
+
+# (IPS_DAILY column, Sage column) of the four frames the uploads are built from
+SAGE_FRAME_COLUMNS: dict[str, list[tuple[str, str]]] = {
+    "sl_header": [("Order_id", "ORDUNIQ"), ("Ordnum", "ORDNUMBER"), ("Billto", "CUSTOMER"), ("Ponumber", "PONUMBER"),
+                  ("Pdate", "ORDDATE"), ("Rep_inv", "DESC"), ("Traninfo", "COMMENT"), ("Post", "POSTINV")],
+    "sl_detail": [("Order_id", "ORDUNIQ"), ("Line_num", "LINENUM"), ("ISBN", "ITEM"), ("Whs", "LOCATION"),
+                  ("Qty", "QTYORDERED"), ("Price", "PRIUNTPRC"), ("Discount", "DISCPER"), ("Repqty", "QTYSHIPPED")],
+    "credit_header": [("Order_id", "CRDUNIQ"), ("Ordnum", "ORDNUMBER"), ("Billto", "CUSTOMER"), ("Ponumber", "PONUMBER"),
+                      ("Pdate", "ORDDATE")],
+    "credit_details": [("Order_id", "CRDUNIQ"), ("Line_num", "LINENUM"), ("ISBN", "ITEM"), ("Whs", "LOCATION"),
+                       ("Qty", "QTYRETURN"), ("Price", "PRIUNTPRC"), ("Discount", "DISCPER")],
+}
+
+
+def _fetch_ips_daily(con) -> dict[str, pd.DataFrame]:
+    """
+    Reads IPS_DAILY once and derives the SL and credit header/detail frames the four separate
+    queries used to return.
+
+    The filters follow the SQL they replace: NULLs never pass Otype <> 'Return' or
+    Discount <> 100.0, Otype compares without case or trailing blanks, and rows are stably
+    sorted on Order_id (then Line_num) with NULLs first. Each frame is built from its own rows
+    the way read_sql builds one, so its dtypes are what its own query gave.
+
+    Returns:
+        dict[str, pd.DataFrame]: sl_header, sl_detail, credit_header and credit_details
+    """
+    needed = list(dict.fromkeys(src for cols in SAGE_FRAME_COLUMNS.values() for src, _ in cols))
+    with con.connect() as conn:
+        res = conn.execute(text(f"SELECT {', '.join(needed + ['Otype'])} FROM {IPS_DAILY_TABLE}"))
+        daily = pd.DataFrame(res.fetchall(), columns=needed + ["Otype"], dtype=object)
+    logging.info(f"selected {daily.shape[0]} IPS_DAILY rows for all sage uploads")
+
+    otype = daily["Otype"].astype(str).str.rstrip(" ").str.upper().where(daily["Otype"].notna())
+    is_return = otype.eq("RETURN")
+    not_return = otype.notna() & ~is_return
+    first_line = pd.to_numeric(daily["Line_num"], errors="coerce").eq(1)
+    discount = pd.to_numeric(daily["Discount"], errors="coerce")
+    not_review = discount.notna() & discount.ne(100.0)
+
+    masks = {
+        "sl_header": not_return & first_line & not_review,
+        "sl_detail": not_return & not_review,
+        "credit_header": is_return & first_line,
+        "credit_details": is_return,
+    }
+    frames = {}
+    for name, cols in SAGE_FRAME_COLUMNS.items():
+        sort_by = ["Order_id"] if name.endswith("header") else ["Order_id", "Line_num"]
+        rows = daily.loc[masks[name]].sort_values(sort_by, kind="stable", na_position="first")
+        frames[name] = pd.DataFrame.from_records(
+            list(rows[[src for src, _ in cols]].itertuples(index=False, name=None)),
+            columns=[alias for _, alias in cols],
+            coerce_float=True,
+        )
+    return frames
+
+
+@metrics.instrumented()
+def generate_sage_uploads(single_fetch: bool = False):
+    """
+    Writes SL_SAGE_UPLOAD.xlsx and CR_SAGE_UPLOAD.xlsx from IPS_DAILY into the daily files folder.
+
+    Args:
+        single_fetch (bool): Read IPS_DAILY in one query and split it in pandas, instead of one
+            query per frame
+    """
 
+    with get_db() as tutliv:
+            daily = _fetch_ips_daily(tutliv) if single_fetch else None
 
-def generate_sage_uploads():
+            def select(frame, sql):
+                return daily[frame] if daily is not None else pd.read_sql(sql, con = tutliv)
 
-    with get_db() as tutliv:
             logging.info("Selecting sl header")
-            sl_header = pd.read_sql(
+            sl_header = select("sl_header",
             """
                 SELECT Order_id as ORDUNIQ, Ordnum as ORDNUMBER, Billto as CUSTOMER, Ponumber as PONUMBER, Pdate as ORDDATE, Rep_inv as [DESC], Traninfo as COMMENT, Post as POSTINV
                 FROM IPS.dbo.IPS_DAILY
@@ -22,86 +91,65 @@ def generate_sage_uploads():
                 AND Line_num = 1 
                 AND Discount <> 100.0
                 ORDER BY Order_id;
-            """, con = tutliv)
+            """)
 
             sl_header['ORDDATE'] = pd.to_datetime(sl_header['ORDDATE'])
-            sl_header['ORDDATE'] = sl_header['ORDDATE'].apply(lambda x: f"{x.month}/{x.day}/{x.year}")
+            sl_header['ORDDATE'] = format_mdy(sl_header['ORDDATE'], na_value="nan/nan/nan")
 
             logging.info(f'successfully selected {sl_header.shape[0]} records for sl_header')
 
             logging.info("selecting sl_detail")
 
-            sl_detail = pd.read_sql(
+            sl_detail = select("sl_detail",
                 """
                 SELECT Order_id as ORDUNIQ, Line_num as LINENUM, ISBN as ITEM, Whs as [LOCATION], Qty as QTYORDERED, Price as PRIUNTPRC, Discount as DISCPER, Repqty as QTYSHIPPED
                 FROM IPS.dbo.IPS_DAILY
                 WHERE Otype <> 'Return' AND Discount <> 100.0
                 ORDER BY Order_id, Line_num;
-                """, con = tutliv)
+                """)
 
             logging.info(f"Selected {sl_detail.shape[0]} rows for sl_detail")
             
 
             sl_filename = "SL_SAGE_UPLOAD.xlsx"
 
-            for col in sl_header.columns:
-                sl_header[col] = sl_header[col].astype(str)
-            for col in sl_detail.columns:
-                sl_detail[col] = sl_detail[col].astype(str)
-
             logging.info('writing dfs to excel sheet')
-            with pd.ExcelWriter(DailyFilesContext.daily_files_path().joinpath(sl_filename)) as f:
-                sl_header.to_excel(f,sheet_name = "Orders", index = False)
-                sl_detail.to_excel(f,sheet_name = 'Order_Details', index = False)
-            
-            wb: Workbook = pyxl_load_workbook(DailyFilesContext.daily_files_path().joinpath(sl_filename))
-            for sheet in ['Orders', 'Order_Details']:
-                ws: Worksheet = wb[sheet]
-                for col_idx in range(1, ws.max_column + 1):
-                    ws.column_dimensions[get_column_letter(col_idx)].number_format = '@'
-                for cell in ws[1]:
-                    cell.font = Font(bold=False, underline='none')
-                last_row = ws.max_row
-                last_col = get_column_letter(ws.max_column)
-                cell_range = f"'{sheet}'!$A$1:${last_col}${last_row}"
-                wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
-            wb.save(DailyFilesContext.daily_files_path().joinpath(sl_filename))
-            wb.close()
+            write_sage_workbook(DailyFilesContext.daily_files_path().joinpath(sl_filename), {
+                "Orders": sl_header,
+                "Order_Details": sl_detail,
+            })
 
             logging.info("successfully wrote sl header and detail")
+            metrics.current().add(rows_in=len(sl_header) + len(sl_detail), rows_out=len(sl_header) + len(sl_detail)) \
+                .wrote_file(DailyFilesContext.daily_files_path().joinpath(sl_filename))
 
             logging.info('selecting credit header')
-            credit_header = pd.read_sql(
+            credit_header = select("credit_header",
                 """
                 SELECT Order_id as CRDUNIQ, Ordnum as ORDNUMBER, Billto as CUSTOMER, Ponumber as PONUMBER, Pdate as ORDDATE
                 FROM IPS.dbo.IPS_DAILY
                 WHERE Otype = 'Return' AND Line_num = 1
                 ORDER BY Order_id;
-                """, con = tutliv)
+                """)
 
             credit_header['ORDDATE'] = pd.to_datetime(credit_header['ORDDATE'])
-            credit_header['ORDDATE'] = credit_header['ORDDATE'].apply(lambda x: f"{x.month}/{x.day}/{x.year}")
+            credit_header['ORDDATE'] = format_mdy(credit_header['ORDDATE'], na_value="nan/nan/nan")
 
             logging.info(f"selected {credit_header.shape[0]} credit header")
             logging.info(f"selecting credit details")
-            credit_details = pd.read_sql(
+            credit_details = select("credit_details",
                 """
                 SELECT Order_id as CRDUNIQ, Line_num as LINENUM, ISBN as ITEM, Whs as [LOCATION], Qty as [QTYRETURN], Price as PRIUNTPRC, Discount as DISCPER
                 FROM IPS.dbo.IPS_DAILY
                 WHERE Otype = 'Return'
                 ORDER BY Order_id, Line_num;
-                """, con = tutliv)
+                """)
             
             credit_details['LOCATION'] = 'DAMAGE'
             logging.info(f"selected {credit_details.shape[0]} rows for credit detail")
             
             cr_filename = "CR_SAGE_UPLOAD.xlsx"
 
-            for col in credit_header.columns:
-                credit_header[col] = credit_header[col].astype(str)
-            for col in credit_details.columns:
-                credit_details[col] = credit_details[col].astype(str)
-
             #need to make blank dfs for multiple sheets or the upload will throw error
             credit_debit_detail_serial_nos = pd.DataFrame(columns = [
                 "CRDUNIQ",
@@ -188,37 +236,19 @@ def generate_sage_uploads():
 
 
             logging.info("writing credits to sheet")
-            with pd.ExcelWriter(DailyFilesContext.daily_files_path().joinpath(cr_filename)) as f:
-                credit_header.to_excel(f, sheet_name="Credit_Debit_Notes", index=False)
-                credit_details.to_excel(f, sheet_name="Credit_Debit_Details", index=False)
-                credit_debit_detail_serial_nos.to_excel(f, sheet_name="Credit_Debit_Detail_Serial_Nos", index=False)
-                credit_debit_detail_lot_numbers.to_excel(f, sheet_name="Credit_Debit_Detail_Lot_Numbers", index=False)
-                crd_dbn_comments_instructions.to_excel(f, sheet_name="Crd_Dbn_Comments_Instructions", index=False)
-                credit_debit_note_opt_fields.to_excel(f, sheet_name="Credit_Debit_Note_Opt_Fields", index=False)
-                credit_debit_detail_opt_fields.to_excel(f, sheet_name="Credit_Debit_Detail_Opt_Fields", index=False)
-
-            wb: Workbook = pyxl_load_workbook(DailyFilesContext.daily_files_path().joinpath(cr_filename))
-            for sheet in [
-                'Credit_Debit_Notes',
-                'Credit_Debit_Details',
-                'Credit_Debit_Detail_Serial_Nos',
-                'Credit_Debit_Detail_Lot_Numbers',
-                'Crd_Dbn_Comments_Instructions',
-                'Credit_Debit_Note_Opt_Fields',
-                'Credit_Debit_Detail_Opt_Fields',
-            ]:
-                ws: Worksheet = wb[sheet]
-                for col_idx in range(1, ws.max_column + 1):
-                    ws.column_dimensions[get_column_letter(col_idx)].number_format = '@'
-                for cell in ws[1]:
-                    cell.font = Font(bold=False, underline='none')
-                last_row = ws.max_row
-                last_col = get_column_letter(ws.max_column)
-                cell_range = f"'{sheet}'!$A$1:${last_col}${last_row}"
-                wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
-            wb.save(DailyFilesContext.daily_files_path().joinpath(cr_filename))
-            wb.close()
+            write_sage_workbook(DailyFilesContext.daily_files_path().joinpath(cr_filename), {
+                "Credit_Debit_Notes": credit_header,
+                "Credit_Debit_Details": credit_details,
+                "Credit_Debit_Detail_Serial_Nos": credit_debit_detail_serial_nos,
+                "Credit_Debit_Detail_Lot_Numbers": credit_debit_detail_lot_numbers,
+                "Crd_Dbn_Comments_Instructions": crd_dbn_comments_instructions,
+                "Credit_Debit_Note_Opt_Fields": credit_debit_note_opt_fields,
+                "Credit_Debit_Detail_Opt_Fields": credit_debit_detail_opt_fields,
+            })
             logging.info("successfully wrote credits to sheet")
+            metrics.current().add(rows_in=len(credit_header) + len(credit_details),
+                                  rows_out=len(credit_header) + len(credit_details)) \
+                .wrote_file(DailyFilesContext.daily_files_path().joinpath(cr_filename))
 
 if __name__ == "__main__":
     generate_sage_uploads()
\ No newline at end of file
@@ -0,0 +1,67 @@
+import logging
+from pathlib import Path
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from openpyxl.workbook.defined_name import DefinedName
+
+"""
+Writer for the xlsx files Sage300 imports.
+
+Sage wants every column text formatted, a plain header row and a defined name per sheet covering
+its data. These used to be added by writing the workbook with pandas, loading it back with openpyxl,
+patching it cell by cell and saving it again. Here the rows are streamed once through a write-only
+workbook with all of that applied on the way.
+"""
+
+TEXT_FORMAT = '@'
+
+HEADER_FONT = Font(bold=False, underline='none')
+
+
+def _header_cell(ws, value) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.font = HEADER_FONT
+    return cell
+
+
+def _text_rows(df: pd.DataFrame):
+    """Rows of df as text, the same strings astype(str) gives, with missing values left as empty cells."""
+    columns = [df[col].astype(str) for col in df.columns]
+    for row in zip(*columns):
+        yield tuple(None if pd.isna(v) else v for v in row)
+
+
+def write_sage_workbook(path: str | Path, sheets: dict[str, pd.DataFrame]) -> None:
+    """
+    Writes a Sage upload workbook in a single pass.
+
+    Every value is written as text (as astype(str) renders it) in text formatted columns, the header
+    row is not bold and each sheet gets a workbook defined name of its own name covering the header
+    and all rows.
+
+    Args:
+        path (str | Path): The xlsx file to write
+        sheets (dict[str, pd.DataFrame]): Sheet name to its rows, in sheet order
+    """
+    wb = Workbook(write_only=True)
+    for sheet, df in sheets.items():
+        ws = wb.create_sheet(sheet)
+        n_cols = len(df.columns)
+        # column styles have to be in place before the first row is written
+        for col_idx in range(1, n_cols + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].number_format = TEXT_FORMAT
+
+        ws.append([_header_cell(ws, str(c)) for c in df.columns])
+        n_rows = 1
+        for row in _text_rows(df):
+            ws.append(row)
+            n_rows += 1
+
+        last_col = get_column_letter(max(n_cols, 1))
+        cell_range = f"'{sheet}'!$A$1:${last_col}${n_rows}"
+        wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
+        logging.info(f"Sage sheet {sheet}: {n_rows - 1} rows")
+    wb.save(path)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+"""
+Column transforms shared by the CDT, rerun and Sage paths, done on whole columns instead of a
+Python call per row.
+"""
+
+# CDT warehouse account -> warehouse, prefixes are checked before exact matches
+CDT_WHS_PREFIXES = {"631760": "IPS"}
+CDT_WHS_EXACT = {"6318681": "DAMAGE"}
+CDT_WHS_DEFAULT = "ING"
+
+
+def map_warehouse(values: pd.Series, prefixes: dict[str, str] | None = None, exact: dict[str, str] | None = None,
+                  default: str = CDT_WHS_DEFAULT) -> pd.Series:
+    """
+    Maps warehouse codes by prefix, then by exact value, anything else gets the default.
+
+    Args:
+        values (pd.Series): Warehouse codes as text
+        prefixes (dict[str, str], optional): Prefix to warehouse, checked in order. Defaults to CDT_WHS_PREFIXES
+        exact (dict[str, str], optional): Code to warehouse. Defaults to CDT_WHS_EXACT
+        default (str): Warehouse for codes that match nothing, missing codes included
+
+    Returns:
+        pd.Series: The warehouses, same index as values
+    """
+    prefixes = CDT_WHS_PREFIXES if prefixes is None else prefixes
+    exact = CDT_WHS_EXACT if exact is None else exact
+    text = values.astype(object).where(values.notna(), "").astype(str)
+
+    conditions = [text.str.startswith(prefix).to_numpy() for prefix in prefixes]
+    conditions += [text.eq(code).to_numpy() for code in exact]
+    choices = list(prefixes.values()) + list(exact.values())
+    if not conditions:
+        return pd.Series(default, index=values.index)
+    return pd.Series(np.select(conditions, choices, default), index=values.index)
+
+
+def format_mdy(dates: pd.Series, na_value: str | None = None) -> pd.Series:
+    """
+    Formats dates as M/D/YYYY without zero padding (1/4/2026), the date format Sage imports.
+
+    Args:
+        dates (pd.Series): datetime64 values, NaT allowed
+        na_value (str, optional): What NaT becomes. The Sage uploads have always written "nan/nan/nan"
+            for it, the rerun None
+
+    Returns:
+        pd.Series: The formatted dates, same index as dates
+    """
+    valid = dates.notna().to_numpy()
+    out = np.full(len(dates), na_value, dtype=object)
+    if valid.any():
+        good = dates[valid]
+        out[valid] = (
+            good.dt.month.astype(str) + "/" + good.dt.day.astype(str) + "/" + good.dt.year.astype(str)
+        ).to_numpy()
+    return pd.Series(out, index=dates.index)
@@ -1,3 +1,4 @@
+import argparse
 import datetime
 import getpass  
 import pyodbc   
@@ -6,18 +7,29 @@ import ftplib, os, shutil, time, fnmatch
 import logic.FTP as FTP
 import logic.FIX as FIX
 import logging
+import multiprocessing
 import smtplib
 from email.message import EmailMessage
-from helpers.SQL import SQLrun
-from helpers.db_conn import get_db
+from helpers import metrics
+from helpers.SQL import SQLrun, wait_for_job
+from helpers.db_conn import get_db, pool_stats
 from helpers.context import DailyFilesContext
+from helpers.run_manifest import FORCE_ALL, RunManifest
 from logic.sage_uploads import generate_sage_uploads
 from logic.generate_daily_reports import generate_daily_reports
+from logic.ingram_files import write_daily_columnar
+from logic.bulk_load import BULK_LOAD, load_ingram_staging
 from pyodbc import *
 import pandas as pd
 import sys
 from helpers.ENV import EMAIL_CONFIG
 from helpers.email_helpers import send_failure_email
+from helpers.stage_graph import Stage, run_stage_graph
+
+# stages of the daily run the run manifest can skip, as --force takes them
+DAILY_STAGES = ("ftp_pull", "file_fixes", "fixes", "sql_job", "send_emails", "sage_uploads", "daily_reports", "bulk_load")
+# what the SQL job imports from Daily Files
+SQL_JOB_FILES = ["IPS_INV.CDT", "LOCKED.CDP", "IPS_DAILY_NO_LINE_NUM.TXT", "IPS_DAILY.TXT"]
 
 def setup_logging():
     daily_file_logs_dir = DailyFilesContext.daily_files_logs_path()
@@ -34,9 +46,31 @@ def setup_logging():
             logging.FileHandler(log_file,mode='w'),
             logging.StreamHandler()  
     ])
+    metrics.configure(metrics.metrics_path_for(log_file))
+
+
+def _pulled_files(daily_dir, names, day_obj):
+    return [os.path.join(daily_dir, str(names["CDT"])), os.path.join(daily_dir, str(names["CDP"])),
+            os.path.join(daily_dir, FTP.Name_Creator("Trans", day_obj))]
+
+def _sql_job_inputs():
+    dest_dir = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\Daily Files"
+    return [os.path.join(dest_dir, f) for f in SQL_JOB_FILES]
 
+@metrics.instrumented()
+def run_daily_file(manifest: RunManifest | None = None):
+    """
+    Pulls, copies and fixes the day's files then starts the SQL job.
 
-def run_daily_file():
+    Args:
+        manifest (RunManifest, optional): Skips the stages whose inputs are unchanged since their last
+            successful run. Without one every stage runs
+
+    Returns:
+        SQLJob | None: Handle of the started SQL job, None if it was not started
+    """
+    if manifest is None:
+        manifest = RunManifest(None)
     logging.info("Starting daily file run")
     # Create a proper datetime object instead of a string
     day_obj = datetime.datetime.now() + datetime.timedelta(days=-1)
@@ -44,26 +78,53 @@ def run_daily_file():
     day_str = day_obj.strftime('%m/%d/%y')
     
     logging.info(f"Processing date: {day_str}")
+    daily_dir = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\" + FTP.Name_Creator("Folder", day_obj)
+    dest_dir = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\Daily Files"
     
     try:
-        # Pass the datetime object instead of string
-        FTP.Daily_Folder_Setup(day_obj)
-        logging.info("Folder setup complete")
-        
-        names = FTP.FTP_pull(day_obj)
-        logging.info(f"FTP pull complete: {names}")
-        
-        FTP.File_Copy(names, day_obj)
-        logging.info("File copy complete")
+        # the setup wipes the daily folder and File_Copy copies everything in it, so both only
+        # happen along with a fresh pull (unchanged remote files come out of the mirror cache)
+        def pull():
+            # Pass the datetime object instead of string
+            FTP.Daily_Folder_Setup(day_obj)
+            logging.info("Folder setup complete")
+
+            names = FTP.FTP_pull(day_obj)
+            logging.info(f"FTP pull complete: {names}")
+
+            FTP.File_Copy(names, day_obj)
+            logging.info("File copy complete")
+            return names
+
+        params = {"day": day_str}
+        if manifest.path is not None:
+            # a file Ingram republishes under the same name has a new size or modify time, listing
+            # them first makes it a new pull (and everything after it) instead of yesterday's result
+            params["remote"] = FTP.remote_day_files(day_obj)
+        names = manifest.run(
+            "ftp_pull", pull,
+            outputs=lambda names: _pulled_files(daily_dir, names, day_obj) + [os.path.join(dest_dir, f) for f in SQL_JOB_FILES[:3]],
+            params=params, code=(FTP.FTP_pull,),
+        )
+        pulled = _pulled_files(daily_dir, names, day_obj)
         
-        FTP.File_Fixes(names, day_obj)
+        manifest.run(
+            "file_fixes", lambda: FTP.File_Fixes(names, day_obj), inputs=pulled,
+            outputs=[os.path.join(daily_dir, f) for f in ("IPS_INV.CDT", "Locked.CDP", "IPS_DALY.txt")],
+            code=(FTP.File_Fixes,),
+        )
         logging.info("File fixes complete")
         
-        FIX.Fixes()
+        manifest.run(
+            "fixes", FIX.Fixes, inputs=[os.path.join(dest_dir, "IPS_DAILY_NO_LINE_NUM.TXT")],
+            outputs=[os.path.join(dest_dir, "IPS_DAILY.TXT")], code=(FIX.Fixes,),
+        )
         logging.info("Additional fixes complete")
+
+        columnar = write_daily_columnar(daily_dir)
+        logging.info(f"Columnar copies written: {[p.name for p in columnar]}")
         
         # Add verification before calling SQLrun()
-        dest_dir = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\Daily Files"
         required_files = ["IPS_INV.CDT", "LOCKED.CDP", "IPS_DAILY_NO_LINE_NUM.TXT"]
         
         missing_files = []
@@ -85,20 +146,26 @@ def run_daily_file():
             logging.error(error_msg)
             logging.error(f"Files in destination directory: {os.listdir(dest_dir)}")
             send_failure_email(error_msg)
-            return
+            return None
         # Only run SQL job if all files exist and have content
         logging.info("All required files verified in Daily Files directory")
+        if manifest.is_current("sql_job", inputs=_sql_job_inputs()):
+            logging.info("Daily Files unchanged since the last successful SQL job, not starting it")
+            return None
         logging.info("About to run SQL Job")
-        SQLrun()
+        job = SQLrun()
         logging.info("SQL Job function called")
+        return job
 
         
     except Exception as e:
         error_msg = f"Error in processing: {e}"
         logging.error(error_msg, exc_info=True)
         send_failure_email(error_msg)
+        return None
     
 #send emails at the end
+@metrics.instrumented()
 def send_emails():
     dir_date = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%m%d%Y")
     daily_files_folder_path = DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\" + dir_date
@@ -125,6 +192,7 @@ def send_emails():
                 file_name = os.path.basename(file_path)
             msg.add_attachment(file_data, maintype='application', 
                               subtype='octet-stream', filename=file_name)
+            metrics.current().add(bytes_read=len(file_data), rows_out=1)
             logging.info(f"Attached file: {file_name}")
         except Exception as e:
             logging.error(f"Failed to attach {file_path}: {e}")
@@ -137,40 +205,96 @@ def send_emails():
     except Exception as e:
         logging.error(f"Failed to send email: {e}")
     
+#cant send emails until the SQL server JOB has moved the reports into the Reports folder
+@metrics.instrumented()
+def wait_for_sql_job(job):
+    if job is None:
+        raise RuntimeError("SQL job was not started, see the daily file errors above")
+    wait_for_job(job, timeout=1800)
+
+    dir_date = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%m%d%Y")
+    report_folder_path = os.path.join(DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\", dir_date, "Reports")
+    if not os.path.exists(report_folder_path):
+        raise FileNotFoundError(f"SQL job succeeded but {report_folder_path} does not exist")
+
+
+def _daily_report_files():
+    """The xlsx and pdf files generate_daily_reports left in the daily folder."""
+    pdfs = sorted(DailyFilesContext.daily_files_path().joinpath("New_Reports").glob("*.pdf"))
+    return pdfs + [DailyFilesContext.daily_files_path().joinpath("Reports", f"{p.stem}.xlsx") for p in pdfs]
+
+
+def pipeline_stages(force=()):
+    """
+    The daily run as a stage graph. The Sage uploads don't need the email so they overlap with it.
+    The daily reports write into the same Reports folder the email attaches from, so they still
+    wait for the email to go out.
+
+    Each stage goes through the day's run manifest in the local cache, so a rerun of the day skips
+    what is unchanged. The stages after the SQL job read what it loaded into the database, they
+    rerun whenever it does. With BULK_LOAD set the parsed files also go straight into the staging
+    tables, next to the SQL job.
+
+    Args:
+        force (iterable[str]): DAILY_STAGES to run even when unchanged, "all" for every stage
+    """
+    started = {}
+    manifest = RunManifest(str(DailyFilesContext.run_manifest_path()), force)
+
+    def daily_file():
+        started["job"] = run_daily_file(manifest)
+
+    def emails():
+        reports_path = DailyFilesContext.daily_files_path().joinpath("Reports")
+        attachments = sorted(reports_path.iterdir()) if reports_path.is_dir() else []
+        manifest.run("send_emails", send_emails, inputs=[p for p in attachments if p.is_file()], after=("sql_job",))
+
+    stages = [
+        Stage("daily_file", daily_file),
+        Stage("sql_job", lambda: manifest.run("sql_job", lambda: wait_for_sql_job(started.get("job")), inputs=_sql_job_inputs()),
+              depends_on=("daily_file",), timeout=1800 + 60),
+        #finally send emails of the generated pdf reports.
+        Stage("send_emails", emails, depends_on=("sql_job",), timeout=600),
+        # bhuvan wants copied files from the db, we can easily db_conn read them and excel write them into sage uploads without messing around with the current files.
+        Stage("sage_uploads", lambda: manifest.run(
+            "sage_uploads", lambda: generate_sage_uploads(single_fetch=True),
+            outputs=[DailyFilesContext.daily_files_path().joinpath(f) for f in ("SL_SAGE_UPLOAD.xlsx", "CR_SAGE_UPLOAD.xlsx")],
+            code=(generate_sage_uploads,), after=("sql_job",),
+        ), depends_on=("sql_job",), timeout=1800),
+        Stage("daily_reports", lambda: manifest.run(
+            "daily_reports", lambda: generate_daily_reports(single_scan=True, parallel=True, local_titles=True),
+            outputs=lambda _: _daily_report_files(), code=(generate_daily_reports,), after=("sql_job",),
+        ), depends_on=("send_emails",), timeout=1800),
+    ]
+    if BULK_LOAD:
+        # the fixed files in the daily folder, the columnar copies written next to them make the parse quick
+        fixed = [str(DailyFilesContext.daily_files_path().joinpath(f)) for f in ("IPS_INV.CDT", "Locked.CDP", "IPS_DALY.txt")]
+        stages.append(Stage("bulk_load", lambda: manifest.run(
+            "bulk_load", lambda: [r.rows for r in load_ingram_staging(*fixed)], inputs=fixed, code=(load_ingram_staging,),
+        ), depends_on=("daily_file",), timeout=1800))
+    return stages
+
+
 if __name__ == "__main__":
+    # the report rendering pool spawns workers, in the PyInstaller exe they start by re-running this
+    # file and freeze_support hands them to multiprocessing before anything else runs
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Daily files run for yesterday")
+    parser.add_argument("--force", action="append", default=[], choices=[*DAILY_STAGES, FORCE_ALL], metavar="STAGE",
+                        help=f"rerun a stage even if its inputs are unchanged, one of {', '.join(DAILY_STAGES)} or {FORCE_ALL}")
+    args = parser.parse_args()
     try:
         setup_logging()
         logging.info("----- New execution started -----")
         logging.info(f"Running as user: {getpass.getuser()}")
         logging.info(f"Current directory: {os.getcwd()}")
-        
-        run_daily_file()
-        #cant send emails until reports are moved into Reports folder after SQL server JOB
-        dir_date = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%m%d%Y")
-        report_folder_path = os.path.join(DailyFilesContext.fileserver_base() + "\\vol2\\FOXPRO\\TestFiles\\", dir_date, "Reports")
-        time_waited = 0
-        interval = 20
-        time_out = 1800
-        while not os.path.exists(report_folder_path):
-            if time_waited >= time_out:
-                error_msg = f'Timed out waiting for reports folder to be created after {time_out} seconds'
-                logging.error(error_msg)
-                send_failure_email(error_msg)
-                sys.exit(1)
-            logging.info(f"at {time_waited}, {report_folder_path} still does not exist")
-            time.sleep(interval)
-            time_waited += interval
-            
-        time.sleep(30)
-        #finally send emails of the generated pdf reports.
-        send_emails()
 
-        """
-        bhuvan wants copied files from the db, we can easily db_conn read them and excel write them into sage uploads without messing around with the current files.
-        """
-        generate_sage_uploads()
-        generate_daily_reports()
+        stages = pipeline_stages(force=args.force)
+        run_stage_graph(stages, max_workers=len(stages))
+        for dsn, stats in pool_stats().items():
+            logging.info(f"DB pool {dsn}: {stats['checkouts']} checkouts, wait avg {stats['wait_avg']:.3f}s max {stats['wait_max']:.3f}s")
         logging.info("----- Execution completed -----")
+        metrics.log_summary()
     except ImportError as e:
         error_msg = f"IMPORT ERROR: {e}"
         logging.error(error_msg)
@@ -179,5 +303,6 @@ if __name__ == "__main__":
     except Exception as e:
         error_msg = f"EXECUTION ERROR: {e}"
         logging.error(error_msg)
+        metrics.log_summary()
         send_failure_email(error_msg)
         sys.exit(1)
@@ -1,11 +1,23 @@
+import argparse
 import os
 import glob
 import logging
 import sys
-from logic.manual_rerun_logic import proccess_daily_files_rerun
+from logic.backfill import run_backfill
+from helpers.run_manifest import FORCE_ALL
+from logic.manual_rerun_logic import RERUN_STAGES, proccess_daily_files_rerun
 from helpers.context import DailyFilesContext
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rerun the daily files from CDT, CDP and TransactionFile")
+    parser.add_argument("--backfill", action="store_true",
+                        help="rerun every dated day in rerun_resources in parallel, one output folder per day")
+    parser.add_argument("--workers", type=int, default=None, help="backfill worker processes, defaults to the cores")
+    parser.add_argument("--csv-backend", choices=["pandas", "arrow"], default=None)
+    parser.add_argument("--force", action="append", default=[], choices=[*RERUN_STAGES, FORCE_ALL], metavar="STAGE",
+                        help=f"rerun a stage even if its inputs are unchanged, one of {', '.join(RERUN_STAGES)} or {FORCE_ALL}")
+    args = parser.parse_args()
+
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
@@ -15,6 +27,11 @@ if __name__ == "__main__":
     rerun_resources = DailyFilesContext.fileserver_base() + r"\VOL2\FOXPRO\TestFiles\Manual_Reruns\rerun_resources"
     rerun_output    = DailyFilesContext.fileserver_base() + r"\VOL2\FOXPRO\TestFiles\Manual_Reruns\rerun_output"
 
+    if args.backfill:
+        results = run_backfill(rerun_resources, rerun_output, max_workers=args.workers, csv_backend=args.csv_backend,
+                               incremental=True, force=tuple(args.force))
+        sys.exit(0 if all(r.status == "ok" for r in results) else 1)
+
     cdt_files   = glob.glob(os.path.join(rerun_resources, "*.CDT"))
     cdp_files   = glob.glob(os.path.join(rerun_resources, "*.CDP"))
     trans_files = (
@@ -38,4 +55,5 @@ if __name__ == "__main__":
     logging.info("Outputs: Transfer.csv, ING_Transfers.csv, LOCKEDT.TXT, INPRO.TXT, "
                  "TRANSFER_SAGE_UPLOAD.xlsx, RV_SAGE_UPLOAD.xlsx, CR_SAGE_UPLOAD.xlsx, SL_SAGE_UPLOAD.xlsx")
 
-    proccess_daily_files_rerun(cdt_files[0], cdp_files[0], trans_files[0], rerun_output)
+    proccess_daily_files_rerun(cdt_files[0], cdp_files[0], trans_files[0], rerun_output, csv_backend=args.csv_backend,
+                               incremental=True, force=tuple(args.force))
@@ -1,7 +1,9 @@
+import os
 import pytest
 import pandas as pd
 from unittest.mock import MagicMock, patch
 from contextlib import contextmanager
+from types import SimpleNamespace
 from helpers.context import DailyFilesContext
 
 TEST_OUTPUT_PATH = r"\\tutpub5\Upgrading_Database_Reporting_Systems\CODE_TESTS"
@@ -46,3 +48,53 @@ def mock_reports_db():
     with patch("logic.generate_daily_reports.get_db", _mock_get_db), \
          patch("pandas.read_sql_query", return_value=SAMPLE_STANDARD_DF.copy()):
         yield
+
+
+@pytest.fixture
+def ftp_server(tmp_path):
+    """
+    Local pyftpdlib stand-in for the Ingram FTP server.
+    Serves an 'outgoing' directory under tmp_path and points logic.FTP at it.
+    Yields the outgoing directory so tests can drop files into it, along with what the server saw:
+    logins (user of every session), retrieved (every file sent over RETR) and commands (every FTP command).
+    Local FTP staging goes under tmp_path as well.
+    """
+    import threading
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    root = tmp_path / "ftp_root"
+    outgoing = root / "outgoing"
+    outgoing.mkdir(parents=True)
+
+    logins = []
+    retrieved = []
+    commands = []
+    authorizer = DummyAuthorizer()
+    authorizer.add_user("tester", "secret", str(root), perm="elr")
+
+    class Handler(FTPHandler):
+        def on_login(self, username):
+            logins.append(username)
+
+        def pre_process_command(self, line, cmd, arg):
+            commands.append(cmd)
+            return super().pre_process_command(line, cmd, arg)
+
+        def on_file_sent(self, file):
+            retrieved.append(os.path.basename(file))
+
+    Handler.authorizer = authorizer
+    server = ThreadedFTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"timeout": 0.1}, daemon=True)
+    thread.start()
+
+    outgoing_dir = SimpleNamespace(path=outgoing, logins=logins, retrieved=retrieved, commands=commands)
+    with patch.dict(os.environ, {"LOCAL_CACHE_DIR": str(tmp_path / "local_cache")}), \
+         patch("logic.FTP.FTP_HOST", "127.0.0.1"), \
+         patch("logic.FTP.FTP_PORT", server.address[1]), \
+         patch.dict("logic.FTP.CREDS", {"USER": "tester", "PASS": "secret"}):
+        yield outgoing_dir
+    server.close_all()
+    thread.join(timeout=5)
@@ -0,0 +1,101 @@
+import csv
+import datetime
+import os
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+from benchmarks.synthetic import write_ingram_day
+from logic.backfill import STATUS_FILE, find_rerun_days, run_backfill
+from logic.manual_rerun_logic import RerunLookups, fetch_rerun_lookups, proccess_daily_files_rerun
+
+DAYS = [datetime.date(2026, 1, 5), datetime.date(2026, 1, 6), datetime.date(2026, 1, 7)]
+
+LOOKUPS = RerunLookups(
+    crossref=pd.DataFrame({"Billto": ["000555666"], "Ssacct": ["SS0555666"]}),
+    ingqty=pd.DataFrame({"ISBN": ["9780000000001"], "INGOH": [0]}),
+)
+
+
+def _names(day, suffix="0001"):
+    return {"CDT": day.strftime("%m%d") + suffix + ".CDT", "CDP": day.strftime("%m%d") + suffix + ".CDP",
+            "Trans": f"TransactionFile{day.strftime('%Y%m%d')}.txt"}
+
+
+@pytest.fixture
+def resources(tmp_path):
+    path = tmp_path / "rerun_resources"
+    for i, day in enumerate(DAYS):
+        write_ingram_day(str(path), rows=300, seed=i * 10, day=day, names=_names(day))
+    return path
+
+
+class TestFindRerunDays:
+
+    def test_pairs_files_by_date(self, resources):
+        days, unpaired = find_rerun_days(str(resources))
+        assert [d.day for d in days] == DAYS
+        assert unpaired == []
+        first = days[0]
+        assert os.path.basename(first.cdt) == "01050001.CDT"
+        assert os.path.basename(first.cdp) == "01050001.CDP"
+        assert os.path.basename(first.trans) == "TransactionFile20260105.txt"
+
+    def test_incomplete_days_are_reported(self, resources):
+        os.remove(resources / "01060001.CDP")
+        (resources / "0109ABCD.CDT").write_text("")
+        (resources / "01050001.CDT.parquet").write_text("")
+        days, unpaired = find_rerun_days(str(resources))
+        assert [d.day for d in days] == [DAYS[0], DAYS[2]]
+        assert sorted(os.path.basename(p) for p in unpaired) == ["01060001.CDT", "0109ABCD.CDT", "TransactionFile20260106.txt"]
+
+    def test_resent_file_uses_the_newest(self, resources):
+        resent = resources / "01050002.CDT"
+        resent.write_text((resources / "01050001.CDT").read_text())
+        old = os.path.getmtime(resources / "01050001.CDT")
+        os.utime(resent, (old + 60, old + 60))
+        days, _ = find_rerun_days(str(resources))
+        assert os.path.basename(days[0].cdt) == "01050002.CDT"
+
+
+class TestLookups:
+
+    def test_fetch_once_and_pass_in(self, tmp_path, resources):
+        day = find_rerun_days(str(resources))[0][0]
+        with patch("logic.manual_rerun_logic.get_db", side_effect=AssertionError("queried the database")):
+            proccess_daily_files_rerun(day.cdt, day.cdp, day.trans, str(tmp_path / "out"), lookups=LOOKUPS)
+        assert (tmp_path / "out" / "SL_SAGE_UPLOAD.xlsx").exists()
+
+    def test_failed_lookup_skips_its_step(self, tmp_path, resources):
+        with patch("logic.manual_rerun_logic.get_db", side_effect=OSError("server down")):
+            lookups = fetch_rerun_lookups()
+        assert isinstance(lookups.crossref, LookupError) and isinstance(lookups.ingqty, LookupError)
+
+        day = find_rerun_days(str(resources))[0][0]
+        proccess_daily_files_rerun(day.cdt, day.cdp, day.trans, str(tmp_path / "out"), lookups=lookups)
+        assert (tmp_path / "out" / "SL_SAGE_UPLOAD.xlsx").exists()
+        assert not (tmp_path / "out" / "ING_Transfers.csv").exists()
+
+
+class TestRunBackfill:
+
+    def test_every_day_gets_its_folder_and_status(self, tmp_path, resources):
+        (resources / "01080001.CDT").write_text("not,a,real\n")
+        (resources / "01080001.CDP").write_text((resources / "01050001.CDP").read_text())
+        (resources / "TransactionFile20260108.txt").write_text((resources / "TransactionFile20260105.txt").read_text())
+
+        out = tmp_path / "rerun_output"
+        results = run_backfill(str(resources), str(out), max_workers=2, lookups=LOOKUPS)
+
+        assert [(r.day, r.status) for r in results] == [(d, "ok") for d in DAYS] + [(datetime.date(2026, 1, 8), "failed")]
+        for day in DAYS:
+            assert (out / day.strftime("%Y%m%d") / "SL_SAGE_UPLOAD.xlsx").exists()
+        with open(out / STATUS_FILE, newline="") as f:
+            rows = list(csv.DictReader(f))
+        assert [(r["day"], r["status"]) for r in rows] == [(r.day.isoformat(), r.status) for r in results]
+        assert rows[-1]["error"]
+
+    def test_nothing_to_backfill(self, tmp_path):
+        (tmp_path / "empty").mkdir()
+        with pytest.raises(FileNotFoundError):
+            run_backfill(str(tmp_path / "empty"), str(tmp_path / "out"), lookups=LOOKUPS)
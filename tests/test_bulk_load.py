@@ -0,0 +1,104 @@
+import datetime
+import os
+import pandas as pd
+import pytest
+import sqlalchemy
+from types import SimpleNamespace
+
+from benchmarks.synthetic import write_ingram_day
+from helpers import metrics
+from logic import bulk_load
+from logic.bulk_load import STAGING_TABLES, bulk_load_frame, ingram_frames, insert_method, load_ingram_staging
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'staging.db'}")
+    yield engine
+    engine.dispose()
+
+
+def read_table(engine, name):
+    return pd.read_sql(f"SELECT * FROM {name}", engine)
+
+
+FRAME = pd.DataFrame({
+    "ISBN": pd.Series(["9780000000001", None, "9780000000003"], dtype="str"),
+    "Qty": [1, -2, 3],
+    "Price": [9.99, float("nan"), 0.0],
+    "Qtyreq": pd.Series([None, 5, None], dtype=object),
+})
+
+
+class TestBulkLoadFrame:
+
+    @pytest.mark.parametrize("method", ["executemany", "values"])
+    def test_round_trip(self, engine, method):
+        result = bulk_load_frame(FRAME, "IPS_INV_STAGING", engine=engine, schema=None, batch_rows=2, method=method)
+        assert (result.table, result.rows, result.method) == ("IPS_INV_STAGING", 3, method)
+        assert result.rows_per_sec > 0
+
+        loaded = read_table(engine, "IPS_INV_STAGING")
+        assert list(loaded.columns) == list(FRAME.columns)
+        assert loaded["ISBN"].tolist()[0] == "9780000000001" and pd.isna(loaded["ISBN"][1])
+        assert loaded["Qty"].tolist() == [1, -2, 3]
+        assert pd.isna(loaded["Price"][1])
+        assert loaded["Qtyreq"].tolist()[1] == "5"
+
+    def test_each_load_replaces_the_table(self, engine):
+        bulk_load_frame(FRAME, "LOCKED_STAGING", engine=engine, schema=None)
+        bulk_load_frame(pd.DataFrame({"ISBN": ["9780000000009"]}), "LOCKED_STAGING", engine=engine, schema=None)
+        assert read_table(engine, "LOCKED_STAGING").to_dict("list") == {"ISBN": ["9780000000009"]}
+
+    def test_empty_frame_leaves_an_empty_table(self, engine):
+        assert bulk_load_frame(FRAME.iloc[:0], "IPS_DAILY_STAGING", engine=engine, schema=None).rows == 0
+        assert read_table(engine, "IPS_DAILY_STAGING").empty
+
+    def test_values_statements_stay_under_the_parameter_limit(self, engine, monkeypatch):
+        statements = []
+        monkeypatch.setattr(bulk_load, "MAX_STATEMENT_PARAMS", 10)
+        sqlalchemy.event.listen(engine, "before_cursor_execute",
+                                lambda conn, cursor, sql, params, *a: statements.append(len(params)) if sql.startswith("INSERT") else None)
+        bulk_load_frame(FRAME, "IPS_INV_STAGING", engine=engine, schema=None, method="values")
+        # 4 columns, so 2 rows per statement
+        assert statements == [8, 4]
+        assert len(read_table(engine, "IPS_INV_STAGING")) == 3
+
+    def test_unknown_method(self, engine):
+        with pytest.raises(ValueError, match="tvp"):
+            bulk_load_frame(FRAME, "IPS_INV_STAGING", engine=engine, schema=None, method="tvp")
+
+    def test_insert_method_follows_the_driver(self, engine):
+        assert insert_method(engine) == "executemany"
+        assert insert_method(SimpleNamespace(dialect=SimpleNamespace(driver="pyodbc"))) == "executemany"
+        assert insert_method(SimpleNamespace(dialect=SimpleNamespace(driver="pymssql"))) == "values"
+
+
+class TestLoadIngramStaging:
+
+    @pytest.fixture
+    def day_files(self, tmp_path):
+        names = {"CDT": "01050001.CDT", "CDP": "01050001.CDP", "Trans": "TransactionFile20260105.txt"}
+        write_ingram_day(str(tmp_path / "day"), rows=500, seed=7, day=datetime.date(2026, 1, 5), names=names)
+        return [str(tmp_path / "day" / names[k]) for k in ("CDT", "CDP", "Trans")]
+
+    def test_loads_every_staging_table(self, engine, day_files):
+        metrics.reset()
+        frames = ingram_frames(*day_files)
+        results = load_ingram_staging(*day_files, engine=engine, schema=None)
+
+        assert [r.table for r in results] == [STAGING_TABLES[name] for name in frames]
+        for name, df in frames.items():
+            loaded = read_table(engine, STAGING_TABLES[name])
+            assert list(loaded.columns) == list(df.columns)
+            assert len(loaded) == len(df)
+
+        daily = read_table(engine, STAGING_TABLES["IPS_DAILY"])
+        assert daily["Order_id"].min() == 6300
+        assert (daily.groupby("Ordnum")["Line_num"].min() == 1).all()
+
+        [stage] = metrics.records()
+        assert stage.stage == "load_ingram_staging"
+        assert stage.rows_out == sum(r.rows for r in results)
+        assert stage.bytes_read == sum(os.path.getsize(p) for p in day_files)
+        metrics.reset()
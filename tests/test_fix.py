@@ -0,0 +1,128 @@
+import csv
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+from logic.FIX import Fixes, assign_line_nums, number_frame, number_rows
+
+
+def _reference_fixes(ipsPath, ipsOutPath):
+    """The collect-every-row implementation Fixes has to stay byte-identical to."""
+    with open(ipsPath, 'r', encoding='utf-8', errors='replace') as ipscsv:
+        with open(ipsOutPath, 'w', encoding='utf-8', errors='replace') as ipsoutcsv:
+            ipsreader = csv.reader(ipscsv, delimiter='\t')
+            ipswriter = csv.writer(ipsoutcsv, delimiter='\t', lineterminator='\n')
+            orddict = {}
+            ordIddict = {}
+            id_start = 6300
+            rows = []
+            for row in ipsreader:
+                ordnum = str(row[0])
+                if ordnum in orddict:
+                    orddict[ordnum] += 1
+                else:
+                    orddict[ordnum] = 1
+                row.append(orddict[ordnum])
+                if ordnum not in ordIddict:
+                    ordIddict[ordnum] = id_start
+                    id_start += 1
+                row.append(ordIddict[ordnum])
+                rows.append(row)
+            ipswriter.writerows(rows)
+
+
+SAMPLE = (
+    "1001\tSale\tO\tPO1\t978000000001\t3\n"
+    "1002\tSale\tO\tPO2\t978000000002\t1\n"
+    "1001\tSale\tO\tPO1\t978000000003\t2\n"
+    "1003\tReturn\tR\t\t978000000004\t-1\n"
+    "1002\tSale\tO\tPO2\t978000000005\t7\n"
+    "1001\tSale\tO\tPO1\t978000000006\t1\n"
+    "1004\tSale\tO\tPO é\t978000000007\t4\r\n"
+)
+
+
+class TestNumberRows:
+
+    def test_line_numbers_count_per_order_and_ids_follow_first_appearance(self):
+        rows = [[o] for o in ["A", "B", "A", "C", "B", "A"]]
+        assert list(number_rows(rows)) == [
+            ["A", 1, 6300], ["B", 1, 6301], ["A", 2, 6300],
+            ["C", 1, 6302], ["B", 2, 6301], ["A", 3, 6300],
+        ]
+
+    def test_is_lazy(self):
+        def rows():
+            yield ["A"]
+            raise AssertionError("second row read before the first was consumed")
+
+        assert next(number_rows(rows())) == ["A", 1, 6300]
+
+
+class TestFixes:
+
+    @pytest.mark.parametrize("batch_size", [1, 2, 10000])
+    def test_output_is_byte_identical_to_reference(self, tmp_path, batch_size):
+        src = tmp_path / "IPS_DAILY_NO_LINE_NUM.TXT"
+        src.write_bytes(SAMPLE.encode("utf-8"))
+        _reference_fixes(src, tmp_path / "expected.TXT")
+        with patch("logic.FIX.WRITE_BATCH_SIZE", batch_size):
+            Fixes(str(src), str(tmp_path / "IPS_DAILY.TXT"))
+
+        assert (tmp_path / "IPS_DAILY.TXT").read_bytes() == (tmp_path / "expected.TXT").read_bytes()
+
+    def test_failed_run_leaves_empty_output(self, tmp_path):
+        src = tmp_path / "IPS_DAILY_NO_LINE_NUM.TXT"
+        # a blank line has no order number, the run fails part way through
+        src.write_text("1001\tSale\n\n1002\tSale\n", encoding="utf-8")
+        Fixes(str(src), str(tmp_path / "IPS_DAILY.TXT"))
+        assert (tmp_path / "IPS_DAILY.TXT").read_bytes() == b""
+
+
+def _reference_loop(ordnums, id_start=6300):
+    """The dict loop proccess_daily_files_rerun used before assign_line_nums."""
+    orddict, ordIddict, line_nums, order_ids = {}, {}, [], []
+    for ordnum in ordnums:
+        orddict[ordnum] = orddict.get(ordnum, 0) + 1
+        line_nums.append(orddict[ordnum])
+        if ordnum not in ordIddict:
+            ordIddict[ordnum] = id_start
+            id_start += 1
+        order_ids.append(ordIddict[ordnum])
+    return line_nums, order_ids
+
+
+class TestAssignLineNums:
+
+    def test_matches_number_rows(self):
+        rows = [line.split("\t") for line in SAMPLE.splitlines()]
+        expected = [(r[-2], r[-1]) for r in number_rows([list(r) for r in rows])]
+        line_nums, order_ids = assign_line_nums([r[0] for r in rows])
+        assert list(zip(line_nums.tolist(), order_ids.tolist())) == expected
+
+    def test_matches_reference_loop_on_random_orders(self):
+        rng = np.random.default_rng(7)
+        ordnums = pd.Series(rng.integers(0, 5000, 50000).astype(str), dtype=str)
+        line_nums, order_ids = assign_line_nums(ordnums)
+        ref_lines, ref_ids = _reference_loop(ordnums)
+        assert line_nums.tolist() == ref_lines
+        assert order_ids.tolist() == ref_ids
+
+    def test_missing_order_numbers_are_one_order(self):
+        ordnums = pd.Series(["A", None, "B", None, "A"], dtype=str)
+        line_nums, order_ids = assign_line_nums(ordnums, id_start=1)
+        assert line_nums.tolist() == [1, 1, 1, 2, 2]
+        assert order_ids.tolist() == [1, 2, 3, 2, 1]
+        assert (line_nums.tolist(), order_ids.tolist()) == _reference_loop(ordnums, id_start=1)
+
+    def test_empty(self):
+        line_nums, order_ids = assign_line_nums(pd.Series([], dtype=str))
+        assert len(line_nums) == len(order_ids) == 0
+
+    def test_number_frame_appends_columns(self):
+        df = pd.DataFrame({0: [1001, 1002, 1001], 1: ["Sale", "Sale", "Sale"]})
+        out = number_frame(df)
+        assert out["Line_num"].tolist() == [1, 1, 2]
+        assert out["Order_id"].tolist() == [6300, 6301, 6300]
+        assert "Line_num" not in df.columns
@@ -2,7 +2,7 @@ import pytest
 import datetime
 from pathlib import Path
 
-from logic.FTP import Name_Creator
+from logic.FTP import Name_Creator, RemoteFile, RemoteIndex, _list_outgoing, _parse_list_line
 
 TEST_OUTPUT_PATH = r"\\tutpub5\Upgrading_Database_Reporting_Systems\CODE_TESTS"
 
@@ -50,6 +50,480 @@ class TestNameCreator:
             Name_Creator("UNKNOWN", self.day)
 
 
+class TestRemoteListing:
+
+    def test_parse_unix_list_line(self):
+        entry = _parse_list_line("-rw-r--r--   1 ftp ftp      52341 Mar 12  2024 03120001.CDT")
+        assert entry == RemoteFile("03120001.CDT", 52341, "20240312000000")
+
+    def test_parse_unix_list_line_with_time(self):
+        entry = _parse_list_line("-rw-r--r--   1 ftp ftp       120 Jan 02 10:30 TransactionFile20250102.txt")
+        assert entry.name == "TransactionFile20250102.txt"
+        assert entry.size == 120
+        assert entry.modify.endswith("0102103000")
+
+    def test_parse_dos_list_line(self):
+        entry = _parse_list_line("03-12-25  10:30PM              52341 03120001.CDP")
+        assert entry == RemoteFile("03120001.CDP", 52341, "20250312223000")
+
+    def test_parse_list_line_skips_directories(self):
+        assert _parse_list_line("drwxr-xr-x   2 ftp ftp      4096 Mar 12  2024 archive") is None
+        assert _parse_list_line("03-12-25  10:30AM       <DIR>          archive") is None
+
+    def test_index_resolves_name_creator_patterns(self):
+        day = datetime.datetime(2025, 3, 11)
+        index = RemoteIndex([
+            RemoteFile("03120001.CDT", 10, "20250312060000"),
+            RemoteFile("03120002.CDT", 10, "20250312070000"),
+            RemoteFile("03110001.CDT", 10, "20250311090000"),
+            RemoteFile("03120001.CDP", 10, "20250312060000"),
+        ])
+        assert [f.name for f in index.matching(Name_Creator("CDT", day))] == ["03120001.CDT", "03120002.CDT"]
+        assert index.latest(Name_Creator("CDT", day)).name == "03120002.CDT"
+        assert index.latest(Name_Creator("CDP", day)).name == "03120001.CDP"
+        assert index.latest("0313????.CDT") is None
+
+    def test_list_fallback_breaks_minute_ties_with_mdtm(self):
+        import ftplib
+        from unittest.mock import MagicMock
+
+        conn = MagicMock()
+        conn.mlsd.side_effect = ftplib.error_perm("500 Unknown command")
+        conn.retrlines.side_effect = lambda cmd, callback: [callback(line) for line in [
+            "-rw-r--r--   1 ftp ftp  10 Mar 12  2024 03120001.CDT",
+            "-rw-r--r--   1 ftp ftp  10 Mar 12  2024 03120002.CDT",
+        ]]
+        conn.voidcmd.side_effect = lambda cmd: {
+            "MDTM 03120001.CDT": "213 20240312080000",
+            "MDTM 03120002.CDT": "213 20240312070000",
+        }[cmd]
+
+        index = _list_outgoing(conn)
+        assert not index.precise
+        assert index.latest("0312????.CDT", conn).name == "03120001.CDT"
+        assert conn.voidcmd.call_count == 2
+
+
+class TestMirrorCache:
+
+    def _file(self, tmp_path, name, size):
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        return path
+
+    def test_hit_requires_same_size_and_modify(self, tmp_path):
+        from helpers.mirror_cache import MirrorCache
+
+        cache = MirrorCache(tmp_path / "mirror", max_bytes=1000)
+        cache.put("a.CDT", 10, "20250312060000", self._file(tmp_path, "a", 10))
+        assert cache.get("a.CDT", 10, "20250312060000") is not None
+        assert cache.get("a.CDT", 10, "20250312070000") is None
+        assert cache.get("a.CDT", 11, "20250312060000") is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_least_recently_used_is_evicted_first(self, tmp_path):
+        from helpers.mirror_cache import MirrorCache
+
+        cache = MirrorCache(tmp_path / "mirror", max_bytes=250)
+        cache.put("a", 100, "1", self._file(tmp_path, "a", 100))
+        cache.put("b", 100, "1", self._file(tmp_path, "b", 100))
+        cache.get("a", 100, "1")
+        cache.put("c", 100, "1", self._file(tmp_path, "c", 100))
+
+        assert cache.get("b", 100, "1") is None
+        assert cache.get("a", 100, "1") is not None
+        assert cache.get("c", 100, "1") is not None
+        assert cache.size_bytes == 200
+
+    def test_index_survives_a_new_instance(self, tmp_path):
+        from helpers.mirror_cache import MirrorCache
+
+        MirrorCache(tmp_path / "mirror", max_bytes=1000).put("a", 10, "1", self._file(tmp_path, "a", 10))
+        reopened = MirrorCache(tmp_path / "mirror", max_bytes=1000)
+        assert reopened.get("a", 10, "1").read_bytes() == b"x" * 10
+
+
+def _reference_trans_fix(src, dest):
+    """The read-everything File_Fixes behaviour the streaming version has to reproduce."""
+    try:
+        with open(src, 'r', encoding='utf-8') as read_f:
+            data = read_f.read()
+    except UnicodeDecodeError:
+        with open(src, 'r', encoding='cp1252', errors='replace') as read_f:
+            data = read_f.read()
+    with open(dest, 'w') as write_f:
+        write_f.write(data.replace("\"", "").replace("'", "").replace(",", ""))
+
+
+class TestFileFixesStreaming:
+
+    SAMPLES = {
+        "utf8": "ORD1\tSale\t\"Caf\u00e9, Books\"\tO'Neil\r\nORD2\tRet\t\u00fcber\r\n".encode("utf-8") * 50,
+        "cp1252": "ORD1\tSale\t\"Caf\u00e9, Books\"\t\u2019\r\nORD2\tRet\t\u00fcber\r\n".encode("cp1252") * 50,
+        "lf_only": b"ORD1\tSale\t'x',\"y\"\nORD2\n" * 50,
+    }
+
+    @pytest.mark.parametrize("sample", sorted(SAMPLES))
+    @pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+    def test_matches_read_everything_version(self, tmp_path, sample, chunk_size):
+        from unittest.mock import patch
+        from logic.FTP import _strip_transaction_file
+
+        src = tmp_path / "TransactionFile.txt"
+        src.write_bytes(self.SAMPLES[sample])
+        _reference_trans_fix(src, tmp_path / "expected.txt")
+        with patch("logic.FTP.FIX_CHUNK_SIZE", chunk_size):
+            _strip_transaction_file(src, tmp_path / "streamed.txt")
+
+        assert (tmp_path / "streamed.txt").read_bytes() == (tmp_path / "expected.txt").read_bytes()
+
+    def test_switches_to_cp1252_without_redecoding_what_was_written(self, tmp_path):
+        from logic.FTP import _strip_transaction_file
+
+        src = tmp_path / "TransactionFile.txt"
+        src.write_bytes("ORD1\t\u00e9\r\n".encode("utf-8") + "ORD2\t\u00e9\r\n".encode("cp1252"))
+        _strip_transaction_file(src, tmp_path / "out.txt")
+        with open(tmp_path / "out.txt") as f:
+            assert f.read() == "ORD1\t\u00e9\nORD2\t\u00e9\n"
+
+    def test_reports_encoding_switch(self, tmp_path):
+        from logic.FTP import _strip_transaction_file
+
+        src = tmp_path / "TransactionFile.txt"
+        src.write_bytes(self.SAMPLES["cp1252"])
+        assert _strip_transaction_file(src, tmp_path / "out.txt") == "cp1252"
+        src.write_bytes(self.SAMPLES["utf8"])
+        assert _strip_transaction_file(src, tmp_path / "out.txt") == "utf-8"
+
+    def test_prepend_newline_copies_bytes_unchanged(self, tmp_path):
+        import os
+        from logic.FTP import _prepend_newline
+
+        payload = b"TUT,20250312,6317600\r\n\x81\x9d raw bytes\r\n" * 100
+        (tmp_path / "in.CDT").write_bytes(payload)
+        _prepend_newline(tmp_path / "in.CDT", tmp_path / "IPS_INV.CDT")
+        assert (tmp_path / "IPS_INV.CDT").read_bytes() == os.linesep.encode() + payload
+
+
+class TestDateValidator:
+
+    def test_checks_every_record_across_block_boundaries(self):
+        from logic.FTP import DateValidator
+
+        data = b"".join(b"TUT,20250312,X\r\n" for _ in range(20)) + b"TUT,20250311,X\r\nTUT,20250312,X"
+        validator = DateValidator("20250312")
+        written = bytearray()
+        callback = validator.wrap(written.extend)
+        for i in range(0, len(data), 5):
+            callback(data[i:i + 5])
+
+        assert not validator.finish()
+        assert bytes(written) == data
+        assert (validator.rows, validator.bad_rows, validator.first_bad) == (22, 1, 21)
+
+    def test_blank_lines_are_not_records(self):
+        from logic.FTP import DateValidator
+
+        validator = DateValidator("20250312")
+        validator.feed(b"\r\nTUT,20250312,X\r\n\r\n")
+        assert validator.finish()
+        assert validator.rows == 1
+
+    def test_strict_validator_raises_at_first_bad_record(self):
+        from logic.FTP import DateValidator, FileDateError
+
+        validator = DateValidator("20250312", strict=True)
+        with pytest.raises(FileDateError, match="Record 2 is dated 20250311"):
+            validator.feed(b"TUT,20250312,X\nTUT,20250311,X\nTUT,20250312,X\n")
+
+
+# ---------------------------------------------------------------------------
+# Local server tests — FTP_pull against the pyftpdlib stand-in, files land in tmp_path
+# ---------------------------------------------------------------------------
+
+def _publish_ingram_files(outgoing, day, rows=20):
+    """Drops a CDT, CDP and TransactionFile for day into the stand-in outgoing directory."""
+    import datetime as dt
+    file_date = dt.datetime.now().strftime("%Y%m%d")
+    fday = day + dt.timedelta(days=1)
+    cdt_name = fday.strftime("%m%d") + "0001.CDT"
+    cdp_name = fday.strftime("%m%d") + "0001.CDP"
+    trans_name = Name_Creator("Trans", day)
+    (outgoing / cdt_name).write_bytes(
+        "".join(f"TUT,{file_date},6317600,ISBN{i},UPS,978{i:010d}\r\n" for i in range(rows)).encode()
+    )
+    (outgoing / cdp_name).write_bytes(
+        "".join(f"F1,{file_date},631760X,ISBN{i},F5,978{i:010d},QH,{i}\r\n" for i in range(rows)).encode()
+    )
+    (outgoing / trans_name).write_bytes(
+        "".join(f"ORD{i // 3}\tSale\tO\r\n" for i in range(rows)).encode()
+    )
+    return cdt_name, cdp_name, trans_name
+
+
+class TestFTPPullLocalServer:
+
+    def setup_method(self):
+        self.day = datetime.datetime.now() - datetime.timedelta(days=1)
+
+    def _pull(self, ftp_server, tmp_path, sessions):
+        import logic.FTP as FTP
+        from unittest.mock import patch
+
+        daily = tmp_path / f"daily_{sessions}"
+        (daily / "logs").mkdir(parents=True, exist_ok=True)
+        with patch("logic.FTP.send_warning_email") as warn:
+            names = FTP.FTP_pull(self.day, path=str(daily), sessions=sessions)
+        assert not warn.called
+        return names, daily
+
+    def test_serial_pull_downloads_every_copy(self, ftp_server, tmp_path):
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day)
+        names, daily = self._pull(ftp_server, tmp_path, sessions=1)
+
+        assert names == {"CDT": cdt, "CDP": cdp}
+        for name in (cdt, cdp, trans, "INPRO.CDP"):
+            assert (daily / name).exists()
+        for name in (cdt, cdp, trans):
+            assert (daily / "logs" / name).exists()
+        assert (daily / "INPRO.CDP").read_bytes() == (ftp_server.path / cdp).read_bytes()
+
+    def test_each_remote_file_is_retrieved_once(self, ftp_server, tmp_path):
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day)
+        self._pull(ftp_server, tmp_path, sessions=1)
+        assert sorted(ftp_server.retrieved) == sorted([cdt, cdp, trans])
+
+    def test_selection_uses_one_listing_and_no_mdtm(self, ftp_server, tmp_path):
+        _publish_ingram_files(ftp_server.path, self.day)
+        self._pull(ftp_server, tmp_path, sessions=1)
+        assert ftp_server.commands.count("MLSD") == 1
+        assert "MDTM" not in ftp_server.commands
+        assert "NLST" not in ftp_server.commands
+
+    def test_republished_files_select_the_newest(self, ftp_server, tmp_path):
+        import os
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day)
+        older_cdt = cdt.replace("0001", "0000")
+        (ftp_server.path / older_cdt).write_bytes(b"stale")
+        os.utime(ftp_server.path / older_cdt, (1_000_000_000, 1_000_000_000))
+        names, _ = self._pull(ftp_server, tmp_path, sessions=1)
+        assert names["CDT"] == cdt
+
+    def test_parallel_pull_matches_serial(self, ftp_server, tmp_path):
+        from unittest.mock import patch
+
+        _publish_ingram_files(ftp_server.path, self.day)
+        with patch("logic.FTP.FTP_CACHE_MAX_MB", 0):
+            serial_names, serial = self._pull(ftp_server, tmp_path, sessions=1)
+            parallel_names, parallel = self._pull(ftp_server, tmp_path, sessions=3)
+
+        assert parallel_names == serial_names
+        serial_files = sorted(p.relative_to(serial) for p in serial.rglob("*") if p.is_file())
+        parallel_files = sorted(p.relative_to(parallel) for p in parallel.rglob("*") if p.is_file())
+        assert parallel_files == serial_files
+        for rel in serial_files:
+            assert (parallel / rel).read_bytes() == (serial / rel).read_bytes()
+
+    def test_parallel_pull_opens_one_session_per_worker(self, ftp_server, tmp_path):
+        _publish_ingram_files(ftp_server.path, self.day)
+        self._pull(ftp_server, tmp_path, sessions=3)
+        # one control session for the listing plus three download sessions
+        assert len(ftp_server.logins) == 4
+
+    def test_rerun_is_served_from_mirror_cache(self, ftp_server, tmp_path, caplog):
+        import logging
+
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day)
+        first_names, first = self._pull(ftp_server, tmp_path, sessions=1)
+        ftp_server.retrieved.clear()
+        with caplog.at_level(logging.INFO):
+            second_names, second = self._pull(ftp_server, tmp_path, sessions=1)
+
+        assert ftp_server.retrieved == []
+        assert second_names == first_names
+        assert (second / trans).read_bytes() == (ftp_server.path / trans).read_bytes()
+        assert "FTP mirror cache: 3 hits, 0 misses" in caplog.text
+
+    def test_republished_file_misses_the_mirror_cache(self, ftp_server, tmp_path):
+        import os
+
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day)
+        self._pull(ftp_server, tmp_path, sessions=1)
+        ftp_server.retrieved.clear()
+        (ftp_server.path / trans).write_bytes(b"ORD1\tSale\tO\r\n" * 30)
+        os.utime(ftp_server.path / trans, (2_000_000_000, 2_000_000_000))
+        _, daily = self._pull(ftp_server, tmp_path, sessions=1)
+
+        assert ftp_server.retrieved == [trans]
+        assert (daily / trans).read_bytes() == b"ORD1\tSale\tO\r\n" * 30
+
+    def test_mirror_cache_smaller_than_the_day_still_pulls(self, ftp_server, tmp_path):
+        from unittest.mock import patch
+        from helpers.context import DailyFilesContext
+        from helpers.mirror_cache import MirrorCache
+
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day, rows=200)
+        small = lambda: MirrorCache(DailyFilesContext.ftp_mirror_path(), max_bytes=5000)
+        with patch("logic.FTP._mirror_cache", small):
+            for sessions in (1, 1, 3):
+                names, daily = self._pull(ftp_server, tmp_path, sessions=sessions)
+                assert names == {"CDT": cdt, "CDP": cdp}
+                for name in (cdt, cdp, trans):
+                    assert (daily / name).read_bytes() == (ftp_server.path / name).read_bytes()
+                    assert (daily / "logs" / name).read_bytes() == (ftp_server.path / name).read_bytes()
+                assert (daily / "INPRO.CDP").read_bytes() == (ftp_server.path / cdp).read_bytes()
+
+    def test_remote_day_files_is_what_the_pull_selects(self, ftp_server, tmp_path):
+        import os
+        import logic.FTP as FTP
+
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day)
+        listed = FTP.remote_day_files(self.day)
+        names, _ = self._pull(ftp_server, tmp_path, sessions=1)
+        assert (listed["CDT"].name, listed["CDP"].name, listed["Trans"].name) == (names["CDT"], names["CDP"], trans)
+        assert listed["Trans"].size == (ftp_server.path / trans).stat().st_size
+
+        (ftp_server.path / trans).write_bytes(b"ORD1\tSale\tO\r\n" * 30)
+        os.utime(ftp_server.path / trans, (2_000_000_000, 2_000_000_000))
+        republished = FTP.remote_day_files(self.day)
+        assert republished["Trans"] != listed["Trans"]
+        assert republished["CDT"] == listed["CDT"]
+
+    def test_dropped_transfer_resumes_from_partial_file(self, ftp_server, tmp_path):
+        import ftplib
+        from unittest.mock import patch
+
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day, rows=2000)
+        real_retrbinary = ftplib.FTP.retrbinary
+        offsets = []
+
+        def flaky_retrbinary(conn, cmd, callback, blocksize=8192, rest=None):
+            offsets.append((cmd, rest))
+            if cmd == "RETR " + trans and len([c for c, _ in offsets if c == cmd]) == 1:
+                def drop_after_first_block(data):
+                    callback(data[:1000])
+                    raise ConnectionResetError("connection dropped mid transfer")
+                return real_retrbinary(conn, cmd, drop_after_first_block, blocksize, rest)
+            return real_retrbinary(conn, cmd, callback, blocksize, rest)
+
+        with patch.object(ftplib.FTP, "retrbinary", flaky_retrbinary):
+            names, daily = self._pull(ftp_server, tmp_path, sessions=1)
+
+        assert [rest for cmd, rest in offsets if cmd == "RETR " + trans] == [None, 1000]
+        assert "REST" in ftp_server.commands
+        assert (daily / trans).read_bytes() == (ftp_server.path / trans).read_bytes()
+        assert not list((tmp_path / "local_cache").rglob("*.part"))
+
+    @pytest.mark.parametrize("size_known", [True, False])
+    def test_refused_rest_does_not_use_up_an_attempt(self, ftp_server, tmp_path, size_known):
+        import ftplib
+        import logic.FTP as FTP
+        from logic.FTP import RemoteFile
+        from unittest.mock import patch
+
+        _, _, trans = _publish_ingram_files(ftp_server.path, self.day, rows=2000)
+        content = (ftp_server.path / trans).read_bytes()
+        target = tmp_path / trans
+        (tmp_path / f"{trans}.part").write_bytes(content[:500])
+        real_retrbinary = ftplib.FTP.retrbinary
+        offsets = []
+
+        def no_rest_retrbinary(conn, cmd, callback, blocksize=8192, rest=None):
+            offsets.append(rest)
+            if rest:
+                raise ftplib.error_perm("502 REST not implemented")
+            return real_retrbinary(conn, cmd, callback, blocksize, rest)
+
+        conn = FTP._ftp_session()
+        try:
+            with patch.object(ftplib.FTP, "retrbinary", no_rest_retrbinary):
+                remote = RemoteFile(trans, len(content) if size_known else None, None)
+                conn = FTP._retrieve(conn, remote, str(target), attempts=1)
+        finally:
+            FTP._ftp_close(conn)
+        assert offsets == [500, None]
+        assert target.read_bytes() == content
+
+    def test_no_rest_after_a_refusal(self, ftp_server, tmp_path):
+        import ftplib
+        import logic.FTP as FTP
+        from logic.FTP import RemoteFile
+        from unittest.mock import patch
+
+        _, _, trans = _publish_ingram_files(ftp_server.path, self.day, rows=2000)
+        content = (ftp_server.path / trans).read_bytes()
+        target = tmp_path / trans
+        (tmp_path / f"{trans}.part").write_bytes(content[:500])
+        real_retrbinary = ftplib.FTP.retrbinary
+        offsets = []
+
+        def flaky_no_rest_retrbinary(conn, cmd, callback, blocksize=8192, rest=None):
+            offsets.append(rest)
+            if rest:
+                raise ftplib.error_perm("502 REST not implemented")
+            if len(offsets) == 2:
+                def drop_after_first_block(data):
+                    callback(data[:1000])
+                    raise ConnectionResetError("connection dropped mid transfer")
+                return real_retrbinary(conn, cmd, drop_after_first_block, blocksize, rest)
+            return real_retrbinary(conn, cmd, callback, blocksize, rest)
+
+        with patch.object(ftplib.FTP, "retrbinary", flaky_no_rest_retrbinary):
+            conn = FTP._retrieve(None, RemoteFile(trans, len(content), None), str(target), attempts=2)
+        FTP._ftp_close(conn)
+        assert offsets == [500, None, None]
+        assert target.read_bytes() == content
+
+    def test_size_mismatch_is_not_handed_on(self, ftp_server, tmp_path):
+        import logic.FTP as FTP
+        from logic.FTP import RemoteFile
+
+        cdt, _, _ = _publish_ingram_files(ftp_server.path, self.day)
+        size = (ftp_server.path / cdt).stat().st_size
+        target = tmp_path / cdt
+        conn = FTP._ftp_session()
+        try:
+            with pytest.raises(RuntimeError, match="Size check failed"):
+                conn = FTP._retrieve(conn, RemoteFile(cdt, size + 10, None), str(target), attempts=2)
+        finally:
+            FTP._ftp_close(conn)
+        assert not target.exists()
+
+    def test_bad_date_past_the_first_ten_records_sends_warning(self, ftp_server, tmp_path):
+        import logic.FTP as FTP
+        from unittest.mock import patch
+
+        cdt, _, _ = _publish_ingram_files(ftp_server.path, self.day, rows=50)
+        with open(ftp_server.path / cdt, "ab") as f:
+            f.write(b"TUT,19990101,6317600,ISBN,UPS,978\r\n")
+        daily = tmp_path / "daily"
+        (daily / "logs").mkdir(parents=True)
+        with patch("logic.FTP.send_warning_email") as warn:
+            FTP.FTP_pull(self.day, path=str(daily), sessions=1)
+        assert warn.called
+
+    def test_strict_dates_abort_the_transfer(self, ftp_server, tmp_path):
+        import logic.FTP as FTP
+        from unittest.mock import patch
+
+        cdt, _, _ = _publish_ingram_files(ftp_server.path, self.day, rows=50)
+        (ftp_server.path / cdt).write_bytes(b"TUT,19990101,6317600\r\n" * 50)
+        daily = tmp_path / "daily"
+        (daily / "logs").mkdir(parents=True)
+        with patch("logic.FTP.FTP_STRICT_DATES", True), patch("logic.FTP.send_warning_email"):
+            with pytest.raises(FTP.FileDateError):
+                FTP.FTP_pull(self.day, path=str(daily), sessions=1)
+        assert not (daily / cdt).exists()
+        assert not list((tmp_path / "local_cache").rglob("*.part"))
+
+    def test_missing_remote_file_raises(self, ftp_server, tmp_path):
+        import ftplib
+        cdt, cdp, trans = _publish_ingram_files(ftp_server.path, self.day)
+        (ftp_server.path / trans).unlink()
+        with pytest.raises(ftplib.error_perm):
+            self._pull(ftp_server, tmp_path, sessions=3)
+
+
 # ---------------------------------------------------------------------------
 # Integration tests — require fileserver access and valid credentials in .env
 # ---------------------------------------------------------------------------
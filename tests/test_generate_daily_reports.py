@@ -4,7 +4,7 @@ from pathlib import Path
 from unittest.mock import MagicMock, patch
 from contextlib import contextmanager
 
-from logic.generate_daily_reports import generate_daily_reports
+from logic.generate_daily_reports import generate_daily_reports, _single_scan_frames, REPORT_SQL
 
 TEST_OUTPUT_PATH = r"\\tutpub5\Upgrading_Database_Reporting_Systems\CODE_TESTS"
 
@@ -92,6 +92,189 @@ class TestGenerateDailyReportsUnit:
         assert (test_reports / "INV_ADJ_CC_ING.pdf").exists()
 
 
+# IPS_INV joined to titles as the single scan returns it: ACTTYPE, WHS, EAN, TITLE, QTY
+SCAN_COLS = ["ACTTYPE", "WHS", "EAN", "TITLE", "QTY"]
+SCAN_ROWS = [
+    ("CC", "IPS", "9781234567890           ", "Test Book One", 5),
+    ("OH", "ING", "9780987654321           ", None, 3),
+    ("KA", "ING", "9780000000001           ", "Test Book Three", -2),
+    ("CC", "ING", "9780000000002           ", "Test Book Four", 1),
+    ("RR", "IPS", "9780000000003           ", "Test Book Five", 7),
+    ("kw ", "ING ", "9780000000004           ", "Padded And Lower", 4),
+    ("TI", "ING", "9780000000005           ", "Test Book Six", 9),
+    ("OH", "IPS", "9780000000006           ", "Test Book Seven", 2),
+]
+
+
+def _make_scan_db_mock(report_names: list[str]):
+    """Like _make_db_mock, and engine.connect() answers the single IPS_INV scan with SCAN_ROWS."""
+    calls = []
+
+    @contextmanager
+    def _mock_get_db():
+        engine = MagicMock()
+        conn = MagicMock()
+        conn.execute.return_value = [(name,) for name in report_names]
+        begin_cm = MagicMock()
+        begin_cm.__enter__ = MagicMock(return_value=conn)
+        begin_cm.__exit__ = MagicMock(return_value=False)
+        engine.begin.return_value = begin_cm
+
+        scan_conn = MagicMock()
+
+        def _execute(sql):
+            calls.append(str(sql))
+            result = MagicMock()
+            result.keys.return_value = SCAN_COLS
+            result.fetchall.return_value = list(SCAN_ROWS)
+            return result
+
+        scan_conn.execute.side_effect = _execute
+        connect_cm = MagicMock()
+        connect_cm.__enter__ = MagicMock(return_value=scan_conn)
+        connect_cm.__exit__ = MagicMock(return_value=False)
+        engine.connect.return_value = connect_cm
+        yield engine
+    return _mock_get_db, calls
+
+
+class TestSingleScan:
+
+    def _frames(self, reports):
+        mock_db, calls = _make_scan_db_mock(reports)
+        with mock_db() as db, patch("pandas.read_sql_query", return_value=SAMPLE_DF.copy()) as read_sql:
+            frames = dict(_single_scan_frames(db, reports))
+        return frames, calls, read_sql
+
+    def test_splits_scan_by_warehouse_and_acttype(self):
+        frames, _, _ = self._frames(["INV_ADJ_CC_IPS", "INV_ADJ_OH_ING", "INV_ADJ_OH_IPS", "INV_ADJ_CC_ING"])
+        assert frames["INV_ADJ_CC_IPS"]["EAN"].str.strip().tolist() == ["9781234567890"]
+        assert frames["INV_ADJ_OH_ING"]["EAN"].str.strip().tolist() == ["9780987654321", "9780000000001", "9780000000004"]
+        assert frames["INV_ADJ_OH_IPS"]["EAN"].str.strip().tolist() == ["9780000000006"]
+        assert frames["INV_ADJ_CC_ING"]["EAN"].str.strip().tolist() == ["9780000000002"]
+
+    def test_matches_like_sql_server_equals(self):
+        """'kw ' / 'ING ' are picked up by WHS = 'ING' AND Acttype IN ('OH','KA','KW') and keep their raw values."""
+        frames, _, _ = self._frames(["INV_ADJ_OH_ING"])
+        padded = frames["INV_ADJ_OH_ING"].iloc[-1]
+        assert (padded["REASONCODE"], padded["WHS"]) == ("kw ", "ING ")
+
+    def test_columns_follow_each_reports_query(self):
+        frames, _, _ = self._frames(["INV_ADJ_CC_IPS", "INV_RR", "INV_TI"])
+        assert frames["INV_ADJ_CC_IPS"].columns.tolist() == ["REASONCODE", "WHS", "EAN", "TITLE", "QTY"]
+        assert frames["INV_RR"].columns.tolist() == ["REASONCODE", "WHS", "ISBN", "TITLE", "QTY"]
+        assert frames["INV_TI"].columns.tolist() == ["WHS", "EAN", "TITLE", "QTY", "ACTTYPE"]
+
+    def test_frames_match_read_sql_query(self):
+        """Each frame is what read_sql_query would have built from the report's own rows, dtypes included."""
+        frames, _, _ = self._frames(["INV_ADJ_OH_ING"])
+        own_rows = [r for r in SCAN_ROWS if r[1].rstrip() == "ING" and r[0].rstrip().upper() in ("OH", "KA", "KW")]
+        expected = pd.DataFrame.from_records(own_rows, columns=["REASONCODE", "WHS", "EAN", "TITLE", "QTY"], coerce_float=True)
+        pd.testing.assert_frame_equal(frames["INV_ADJ_OH_ING"], expected)
+
+    def test_one_scan_for_all_inv_reports_and_one_query_for_adj_s_r(self):
+        reports = ["INV_ADJ_CC_IPS", "INV_ADJ_OH_ING", "INV_RR", "ADJ_S_R", "INV_TI"]
+        frames, calls, read_sql = self._frames(reports)
+        assert list(frames) == reports
+        assert len(calls) == 1
+        assert "IN ('CC', 'KA', 'KW', 'OH', 'RR', 'TI')" in calls[0]
+        assert read_sql.call_count == 1
+        assert str(read_sql.call_args.args[0]) == str(REPORT_SQL["ADJ_S_R"])
+
+    def test_no_scan_without_inv_reports(self):
+        _, calls, read_sql = self._frames(["ADJ_S_R"])
+        assert calls == []
+        assert read_sql.call_count == 1
+
+    def test_local_titles_match_the_server_join(self):
+        """With titles from the local snapshot the frames are the same as with ICITEM joined on the server."""
+        reports = ["INV_ADJ_CC_IPS", "INV_ADJ_OH_ING", "INV_RR", "INV_TI"]
+        joined, _, _ = self._frames(reports)
+
+        no_title_rows = [(a, w, e, q) for a, w, e, _, q in SCAN_ROWS]
+        titles = pd.Series({e.strip(): t for _, _, e, t, _ in SCAN_ROWS if t is not None})
+        conn = MagicMock()
+        result = MagicMock()
+        result.keys.return_value = ["ACTTYPE", "WHS", "EAN", "QTY"]
+        result.fetchall.return_value = no_title_rows
+        conn.execute.return_value = result
+        db = MagicMock()
+        db.connect.return_value.__enter__.return_value = conn
+
+        local = dict(_single_scan_frames(db, reports, titles=titles))
+        assert "ICITEM" not in str(conn.execute.call_args.args[0])
+        for report in reports:
+            pd.testing.assert_frame_equal(local[report], joined[report])
+
+    def test_local_titles_adj_s_r_keeps_inner_join(self):
+        conn = MagicMock()
+        result = MagicMock()
+        result.keys.return_value = ["ISBN", "Ordnum", "QTY"]
+        result.fetchall.return_value = [
+            ("9780000000001           ", "1001", 2),
+            ("9789999999999           ", "1002", 1),  # not in ICITEM, the inner join drops it
+        ]
+        conn.execute.return_value = result
+        db = MagicMock()
+        db.connect.return_value.__enter__.return_value = conn
+
+        frames = dict(_single_scan_frames(db, ["ADJ_S_R"], titles=pd.Series({"9780000000001": "Book One"})))
+        df = frames["ADJ_S_R"]
+        assert df.columns.tolist() == ["ISBN", "TITLE", "Ordnum", "QTY"]
+        assert df["TITLE"].tolist() == ["Book One"]
+        assert "ICITEM" not in str(conn.execute.call_args.args[0])
+
+    def test_generate_daily_reports_single_scan(self):
+        mock_db, calls = _make_scan_db_mock(["INV_ADJ_CC_IPS", "INV_RR"])
+        with patch("logic.generate_daily_reports.get_db", mock_db), \
+             patch("pandas.read_sql_query") as read_sql:
+            result = generate_daily_reports(path=TEST_OUTPUT_PATH, single_scan=True)
+        assert result == "Passed"
+        assert len(calls) == 1
+        read_sql.assert_not_called()
+        test_reports = Path(TEST_OUTPUT_PATH) / "Test_Reports"
+        assert (test_reports / "INV_RR.xlsx").exists()
+        assert (test_reports / "INV_RR.pdf").exists()
+
+
+class TestParallelRendering:
+
+    def test_parallel_writes_every_report(self):
+        reports = ["INV_ADJ_CC_IPS", "INV_ADJ_CC_ING", "INV_ADJ_OH_IPS"]
+        with patch("logic.generate_daily_reports.get_db", _make_db_mock(reports)), \
+             patch("pandas.read_sql_query", return_value=SAMPLE_DF.copy()):
+            result = generate_daily_reports(path=TEST_OUTPUT_PATH, parallel=True, max_workers=2)
+        assert result == "Passed"
+        test_reports = Path(TEST_OUTPUT_PATH) / "Test_Reports"
+        for report in reports:
+            assert (test_reports / f"{report}.xlsx").exists()
+            assert (test_reports / f"{report}.pdf").exists()
+
+    def test_parallel_xlsx_matches_serial(self, tmp_path):
+        with patch("logic.generate_daily_reports.get_db", _make_db_mock(["INV_ADJ_OH_IPS"])), \
+             patch("pandas.read_sql_query", return_value=SAMPLE_DF.copy()):
+            generate_daily_reports(path=str(tmp_path / "serial"))
+            generate_daily_reports(path=str(tmp_path / "parallel"), parallel=True)
+        serial = pd.read_excel(tmp_path / "serial" / "Test_Reports" / "INV_ADJ_OH_IPS.xlsx", header=None)
+        parallel = pd.read_excel(tmp_path / "parallel" / "Test_Reports" / "INV_ADJ_OH_IPS.xlsx", header=None)
+        pd.testing.assert_frame_equal(serial, parallel)
+
+    def test_worker_failure_is_reported_per_report(self, tmp_path):
+        """A title openpyxl refuses fails that report only, the others are still written."""
+        bad = SAMPLE_DF.copy()
+        bad.loc[0, "TITLE"] = "Control\x01Character"
+
+        def _read(sql, con):
+            return bad.copy() if "'ING' AND IPS.Acttype = 'CC'" in str(sql) else SAMPLE_DF.copy()
+
+        with patch("logic.generate_daily_reports.get_db", _make_db_mock(["INV_ADJ_CC_IPS", "INV_ADJ_CC_ING"])), \
+             patch("pandas.read_sql_query", side_effect=_read):
+            with pytest.raises(RuntimeError, match=r"Failed to render reports: INV_ADJ_CC_ING \(") as err:
+                generate_daily_reports(path=str(tmp_path), parallel=True)
+        assert "INV_ADJ_CC_IPS" not in str(err.value)
+        assert (tmp_path / "Test_Reports" / "INV_ADJ_CC_IPS.pdf").exists()
+
+
 # ---------------------------------------------------------------------------
 # Integration tests — real DB, real file generation, all output to TEST_OUTPUT_PATH
 # ---------------------------------------------------------------------------
@@ -118,3 +301,18 @@ class TestGenerateDailyReportsIntegration:
         generate_daily_reports(path=TEST_OUTPUT_PATH)
         test_reports = Path(TEST_OUTPUT_PATH) / "Test_Reports"
         assert len(list(test_reports.glob("*.pdf"))) > 0, "No pdf files produced"
+
+    def test_integration_single_scan_matches_per_report_queries(self):
+        """Every report split out of the single scan has the same rows and dtypes as its own query."""
+        from helpers.db_conn import get_db
+        from sqlalchemy import text
+        reports = list(REPORT_SQL)
+        with get_db() as db:
+            scanned = dict(_single_scan_frames(db, reports))
+            for report in reports:
+                own = pd.read_sql_query(text(REPORT_SQL[report]), con=db)
+                sort_cols = list(own.columns)
+                pd.testing.assert_frame_equal(
+                    scanned[report].sort_values(sort_cols).reset_index(drop=True),
+                    own.sort_values(sort_cols).reset_index(drop=True),
+                )
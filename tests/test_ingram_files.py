@@ -0,0 +1,193 @@
+import os
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+from logic.ingram_files import (
+    CDP_LAYOUT, CDT_LAYOUT, CSV_NA_VALUES, TRANSFILE_LAYOUT, columnar_path, load_ingram_file, parse_ingram_file,
+    read_columnar, write_columnar, write_daily_columnar,
+)
+from logic.manual_rerun_logic import procces_cdt_file, proccess_cdp_file, proccess_transfile
+
+CDT_TEXT = (
+    "\n"
+    "TUT1,20260105,6317601,0804812345,UPS1,9780804812345,T1,-3,E,D1,1,DT,\n"
+    "TUT1,20260105,6318681,0804812346,,9780804812346,T2,4,E,D2,2,HS,IPS\n"
+    "TUT1,20260105,6300001,0804812347,UPS3,9780804812347,T3,7,E,D3,3,SS,\n"
+)
+CDP_TEXT = (
+    "\n"
+    "A,20260105,631760X,0804812345,X,9780804812345,QH,12,a,b,c,d,e\n"
+    "A,20260105,631760X,0804812346,X,9780804812346,OP,0,,,,,\n"
+)
+TRANS_ROWS = [
+    ["1001", "Sale", "N", "PO1", "000111", "Shop One", "US", "000112", "Shop One", "9780804812345", "Title One",
+     "TUT", "2", "19.98", "9.99", "40.0", "USD", "", "K1", "HH", "NY", "01/05/2026"],
+    ["1001", "Sale", "N", "PO1", "000111", "Shop One", "US", "000112", "Shop One", "9780804812346", "Title Two",
+     "TUT", "1", "0", "0", "0", "USD", "20", "K2", "IN", "NY", "01/05/2026"],
+]
+
+
+@pytest.fixture
+def ingram_files(tmp_path):
+    cdt = tmp_path / "IPS_INV.CDT"
+    cdt.write_text(CDT_TEXT)
+    cdp = tmp_path / "Locked.CDP"
+    cdp.write_text(CDP_TEXT)
+    trans = tmp_path / "IPS_DALY.txt"
+    trans.write_text("\n".join("\t".join(row) for row in TRANS_ROWS) + "\n")
+    return {CDT_LAYOUT.name: cdt, CDP_LAYOUT.name: cdp, TRANSFILE_LAYOUT.name: trans}
+
+
+LAYOUTS = [CDT_LAYOUT, CDP_LAYOUT, TRANSFILE_LAYOUT]
+
+
+class TestColumnarCopy:
+
+    @pytest.mark.parametrize("layout", LAYOUTS, ids=lambda l: l.name)
+    def test_round_trip_keeps_columns_and_dtypes(self, ingram_files, layout):
+        path = ingram_files[layout.name]
+        parsed = parse_ingram_file(path, layout)
+        write_columnar(path, layout)
+
+        loaded = read_columnar(path, layout)
+        assert list(loaded.columns) == layout.columns
+        pd.testing.assert_frame_equal(loaded, parsed)
+
+    def test_layouts_match_the_old_parsers(self, ingram_files):
+        cdt = pd.read_csv(ingram_files[CDT_LAYOUT.name], header=None, dtype={
+            0: str, 1: str, 2: str, 3: str, 4: str, 5: int, 6: str, 7: int, 8: str, 9: str, 10: str, 11: str, 12: str
+        })
+        parsed = parse_ingram_file(ingram_files[CDT_LAYOUT.name], CDT_LAYOUT)
+        assert parsed.dtypes.tolist() == cdt.dtypes.tolist()
+        assert parsed["Qty"].tolist() == [-3, 4, 7]
+        assert parse_ingram_file(ingram_files[TRANSFILE_LAYOUT.name], TRANSFILE_LAYOUT)["Price"].tolist() == [9.99, 0.0]
+
+    def test_second_load_skips_the_text_parse(self, ingram_files):
+        path = ingram_files[CDT_LAYOUT.name]
+        first = load_ingram_file(path, CDT_LAYOUT)
+        assert columnar_path(path).exists()
+
+        with patch("pandas.read_csv", side_effect=AssertionError("parsed the text again")):
+            second = load_ingram_file(path, CDT_LAYOUT)
+        pd.testing.assert_frame_equal(second, first)
+
+    def test_changed_text_file_is_parsed_again(self, ingram_files):
+        path = ingram_files[CDP_LAYOUT.name]
+        load_ingram_file(path, CDP_LAYOUT)
+        with open(path, "a") as f:
+            f.write("A,20260106,631760X,0804812347,X,9780804812347,QH,5,,,,,\n")
+
+        assert read_columnar(path, CDP_LAYOUT) is None
+        assert len(load_ingram_file(path, CDP_LAYOUT)) == 3
+        assert len(read_columnar(path, CDP_LAYOUT)) == 3
+
+    def test_unreadable_copy_is_ignored(self, ingram_files):
+        path = ingram_files[CDT_LAYOUT.name]
+        columnar_path(path).write_bytes(b"not parquet")
+        assert read_columnar(path, CDT_LAYOUT) is None
+        assert len(load_ingram_file(path, CDT_LAYOUT)) == 3
+
+    def test_copy_of_another_layout_is_ignored(self, ingram_files):
+        path = ingram_files[CDP_LAYOUT.name]
+        write_columnar(path, CDP_LAYOUT)
+        assert read_columnar(path, CDP_LAYOUT._replace(name="other")) is None
+
+    def test_columnar_false_writes_nothing(self, ingram_files):
+        path = ingram_files[CDT_LAYOUT.name]
+        load_ingram_file(path, CDT_LAYOUT, columnar=False)
+        assert not columnar_path(path).exists()
+
+    def test_write_failure_still_returns_the_parse(self, ingram_files):
+        path = ingram_files[CDT_LAYOUT.name]
+        with patch("logic.ingram_files.pq.write_table", side_effect=OSError("read only share")):
+            df = load_ingram_file(path, CDT_LAYOUT)
+        assert len(df) == 3
+        assert not columnar_path(path).exists()
+
+
+class TestDailyFolder:
+
+    def test_writes_a_copy_per_file(self, ingram_files, tmp_path):
+        written = write_daily_columnar(tmp_path)
+        assert sorted(p.name for p in written) == ["IPS_DALY.txt.parquet", "IPS_INV.CDT.parquet", "Locked.CDP.parquet"]
+
+    def test_missing_and_bad_files_are_skipped(self, ingram_files, tmp_path):
+        os.remove(ingram_files[CDP_LAYOUT.name])
+        ingram_files[TRANSFILE_LAYOUT.name].write_text("1001\tSale\tN\tPO1\t000111\tShop\tUS\t000112\tShop\tISBN\tT\tTUT\tx\n")
+        written = write_daily_columnar(tmp_path)
+        assert [p.name for p in written] == ["IPS_INV.CDT.parquet"]
+
+    def test_rerun_parsers_read_the_pipeline_copies(self, ingram_files, tmp_path):
+        expected_cdt = procces_cdt_file(str(ingram_files[CDT_LAYOUT.name]), columnar=False)
+        expected_cdp = proccess_cdp_file(str(ingram_files[CDP_LAYOUT.name]), columnar=False)
+        expected_trans = proccess_transfile(str(ingram_files[TRANSFILE_LAYOUT.name]), columnar=False)
+        write_daily_columnar(tmp_path)
+
+        with patch("pandas.read_csv", side_effect=AssertionError("parsed the text again")):
+            pd.testing.assert_frame_equal(procces_cdt_file(str(ingram_files[CDT_LAYOUT.name])), expected_cdt)
+            pd.testing.assert_frame_equal(proccess_cdp_file(str(ingram_files[CDP_LAYOUT.name])), expected_cdp)
+            pd.testing.assert_frame_equal(proccess_transfile(str(ingram_files[TRANSFILE_LAYOUT.name])), expected_trans)
+
+
+class TestCsvBackends:
+
+    @pytest.mark.parametrize("layout", LAYOUTS, ids=lambda l: l.name)
+    def test_arrow_matches_pandas(self, ingram_files, layout):
+        path = ingram_files[layout.name]
+        pd.testing.assert_frame_equal(
+            parse_ingram_file(path, layout, backend="arrow"),
+            parse_ingram_file(path, layout, backend="pandas"),
+        )
+
+    def test_arrow_matches_pandas_on_awkward_text(self, tmp_path):
+        path = tmp_path / "awkward.CDP"
+        path.write_bytes(
+            b"\r\n"
+            b'A,"20260105",631760X,NA,X,9780804812345,QH,12,"a, quoted",N/A,null, padded ,\r\n'
+            b"A,20260105,631760X,0804812346,X,97808048123\xc3\xa9,OP,-4,,,,,NaN\r\n"
+        )
+        arrow = parse_ingram_file(path, CDP_LAYOUT, backend="arrow")
+        pd.testing.assert_frame_equal(arrow, parse_ingram_file(path, CDP_LAYOUT, backend="pandas"))
+        assert arrow["column9"].tolist()[0] == "a, quoted"
+
+    def test_every_na_value_is_missing_on_both_backends(self, tmp_path):
+        path = tmp_path / "na.CDP"
+        path.write_text("".join(
+            f"A,20260105,631760X,0804812345,X,9780804812345,QH,12,{na},b,c,d,e\n" for na in CSV_NA_VALUES
+        ))
+        arrow = parse_ingram_file(path, CDP_LAYOUT, backend="arrow")
+        pd.testing.assert_frame_equal(arrow, parse_ingram_file(path, CDP_LAYOUT, backend="pandas"))
+        assert arrow["column9"].isna().all()
+
+    def test_arrow_falls_back_to_pandas(self, tmp_path, caplog):
+        # pandas pads the short row with NaN, arrow refuses it
+        path = tmp_path / "short.CDP"
+        path.write_text("A,20260105,631760X,0804812345,X,9780804812345,QH,12,a,b,c,d,e\n"
+                        "A,20260105,631760X,0804812346,X,9780804812346,OP,3\n")
+        with caplog.at_level("WARNING"):
+            df = parse_ingram_file(path, CDP_LAYOUT, backend="arrow")
+        pd.testing.assert_frame_equal(df, parse_ingram_file(path, CDP_LAYOUT, backend="pandas"))
+        assert "falling back to pandas" in caplog.text
+
+    def test_unknown_backend(self, ingram_files):
+        with pytest.raises(ValueError, match="Unknown CSV backend"):
+            parse_ingram_file(ingram_files[CDT_LAYOUT.name], CDT_LAYOUT, backend="polars")
+
+    def test_logs_time_and_peak_rss(self, ingram_files, caplog):
+        with caplog.at_level("INFO"):
+            parse_ingram_file(ingram_files[CDT_LAYOUT.name], CDT_LAYOUT, backend="arrow")
+        assert "with arrow: 3 rows in" in caplog.text
+        assert "peak RSS" in caplog.text
+
+    def test_default_backend_from_env(self, ingram_files):
+        with patch("logic.ingram_files.INGRAM_CSV_BACKEND", "arrow"), \
+             patch("logic.ingram_files._read_csv_pandas", side_effect=AssertionError("used pandas")):
+            assert len(parse_ingram_file(ingram_files[CDT_LAYOUT.name], CDT_LAYOUT)) == 3
+
+    def test_rerun_cdt_transform_is_unchanged(self, ingram_files):
+        path = str(ingram_files[CDT_LAYOUT.name])
+        pd.testing.assert_frame_equal(
+            procces_cdt_file(path, columnar=False, csv_backend="arrow"),
+            procces_cdt_file(path, columnar=False, csv_backend="pandas"),
+        )
@@ -0,0 +1,94 @@
+import datetime
+import pandas as pd
+import pytest
+import sqlalchemy
+from sqlalchemy import text
+
+pytest.importorskip("pyarrow")
+
+from helpers.item_titles import ItemTitleSnapshot, item_key
+
+NOW = datetime.datetime(2026, 1, 5, 6, 0)
+
+
+@pytest.fixture
+def icitem(tmp_path):
+    """sqlite stand-in for TUTLIV.dbo.ICITEM with the columns the snapshot reads."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'tutliv.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE ICITEM (ITEMNO TEXT, [DESC] TEXT, AUDTDATE NUMERIC)"))
+        conn.execute(text("INSERT INTO ICITEM VALUES (:i, :d, :a)"), [
+            {"i": "9780000000001           ", "d": "Book One", "a": 20251201},
+            {"i": "9780000000002", "d": "Book Two", "a": 20251215},
+            {"i": " 978000000003x", "d": "Book Three", "a": 20260102},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def _snapshot(tmp_path, **kwargs):
+    return ItemTitleSnapshot(root=tmp_path / "cache", source="ICITEM", **kwargs)
+
+
+def _set(engine, sql, **params):
+    with engine.begin() as conn:
+        conn.execute(text(sql), params)
+
+
+class TestItemKey:
+
+    def test_trims_and_uppercases(self):
+        keys = item_key(pd.Series([" 978000000003x ", "9780000000001           ", None], dtype=object))
+        assert keys.tolist()[:2] == ["978000000003X", "9780000000001"]
+        assert pd.isna(keys.iloc[2])
+
+
+class TestItemTitleSnapshot:
+
+    def test_first_load_pulls_everything(self, tmp_path, icitem):
+        snap = _snapshot(tmp_path)
+        titles = snap.titles(icitem, now=NOW)
+        assert titles.to_dict() == {
+            "9780000000001": "Book One",
+            "9780000000002": "Book Two",
+            "978000000003X": "Book Three",
+        }
+        assert snap.snapshot_path.exists()
+
+    def test_incremental_pulls_only_changed_items(self, tmp_path, icitem):
+        snap = _snapshot(tmp_path)
+        snap.titles(icitem, now=NOW)
+        # a change without a new AUDTDATE is invisible to the incremental pull
+        _set(icitem, "UPDATE ICITEM SET [DESC] = 'Silent Edit' WHERE ITEMNO = '9780000000002'")
+        _set(icitem, "UPDATE ICITEM SET [DESC] = 'Book One 2nd Ed', AUDTDATE = 20260105 WHERE ITEMNO LIKE '9780000000001%'")
+        _set(icitem, "INSERT INTO ICITEM VALUES ('9780000000004', 'Book Four', 20260105)")
+
+        titles = snap.titles(icitem, now=NOW + datetime.timedelta(hours=1))
+        assert titles["9780000000001"] == "Book One 2nd Ed"
+        assert titles["9780000000004"] == "Book Four"
+        assert titles["9780000000002"] == "Book Two"
+        assert len(titles) == 4
+
+    def test_watermark_day_is_pulled_again(self, tmp_path, icitem):
+        snap = _snapshot(tmp_path)
+        snap.titles(icitem, now=NOW)
+        # same AUDTDATE as the newest item already held, later in the day
+        _set(icitem, "UPDATE ICITEM SET [DESC] = 'Book Three Revised' WHERE ITEMNO = ' 978000000003x'")
+        assert snap.titles(icitem, now=NOW)["978000000003X"] == "Book Three Revised"
+
+    def test_old_snapshot_is_rebuilt(self, tmp_path, icitem):
+        snap = _snapshot(tmp_path, max_age_hours=24)
+        snap.titles(icitem, now=NOW)
+        _set(icitem, "UPDATE ICITEM SET [DESC] = 'Silent Edit' WHERE ITEMNO = '9780000000002'")
+        _set(icitem, "DELETE FROM ICITEM WHERE ITEMNO = ' 978000000003x'")
+
+        titles = snap.titles(icitem, now=NOW + datetime.timedelta(hours=25))
+        assert titles.to_dict() == {"9780000000001": "Book One", "9780000000002": "Silent Edit"}
+
+    def test_unreadable_metadata_rebuilds(self, tmp_path, icitem):
+        snap = _snapshot(tmp_path)
+        snap.titles(icitem, now=NOW)
+        snap.meta_path.write_text("{not json", encoding="utf-8")
+        _set(icitem, "UPDATE ICITEM SET [DESC] = 'Silent Edit' WHERE ITEMNO = '9780000000002'")
+        assert snap.titles(icitem, now=NOW)["9780000000002"] == "Silent Edit"
+
@@ -0,0 +1,125 @@
+import json
+import threading
+import pytest
+
+from helpers import metrics
+from logic.FIX import Fixes
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestStages:
+
+    def test_records_time_status_and_counts(self):
+        with metrics.stage("load") as record:
+            metrics.current().add(bytes_read=10, rows_in=3).add(bytes_read=5, rows_out=2)
+        [done] = metrics.records()
+        assert done is record
+        assert (done.status, done.bytes_read, done.rows_in, done.rows_out) == ("ok", 15, 3, 2)
+        assert done.duration >= 0 and done.started_at <= done.ended_at
+
+    def test_failed_stage_is_recorded_and_reraised(self):
+        with pytest.raises(ValueError):
+            with metrics.stage("boom"):
+                raise ValueError("bad file")
+        [done] = metrics.records()
+        assert done.status == "failed" and done.error == "ValueError: bad file"
+
+    def test_nested_stages_know_their_parent(self):
+        with metrics.stage("run_daily_file"):
+            with metrics.stage("File_Fixes"):
+                pass
+        assert [(r.stage, r.parent) for r in metrics.records()] == [("File_Fixes", "run_daily_file"), ("run_daily_file", None)]
+
+    def test_current_outside_a_stage_is_detached(self):
+        metrics.current().add(bytes_read=100)
+        assert metrics.records() == []
+
+    def test_threads_report_to_their_own_stage(self):
+        barrier = threading.Barrier(2)
+
+        def work(name, rows):
+            with metrics.stage(name):
+                barrier.wait()
+                metrics.current().add(rows_out=rows)
+
+        threads = [threading.Thread(target=work, args=(f"t{i}", i + 1)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert {r.stage: r.rows_out for r in metrics.records()} == {"t0": 1, "t1": 2}
+
+    def test_instrumented_uses_the_function_name(self):
+        @metrics.instrumented()
+        def SQLrun():
+            return "job"
+
+        assert SQLrun() == "job"
+        assert SQLrun.__name__ == "SQLrun"
+        assert [r.stage for r in metrics.records()] == ["SQLrun"]
+
+    def test_file_sizes(self, tmp_path):
+        (tmp_path / "in.txt").write_bytes(b"x" * 7)
+        with metrics.stage("copy"):
+            metrics.current().read_file(tmp_path / "in.txt").wrote_file(tmp_path / "missing.txt")
+        [done] = metrics.records()
+        assert (done.bytes_read, done.bytes_written) == (7, 0)
+
+
+class TestOutput:
+
+    def test_json_lines_next_to_the_log(self, tmp_path):
+        log_file = str(tmp_path / "daily_run_2026-01-05.log")
+        path = metrics.metrics_path_for(log_file)
+        assert path.endswith("daily_run_2026-01-05.metrics.jsonl")
+
+        metrics.configure(path)
+        with metrics.stage("FTP_pull"):
+            metrics.current().add(bytes_written=2048)
+        with pytest.raises(RuntimeError):
+            with metrics.stage("SQLrun"):
+                raise RuntimeError("job missing")
+
+        lines = [json.loads(line) for line in open(path, encoding="utf-8")]
+        assert [(l["stage"], l["status"], l["bytes_written"]) for l in lines] == [("FTP_pull", "ok", 2048), ("SQLrun", "failed", 0)]
+        assert set(lines[0]) == {"stage", "started_at", "parent", "thread", "ended_at", "duration", "status", "error",
+                                 "bytes_read", "bytes_written", "rows_in", "rows_out"}
+
+    def test_configure_starts_a_new_file(self, tmp_path):
+        path = str(tmp_path / "run.metrics.jsonl")
+        with open(path, "w") as f:
+            f.write('{"stage": "yesterday"}\n')
+        metrics.configure(path)
+        with metrics.stage("today"):
+            pass
+        assert [json.loads(l)["stage"] for l in open(path)] == ["today"]
+
+    def test_summary_lists_slowest_first(self):
+        stages = [
+            metrics.StageMetrics("fast", "t", duration=0.5, status="ok"),
+            metrics.StageMetrics("slow", "t", duration=9.0, status="ok", bytes_read=3 * 1024 * 1024, rows_out=1200),
+            metrics.StageMetrics("middle", "t", duration=2.0, status="failed"),
+        ]
+        table = metrics.summary_table(limit=2, stages=stages).splitlines()
+        assert len(table) == 3
+        assert table[1].split()[:3] == ["slow", "ok", "9.00"]
+        assert "3.0" in table[1] and "1,200" in table[1]
+        assert table[2].startswith("middle")
+
+
+class TestPipelineStages:
+
+    def test_fixes_reports_rows_and_bytes(self, tmp_path):
+        src = tmp_path / "IPS_DAILY_NO_LINE_NUM.TXT"
+        src.write_text("1001\tSale\n1002\tSale\n1001\tSale\n")
+        Fixes(str(src), str(tmp_path / "IPS_DAILY.TXT"))
+        [done] = metrics.records()
+        assert (done.stage, done.rows_in, done.rows_out) == ("Fixes", 3, 3)
+        assert done.bytes_read == src.stat().st_size
+        assert done.bytes_written == (tmp_path / "IPS_DAILY.TXT").stat().st_size
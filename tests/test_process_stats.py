@@ -0,0 +1,30 @@
+import sys
+import pytest
+
+from helpers.process_stats import format_bytes, peak_rss_bytes, reset_peak_rss
+
+
+class TestPeakRss:
+
+    @pytest.mark.skipif(sys.platform not in ("linux", "darwin", "win32"), reason="platform reports no peak RSS")
+    def test_is_a_high_water_mark(self):
+        before = peak_rss_bytes()
+        block = bytearray(16 * 1024 * 1024)
+        after = peak_rss_bytes()
+        assert before > 0
+        assert after >= before
+        del block
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="only Linux can reset the peak")
+    def test_reset_drops_the_peak_to_current(self):
+        block = bytearray(128 * 1024 * 1024)
+        block[::4096] = b"x" * len(block[::4096])
+        del block
+        high = peak_rss_bytes()
+        if not reset_peak_rss():
+            pytest.skip("/proc/self/clear_refs not writable here")
+        assert peak_rss_bytes() < high - 64 * 1024 * 1024
+
+    def test_format(self):
+        assert format_bytes(None) == "n/a"
+        assert format_bytes(3 * 1024 * 1024) == "3.0 MB"
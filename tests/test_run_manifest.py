@@ -0,0 +1,207 @@
+import datetime
+import json
+import os
+import pandas as pd
+import pytest
+import shutil
+from unittest.mock import patch
+
+from benchmarks.synthetic import write_ingram_day
+from helpers.context import DailyFilesContext
+from helpers.run_manifest import MANIFEST_FILE, RunManifest, file_digest, frame_digest
+from logic.manual_rerun_logic import RERUN_STAGES, RerunLookups, proccess_daily_files_rerun
+
+
+class Counter:
+    """A stage writing its input reversed to out, counting its runs."""
+
+    def __init__(self, src, out):
+        self.src, self.out, self.runs = src, out, 0
+
+    def __call__(self):
+        self.runs += 1
+        self.out.write_text(self.src.read_text()[::-1])
+        return {"rows": len(self.src.read_text())}
+
+
+@pytest.fixture
+def stage(tmp_path):
+    src = tmp_path / "in.txt"
+    src.write_text("abc")
+    return Counter(src, tmp_path / "out.txt")
+
+
+def run(manifest, stage, **kwargs):
+    return manifest.run("reverse", stage, inputs=[stage.src], outputs=[stage.out], **kwargs)
+
+
+class TestRunManifest:
+
+    def test_unchanged_inputs_skip_and_reuse_the_value(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+        assert run(RunManifest(path), stage) == {"rows": 3}
+
+        manifest = RunManifest(path)
+        assert run(manifest, stage) == {"rows": 3}
+        assert stage.runs == 1 and manifest.skipped == ["reverse"]
+
+    def test_changed_input_reruns(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+        run(RunManifest(path), stage)
+        stage.src.write_text("abcd")
+        assert run(RunManifest(path), stage) == {"rows": 4}
+        assert stage.runs == 2
+
+    def test_same_content_rewritten_still_skips(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+        run(RunManifest(path), stage)
+        stage.src.write_text("abc")
+        os.utime(stage.src, (1, 1))
+        run(RunManifest(path), stage)
+        assert stage.runs == 1
+
+    def test_missing_or_edited_output_reruns(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+        run(RunManifest(path), stage)
+        stage.out.unlink()
+        run(RunManifest(path), stage)
+        stage.out.write_text("edited by hand")
+        run(RunManifest(path), stage)
+        assert stage.runs == 3
+
+    def test_params_and_code_are_part_of_the_key(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+        code = tmp_path / "stage_code.py"
+        code.write_text("x = 1\n")
+        run(RunManifest(path), stage, params={"day": "01/05/26"}, code=[str(code)])
+        run(RunManifest(path), stage, params={"day": "01/06/26"}, code=[str(code)])
+        code.write_text("x = 2\n")
+        run(RunManifest(path), stage, params={"day": "01/06/26"}, code=[str(code)])
+        run(RunManifest(path), stage, params={"day": "01/06/26"}, code=[str(code)])
+        assert stage.runs == 3
+
+    def test_force(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+        run(RunManifest(path), stage)
+        run(RunManifest(path, force=["reverse"]), stage)
+        run(RunManifest(path, force=["all"]), stage)
+        run(RunManifest(path, force=["something_else"]), stage)
+        assert stage.runs == 3
+
+    def test_rerun_upstream_reruns_the_stages_after_it(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+        loads = []
+        manifest = RunManifest(path)
+        manifest.run("load", lambda: loads.append(1), inputs=[stage.src])
+        run(manifest, stage, after=["load"])
+
+        RunManifest(path).run("load", lambda: loads.append(1), inputs=[stage.src])
+        run(RunManifest(path), stage, after=["load"])
+        assert (len(loads), stage.runs) == (1, 1)
+
+        RunManifest(path, force=["load"]).run("load", lambda: loads.append(1), inputs=[stage.src])
+        run(RunManifest(path), stage, after=["load"])
+        assert (len(loads), stage.runs) == (2, 2)
+
+    def test_failed_stage_is_not_recorded(self, tmp_path, stage):
+        path = str(tmp_path / MANIFEST_FILE)
+
+        def boom():
+            raise RuntimeError("job failed")
+
+        with pytest.raises(RuntimeError):
+            RunManifest(path).run("reverse", boom, inputs=[stage.src])
+        run(RunManifest(path), stage)
+        assert stage.runs == 1
+
+    def test_no_path_always_runs_and_writes_nothing(self, tmp_path, stage):
+        for _ in range(2):
+            run(RunManifest(None), stage)
+        assert stage.runs == 2
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["in.txt", "out.txt"]
+
+    def test_unreadable_manifest_runs_everything(self, tmp_path, stage):
+        path = tmp_path / MANIFEST_FILE
+        path.write_text("{not json")
+        run(RunManifest(str(path)), stage)
+        assert stage.runs == 1
+        assert "reverse" in json.loads(path.read_text())["stages"]
+
+    def test_manifest_survives_its_folder_being_wiped(self, tmp_path, stage):
+        path = tmp_path / "daily" / "logs" / MANIFEST_FILE
+        manifest = RunManifest(str(path))
+        run(manifest, stage)
+        manifest.run("setup", lambda: shutil.rmtree(tmp_path / "daily"))
+        assert sorted(json.loads(path.read_text())["stages"]) == ["reverse", "setup"]
+
+    def test_daily_manifest_is_kept_out_of_the_daily_folder(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("LOCAL_CACHE_DIR", str(tmp_path))
+        path = DailyFilesContext.run_manifest_path()
+        assert path.is_relative_to(DailyFilesContext.local_cache_path())
+        assert not path.is_relative_to(DailyFilesContext.daily_files_path())
+        assert path.stem == DailyFilesContext.daily_file_dir_date()
+
+
+class TestDigests:
+
+    def test_code_of_an_instrumented_function_is_its_module(self, tmp_path, stage):
+        import logic.FIX
+        manifest = RunManifest(str(tmp_path / MANIFEST_FILE))
+        by_function = manifest.stage_key("reverse", [stage.src], code=[logic.FIX.Fixes])
+        assert by_function == manifest.stage_key("reverse", [stage.src], code=[logic.FIX.__file__])
+
+    def test_file_digest(self, tmp_path):
+        a, b = tmp_path / "a", tmp_path / "b"
+        a.write_bytes(b"same")
+        b.write_bytes(b"same")
+        assert file_digest(a) == file_digest(b)
+        assert file_digest(tmp_path / "missing") is None
+
+    def test_frame_digest(self):
+        df = pd.DataFrame({"ISBN": ["1", "2"], "INGOH": [3, 4]})
+        assert frame_digest(df) == frame_digest(df.copy())
+        assert frame_digest(df) != frame_digest(df.assign(INGOH=[3, 5]))
+        assert frame_digest(df) != frame_digest(df.rename(columns={"INGOH": "QTY"}))
+
+
+class TestIncrementalRerun:
+
+    DAY = datetime.date(2026, 1, 5)
+
+    @pytest.fixture
+    def day_files(self, tmp_path):
+        names = {"CDT": "01050001.CDT", "CDP": "01050001.CDP", "Trans": "TransactionFile20260105.txt"}
+        write_ingram_day(str(tmp_path / "resources"), rows=300, seed=3, day=self.DAY, names=names)
+        return [str(tmp_path / "resources" / names[k]) for k in ("CDT", "CDP", "Trans")]
+
+    def rerun(self, day_files, out, lookups, **kwargs):
+        cdt, cdp, trans = day_files
+        return proccess_daily_files_rerun(cdt, cdp, trans, str(out), lookups=lookups, incremental=True, **kwargs)
+
+    def test_only_changed_stages_rerun(self, tmp_path, day_files):
+        lookups = RerunLookups(
+            crossref=pd.DataFrame({"Billto": ["000555666"], "Ssacct": ["SS0555666"]}),
+            ingqty=pd.DataFrame({"ISBN": ["9780000000001"], "INGOH": [0]}),
+        )
+        out = tmp_path / "out"
+        assert self.rerun(day_files, out, lookups) == []
+        assert (out / MANIFEST_FILE).exists()
+        sl = (out / "SL_SAGE_UPLOAD.xlsx").stat().st_mtime_ns
+
+        assert self.rerun(day_files, out, lookups) == list(RERUN_STAGES)
+        assert (out / "SL_SAGE_UPLOAD.xlsx").stat().st_mtime_ns == sl
+
+        changed = lookups._replace(ingqty=pd.DataFrame({"ISBN": ["9780000000001"], "INGOH": [5]}))
+        assert self.rerun(day_files, out, changed) == ["transfer", "cdp"]
+
+        with open(day_files[1], "a") as f:
+            f.write(open(day_files[1]).readline())
+        assert self.rerun(day_files, out, changed) == ["transfer", "ips_daily"]
+
+        assert self.rerun(day_files, out, changed, force=("transfer",)) == ["ips_daily", "cdp"]
+
+    def test_lookups_are_fetched_up_front(self, tmp_path, day_files):
+        with patch("logic.manual_rerun_logic.get_db", side_effect=OSError("server down")):
+            assert self.rerun(day_files, tmp_path / "out", None) == []
+            assert self.rerun(day_files, tmp_path / "out", None) == list(RERUN_STAGES)
+        assert not (tmp_path / "out" / "ING_Transfers.csv").exists()
@@ -0,0 +1,119 @@
+import datetime
+import pandas as pd
+import pytest
+import sqlalchemy
+from contextlib import contextmanager
+from sqlalchemy import text
+from unittest.mock import patch
+
+import logic.sage_uploads as sage_uploads
+from logic.sage_uploads import generate_sage_uploads
+
+COLUMNS = ["Order_id", "Ordnum", "Billto", "Ponumber", "Pdate", "Rep_inv", "Traninfo", "Post",
+           "Line_num", "ISBN", "Whs", "Qty", "Price", "Discount", "Repqty", "Otype"]
+
+# Order_id, Ordnum, Line_num, Otype, Discount, Qty, Ponumber
+ROWS = [
+    (6302, "1003I", 1, "Sale", 0.0, 4, None),
+    (6300, "1001I", 2, "Sale", 40.0, 2, "PO1"),
+    (6300, "1001I", 1, "Sale", 40.0, 3, "PO1"),
+    (6301, "1002I", 1, "Return", 0.0, -1, None),
+    (6303, "1004I", 1, "Sale", 100.0, 1, "PO4"),   # review, not uploaded
+    (6304, "1005I", 1, None, 10.0, 5, "PO5"),      # NULL Otype passes neither filter
+    (6305, "1006I", 1, "Sale", None, 6, "PO6"),    # NULL Discount fails <> 100.0
+    (6301, "1002I", 2, "Return", 0.0, None, None),
+    (6306, "1007I", 1, "Sale", 25.0, 8, "PO7"),
+]
+
+
+@pytest.fixture
+def ips_daily(tmp_path, monkeypatch):
+    """sqlite IPS_DAILY; both the per-frame queries and the single fetch are pointed at it."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'ips.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IPS_DAILY ({', '.join(COLUMNS)})"))
+        for order_id, ordnum, line, otype, discount, qty, po in ROWS:
+            conn.execute(text(f"INSERT INTO IPS_DAILY VALUES ({', '.join(':' + c for c in COLUMNS)})"), {
+                "Order_id": order_id, "Ordnum": ordnum, "Billto": "000123", "Ponumber": po,
+                "Pdate": "2026-01-04", "Rep_inv": ordnum, "Traninfo": "TRANSFILE_010426", "Post": "FALSE",
+                "Line_num": line, "ISBN": f"97800000{order_id}{line}", "Whs": "ING", "Qty": qty,
+                "Price": 9.99, "Discount": discount, "Repqty": qty, "Otype": otype,
+            })
+
+    @contextmanager
+    def _get_db():
+        yield engine
+
+    real_read_sql = pd.read_sql
+    written = {}
+
+    def _read_sql(sql, con):
+        return real_read_sql(sql.replace("IPS.dbo.IPS_DAILY", "IPS_DAILY"), con=con)
+
+    def _write(path, sheets):
+        written[path.name] = {name: df.copy() for name, df in sheets.items()}
+
+    monkeypatch.setattr(sage_uploads, "IPS_DAILY_TABLE", "IPS_DAILY")
+    with patch("logic.sage_uploads.get_db", _get_db), \
+         patch("logic.sage_uploads.pd.read_sql", side_effect=_read_sql) as read_sql, \
+         patch("logic.sage_uploads.write_sage_workbook", _write), \
+         patch("logic.sage_uploads.DailyFilesContext.daily_files_path", return_value=tmp_path):
+        yield written, read_sql
+    engine.dispose()
+
+
+class TestSingleFetch:
+
+    def _run(self, ips_daily, single_fetch):
+        written, _ = ips_daily
+        written.clear()
+        generate_sage_uploads(single_fetch=single_fetch)
+        return {f: {s: df.copy() for s, df in sheets.items()} for f, sheets in written.items()}
+
+    def test_same_workbooks_as_four_queries(self, ips_daily):
+        per_query = self._run(ips_daily, single_fetch=False)
+        single = self._run(ips_daily, single_fetch=True)
+        assert per_query.keys() == single.keys() == {"SL_SAGE_UPLOAD.xlsx", "CR_SAGE_UPLOAD.xlsx"}
+        for file_name, sheets in per_query.items():
+            for sheet, df in sheets.items():
+                pd.testing.assert_frame_equal(single[file_name][sheet], df, obj=f"{file_name} {sheet}")
+
+    def test_filters_and_sort_order(self, ips_daily):
+        single = self._run(ips_daily, single_fetch=True)
+        orders = single["SL_SAGE_UPLOAD.xlsx"]["Orders"]
+        details = single["SL_SAGE_UPLOAD.xlsx"]["Order_Details"]
+        credits = single["CR_SAGE_UPLOAD.xlsx"]["Credit_Debit_Details"]
+        assert orders["ORDUNIQ"].tolist() == [6300, 6302, 6306]
+        assert list(zip(details["ORDUNIQ"], details["LINENUM"])) == [(6300, 1), (6300, 2), (6302, 1), (6306, 1)]
+        assert list(zip(credits["CRDUNIQ"], credits["LINENUM"])) == [(6301, 1), (6301, 2)]
+        assert orders["ORDDATE"].tolist() == ["1/4/2026"] * 3
+
+    def test_one_query(self, ips_daily):
+        _, read_sql = ips_daily
+        self._run(ips_daily, single_fetch=True)
+        assert read_sql.call_count == 0
+
+    def test_otype_compared_like_sql_server(self):
+        daily = pd.DataFrame({c: [None] for c in COLUMNS}, dtype=object)
+        daily.loc[0, ["Order_id", "Line_num", "Otype", "Discount"]] = [1, 1, "RETURN ", 0.0]
+
+        class _Conn:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                return self
+
+            def fetchall(self):
+                return [tuple(daily.iloc[0])]
+
+        class _Engine:
+            def connect(self):
+                return _Conn()
+
+        frames = sage_uploads._fetch_ips_daily(_Engine())
+        assert len(frames["credit_details"]) == 1
+        assert frames["sl_detail"].empty
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from openpyxl.workbook.defined_name import DefinedName
+
+from logic.sage_workbook import write_sage_workbook
+
+
+def _reference_sage_workbook(path, sheets):
+    """The write, reload, patch and save again sequence write_sage_workbook replaces."""
+    sheets = {name: df.copy() for name, df in sheets.items()}
+    for df in sheets.values():
+        for col in df.columns:
+            df[col] = df[col].astype(str)
+    with pd.ExcelWriter(path) as f:
+        for name, df in sheets.items():
+            df.to_excel(f, sheet_name=name, index=False)
+    wb = load_workbook(path)
+    for sheet in sheets:
+        ws = wb[sheet]
+        for col_idx in range(1, ws.max_column + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].number_format = '@'
+        for cell in ws[1]:
+            cell.font = Font(bold=False, underline='none')
+        cell_range = f"'{sheet}'!$A$1:${get_column_letter(ws.max_column)}${ws.max_row}"
+        wb.defined_names[sheet] = DefinedName(name=sheet, attr_text=cell_range)
+    wb.save(path)
+    wb.close()
+
+
+def _sheets():
+    return {
+        "Orders": pd.DataFrame({
+            "ORDUNIQ": [6300, 6301, 6302],
+            "ORDNUMBER": ["1001I", None, "1003I"],
+            "ORDDATE": ["1/5/2026", "1/5/2026", None],
+            "PRICE": [12.5, np.nan, 0.0],
+        }),
+        "Order_Details": pd.DataFrame({
+            "ITEM": ["9780000000001", "0012345678901"],
+            "QTYORDERED": [3, -1],
+        }),
+        "Credit_Debit_Detail_Serial_Nos": pd.DataFrame(columns=["CRDUNIQ", "LINENUM", "SERIALNUMF"]),
+    }
+
+
+@pytest.fixture
+def written(tmp_path):
+    ref_path, new_path = tmp_path / "reference.xlsx", tmp_path / "new.xlsx"
+    _reference_sage_workbook(ref_path, _sheets())
+    write_sage_workbook(new_path, _sheets())
+    return load_workbook(ref_path), load_workbook(new_path)
+
+
+def _cells(ws):
+    return [[(c.value, c.data_type) for c in row] for row in ws.iter_rows()]
+
+
+class TestWriteSageWorkbook:
+
+    def test_same_sheets_in_order(self, written):
+        ref, new = written
+        assert new.sheetnames == ref.sheetnames
+
+    def test_same_cell_values_and_types(self, written):
+        ref, new = written
+        for sheet in ref.sheetnames:
+            assert _cells(new[sheet]) == _cells(ref[sheet]), sheet
+
+    def test_values_written_as_text(self, written):
+        _, new = written
+        ws = new["Order_Details"]
+        assert ws["A3"].value == "0012345678901"
+        assert ws["B3"].value == "-1"
+        assert all(c.data_type == "s" for row in ws.iter_rows(min_row=2) for c in row)
+
+    def test_text_format_columns(self, written):
+        ref, new = written
+        for sheet in ref.sheetnames:
+            ref_formats = {k: v.number_format for k, v in ref[sheet].column_dimensions.items()}
+            new_formats = {k: v.number_format for k, v in new[sheet].column_dimensions.items()}
+            assert new_formats == ref_formats == {
+                get_column_letter(i): '@' for i in range(1, ref[sheet].max_column + 1)
+            }
+
+    def test_plain_header(self, written):
+        _, new = written
+        for sheet in new.sheetnames:
+            for cell in new[sheet][1]:
+                assert not cell.font.b
+                assert cell.font.u is None
+
+    def test_defined_names_cover_each_sheet(self, written):
+        ref, new = written
+        ref_names = {k: v.attr_text for k, v in ref.defined_names.items()}
+        new_names = {k: v.attr_text for k, v in new.defined_names.items()}
+        assert new_names == ref_names
+        assert new_names["Orders"] == "'Orders'!$A$1:$D$4"
+        assert new_names["Credit_Debit_Detail_Serial_Nos"] == "'Credit_Debit_Detail_Serial_Nos'!$A$1:$C$1"
+
+    def test_frames_are_not_modified(self, tmp_path):
+        sheets = _sheets()
+        write_sage_workbook(tmp_path / "new.xlsx", sheets)
+        assert sheets["Order_Details"]["QTYORDERED"].tolist() == [3, -1]
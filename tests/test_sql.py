@@ -0,0 +1,110 @@
+import datetime
+import pytest
+
+# pyodbc needs the unixODBC driver manager, skip where it is not installed
+pyodbc = pytest.importorskip("pyodbc", exc_type=ImportError)
+
+import helpers.SQL as SQL
+from helpers.SQL import SQLJob, SQLJobError, wait_for_job
+
+JOB = SQLJob("Daily Rerun", "6F9619FF-8B86-D011-B42D-00C04FC964FF", datetime.datetime(2026, 1, 5, 6, 0))
+STOPPED = datetime.datetime(2026, 1, 5, 6, 4)
+
+
+class FakeConnection:
+    """Answers every fetchone from a shared script, one entry per query the waiter makes."""
+
+    def __init__(self, script):
+        self.script = script
+        self.queries = []
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, *params):
+        self.queries.append((sql, params))
+
+    def fetchone(self):
+        return self.script.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_msdb(monkeypatch):
+    """Points helpers.SQL at a scripted msdb and a fake clock, yields the script and the sleeps taken."""
+    state = {"now": 0.0, "sleeps": [], "script": [], "connections": [], "connect_errors": 0}
+
+    def fake_connect(*args, **kwargs):
+        if state["connect_errors"]:
+            state["connect_errors"] -= 1
+            raise pyodbc.Error("08S01", "Communication link failure")
+        conn = FakeConnection(state["script"])
+        state["connections"].append(conn)
+        return conn
+
+    def fake_sleep(seconds):
+        state["sleeps"].append(seconds)
+        state["now"] += seconds
+
+    monkeypatch.setattr(SQL, "connect", fake_connect)
+    monkeypatch.setattr(SQL.time, "sleep", fake_sleep)
+    monkeypatch.setattr(SQL.time, "monotonic", lambda: state["now"])
+    monkeypatch.setitem(SQL.SQL_CONFIG, "CONNECTION_STRING", "DSN=test")
+    return state
+
+
+class TestWaitForJob:
+
+    def test_returns_once_job_succeeds(self, fake_msdb):
+        fake_msdb["script"] += [
+            None,                   # not picked up by the agent yet
+            (None, None),           # running
+            (STOPPED, 42), (1, "The job succeeded."),
+        ]
+        wait_for_job(JOB, first_interval=2, max_interval=20, backoff=2)
+        assert fake_msdb["sleeps"] == [2, 4, 8]
+        assert fake_msdb["connections"][0].closed
+
+    def test_backoff_is_capped(self, fake_msdb):
+        fake_msdb["script"] += [None] * 5 + [(STOPPED, 42), (1, "The job succeeded.")]
+        wait_for_job(JOB, first_interval=2, max_interval=5, backoff=2)
+        assert fake_msdb["sleeps"] == [2, 4, 5, 5, 5, 5]
+
+    def test_failure_raises_with_step_message(self, fake_msdb):
+        fake_msdb["script"] += [
+            (STOPPED, 42),
+            (0, "The job failed. The last step to run was step 2 (Load IPS_INV)."),
+            ("Load IPS_INV", "Cannot insert the value NULL into column 'EAN'"),
+        ]
+        with pytest.raises(SQLJobError, match="failed.*Load IPS_INV.*Cannot insert the value NULL"):
+            wait_for_job(JOB)
+        assert fake_msdb["sleeps"] == [2.0]
+
+    def test_canceled_job_raises(self, fake_msdb):
+        fake_msdb["script"] += [(STOPPED, 42), (3, "The job was stopped prior to completion by User sa."), None]
+        with pytest.raises(SQLJobError, match="canceled.*stopped prior to completion"):
+            wait_for_job(JOB)
+
+    def test_times_out_while_running(self, fake_msdb):
+        fake_msdb["script"] += [(None, None)] * 100
+        with pytest.raises(TimeoutError):
+            wait_for_job(JOB, timeout=60, first_interval=2, max_interval=20)
+        # the last sleep is cut short so the wait never overshoots the timeout
+        assert sum(fake_msdb["sleeps"]) == 60
+
+    def test_poll_errors_reconnect(self, fake_msdb):
+        fake_msdb["connect_errors"] = 2
+        fake_msdb["script"] += [(STOPPED, 42), (1, "The job succeeded.")]
+        wait_for_job(JOB)
+        assert len(fake_msdb["sleeps"]) == 3
+        assert len(fake_msdb["connections"]) == 1
+
+    def test_only_looks_at_runs_after_the_request(self, fake_msdb):
+        fake_msdb["script"] += [(STOPPED, 42), (1, "The job succeeded.")]
+        wait_for_job(JOB)
+        sql, params = fake_msdb["connections"][0].queries[0]
+        assert "run_requested_date >= ?" in sql
+        assert params == (JOB.job_id, JOB.requested_at)
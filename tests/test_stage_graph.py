@@ -0,0 +1,79 @@
+import threading
+import time
+import pytest
+
+from helpers.stage_graph import Stage, StageGraphError, run_stage_graph
+
+
+class TestRunStageGraph:
+
+    def test_independent_stages_overlap(self):
+        def nap():
+            time.sleep(0.3)
+
+        started = time.perf_counter()
+        results = run_stage_graph([Stage("a", nap), Stage("b", nap), Stage("c", nap)])
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 0.6
+        assert all(r.status == "ok" for r in results.values())
+        assert all(r.duration >= 0.3 for r in results.values())
+
+    def test_dependencies_run_first_and_values_are_kept(self):
+        order = []
+        lock = threading.Lock()
+
+        def record(name):
+            def run():
+                with lock:
+                    order.append(name)
+                return name.upper()
+            return run
+
+        results = run_stage_graph([
+            Stage("report", record("report"), depends_on=("email",)),
+            Stage("email", record("email"), depends_on=("wait",)),
+            Stage("wait", record("wait")),
+        ])
+
+        assert order == ["wait", "email", "report"]
+        assert list(results) == ["report", "email", "wait"]
+        assert results["email"].value == "EMAIL"
+
+    def test_failure_skips_downstream_but_not_siblings(self):
+        def boom():
+            raise RuntimeError("no reports folder")
+
+        ran = []
+        with pytest.raises(StageGraphError, match="wait failed") as info:
+            run_stage_graph([
+                Stage("wait", boom),
+                Stage("email", lambda: ran.append("email"), depends_on=("wait",)),
+                Stage("reports", lambda: ran.append("reports"), depends_on=("email",)),
+                Stage("other", lambda: ran.append("other")),
+            ])
+
+        results = info.value.results
+        assert ran == ["other"]
+        assert results["email"].status == "skipped"
+        assert results["reports"].status == "skipped"
+        assert results["other"].status == "ok"
+
+    def test_timeout_fails_the_stage_without_waiting_for_it(self):
+        release = threading.Event()
+        started = time.perf_counter()
+        with pytest.raises(StageGraphError, match="slow timed_out") as info:
+            run_stage_graph([
+                Stage("slow", lambda: release.wait(5), timeout=0.2),
+                Stage("after", lambda: None, depends_on=("slow",)),
+            ])
+        release.set()
+
+        assert time.perf_counter() - started < 2
+        assert info.value.results["after"].status == "skipped"
+
+    def test_rejects_cycles_and_unknown_dependencies(self):
+        with pytest.raises(ValueError, match="cycle"):
+            run_stage_graph([Stage("a", print, ("b",)), Stage("b", print, ("a",))])
+        with pytest.raises(ValueError, match="unknown"):
+            run_stage_graph([Stage("a", print, ("missing",))])
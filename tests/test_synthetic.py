@@ -0,0 +1,48 @@
+import filecmp
+import pytest
+
+from benchmarks.bench_pipeline import CASES, compare, measure, prepare_day
+from benchmarks.synthetic import write_ingram_day
+from logic.ingram_files import CDP_LAYOUT, CDT_LAYOUT, TRANSFILE_LAYOUT, parse_ingram_file
+
+
+class TestSyntheticDay:
+
+    def test_files_parse_with_the_rerun_layouts(self, tmp_path):
+        paths = write_ingram_day(str(tmp_path), rows=2500)
+        for kind, layout in [("CDT", CDT_LAYOUT), ("CDP", CDP_LAYOUT), ("Trans", TRANSFILE_LAYOUT)]:
+            df = parse_ingram_file(paths[kind], layout, backend="pandas")
+            assert df.shape == (2500, len(layout.columns))
+
+    def test_same_seed_same_files(self, tmp_path):
+        first = write_ingram_day(str(tmp_path / "a"), rows=300, seed=7)
+        second = write_ingram_day(str(tmp_path / "b"), rows=300, seed=7)
+        other = write_ingram_day(str(tmp_path / "c"), rows=300, seed=8)
+        assert all(filecmp.cmp(first[k], second[k], shallow=False) for k in first)
+        assert not filecmp.cmp(first["Trans"], other["Trans"], shallow=False)
+
+    def test_transactions_cover_what_the_rerun_branches_on(self, tmp_path):
+        df = parse_ingram_file(write_ingram_day(str(tmp_path), rows=5000)["Trans"], TRANSFILE_LAYOUT)
+        assert (df["Price"] == 0).any() and (df["Ext"] < 0).any()
+        assert df["RettyP"].notna().any() and df["Ingwhs"].eq("HH").any()
+        assert df["Title"].str.contains('"').any() and df["Title"].str.contains(",").any()
+        # most orders have several lines
+        assert df["Ordnum"].nunique() < len(df) / 2
+
+
+class TestBenchPipeline:
+
+    @pytest.mark.parametrize("case", CASES)
+    def test_cases_run_offline(self, tmp_path, case):
+        day = prepare_day(str(tmp_path), rows=200)
+        result = measure(case, day, rows=200, repeat=1, isolate=False)
+        assert result["seconds"] > 0 and result["rows_per_sec"] > 0
+
+    def test_compare_flags_slower_and_bigger(self):
+        baseline = {"rerun": {"1000": {"seconds": 1.0, "rows_per_sec": 1000, "peak_rss_mb": 100.0}}}
+        same = {"rerun": {"1000": {"seconds": 1.1, "rows_per_sec": 900, "peak_rss_mb": 110.0}}}
+        worse = {"rerun": {"1000": {"seconds": 2.0, "rows_per_sec": 500, "peak_rss_mb": 200.0}}}
+        new = {"fix_fixes": {"1000": {"seconds": 9.0, "rows_per_sec": 1, "peak_rss_mb": 999.0}}}
+        assert compare(same, baseline, 0.25) == []
+        assert len(compare(worse, baseline, 0.25)) == 2
+        assert compare(new, baseline, 0.25) == []
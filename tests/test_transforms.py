@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from logic.transforms import format_mdy, map_warehouse
+
+
+def _reference_whs(x: str) -> str:
+    """whs_updates from procces_cdt_file."""
+    if x.startswith('631760'):
+        return "IPS"
+    elif x == "6318681":
+        return "DAMAGE"
+    else:
+        return "ING"
+
+
+DATES = pd.to_datetime(pd.Series(
+    ["2026-01-04", "2025-12-25", None, "2024-02-29 13:45:00", "0999-07-01", "not a date"]
+), errors="coerce", format="mixed")
+
+
+class TestMapWarehouse:
+
+    def test_matches_row_by_row_mapping(self):
+        codes = pd.Series(
+            ["6317601", "631760", "6318681", "63186810", "6318680", "0631760", "", "9999999", "631760ABC"],
+            dtype=str, index=range(10, 19),
+        )
+        pd.testing.assert_series_equal(map_warehouse(codes), codes.apply(_reference_whs))
+
+    def test_large_column_matches(self):
+        rng = np.random.default_rng(3)
+        codes = pd.Series(rng.choice(["6317601", "6317605", "6318681", "6300001", "1234567"], 100_000), dtype=str)
+        pd.testing.assert_series_equal(map_warehouse(codes), codes.apply(_reference_whs))
+
+    def test_missing_code_is_default(self):
+        assert map_warehouse(pd.Series(["6318681", None], dtype=str)).tolist() == ["DAMAGE", "ING"]
+
+    def test_custom_maps(self):
+        codes = pd.Series(["AB1", "AC2", "ZZ"])
+        out = map_warehouse(codes, prefixes={"AB": "X", "A": "Y"}, exact={"ZZ": "Z"}, default="-")
+        assert out.tolist() == ["X", "Y", "Z"]
+
+
+class TestFormatMdy:
+
+    def test_matches_sage_uploads_format(self):
+        expected = DATES.apply(lambda x: f"{x.month}/{x.day}/{x.year}")
+        pd.testing.assert_series_equal(format_mdy(DATES, na_value="nan/nan/nan"), expected)
+
+    def test_matches_rerun_format(self):
+        expected = DATES.apply(lambda x: f"{x.month}/{x.day}/{x.year}" if pd.notna(x) else None)
+        pd.testing.assert_series_equal(format_mdy(DATES), expected)
+
+    def test_no_zero_padding(self):
+        assert format_mdy(pd.to_datetime(pd.Series(["2026-01-04"]))).tolist() == ["1/4/2026"]
+
+    def test_all_nat(self):
+        dates = pd.Series([pd.NaT, pd.NaT], dtype="datetime64[ns]")
+        assert format_mdy(dates, na_value="nan/nan/nan").tolist() == ["nan/nan/nan"] * 2
+        assert format_mdy(dates).isna().all()
+
+    @pytest.mark.parametrize("unit", ["s", "ms", "ns"])
+    def test_any_datetime_unit(self, unit):
+        # year 999 is outside what nanoseconds can hold
+        dates = DATES[DATES.isna() | (DATES.dt.year > 1700)].astype(f"datetime64[{unit}]")
+        expected = dates.apply(lambda x: f"{x.month}/{x.day}/{x.year}")
+        pd.testing.assert_series_equal(format_mdy(dates, na_value="nan/nan/nan"), expected)
+
+    def test_keeps_index(self):
+        dates = pd.Series(pd.to_datetime(["2026-03-05", None]), index=[7, 3])
+        assert format_mdy(dates).index.tolist() == [7, 3]